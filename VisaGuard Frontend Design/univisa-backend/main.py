@@ -1,6 +1,8 @@
 """
 UniVisa Backend — AI-powered visa compliance risk prediction for F-1/J-1 students.
 """
+import asyncio
+import logging
 import urllib.request
 import json
 from datetime import date
@@ -11,11 +13,23 @@ from dotenv import load_dotenv
 _env_path = Path(__file__).resolve().parent / ".env"
 load_dotenv(dotenv_path=_env_path)
 
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
+from starlette.concurrency import run_in_threadpool
 
 from models.student import StudentProfile, VisaType, EnrollmentStatus
-from routers import student, chat, dso, cpt
+from routers import student, chat, dso, cpt, admin
+from services.actian_store import close_actian_store
+from services.embedding_service import EMBEDDING_WARMUP, get_embedding_service
+from services.gemini_client import close_gemini_client, start_gemini_client
+from services.shared_state import (
+    apply_remote_changes,
+    shared_state_enabled,
+    start_change_log_trimmer,
+    stop_change_log_trimmer,
+)
+
+logger = logging.getLogger(__name__)
 
 app = FastAPI(
     title="UniVisa API",
@@ -40,12 +54,23 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],
 )
 
+if shared_state_enabled():
+    @app.middleware("http")
+    async def sync_shared_state(request: Request, call_next):
+        """Drop cached risk results for students other workers changed since the last request."""
+        # The change log read can block on SQLite (busy_timeout), so keep it off the event loop.
+        await run_in_threadpool(apply_remote_changes)
+        return await call_next(request)
+
+
 app.include_router(student.router)
 app.include_router(chat.router)
 app.include_router(dso.router)
 app.include_router(cpt.router)
+app.include_router(admin.router)
 
 
 def _seed_demo_student() -> None:
@@ -77,8 +102,24 @@ def _seed_demo_student() -> None:
 
 
 @app.on_event("startup")
-def startup() -> None:
+async def startup() -> None:
     _seed_demo_student()
+    await start_gemini_client()
+    await start_change_log_trimmer()
+    if EMBEDDING_WARMUP:
+        try:
+            await asyncio.to_thread(get_embedding_service().warm_up)
+        except Exception as e:
+            # Chat still works without embeddings (the answer cache switches itself off).
+            logger.warning("Embedding warm-up failed: %s", e)
+
+
+@app.on_event("shutdown")
+async def shutdown() -> None:
+    await stop_change_log_trimmer()
+    await close_gemini_client()
+    get_embedding_service().close()
+    close_actian_store()
 
 
 @app.get("/")
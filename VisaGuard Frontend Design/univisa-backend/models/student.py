@@ -69,3 +69,29 @@ class StudentProfile(BaseModel):
     traveling_soon: bool  # within 90 days
     changing_employer: bool
     changing_courses: bool
+
+
+class StudentProfileUpdate(BaseModel):
+    """Request body for PATCH /student/{student_id}/profile; only the fields sent are changed."""
+    full_name: Optional[str] = None
+    university: Optional[str] = None
+    country_of_origin: Optional[str] = None
+    visa_type: Optional[VisaType] = None
+    program_start_date: Optional[date] = None
+    program_end_date: Optional[date] = None
+    enrollment_status: Optional[EnrollmentStatus] = None
+    weekly_work_hours: Optional[float] = None
+    on_opt: Optional[bool] = None
+    on_cpt: Optional[bool] = None
+    opt_start_date: Optional[date] = None
+    opt_end_date: Optional[date] = None
+    cpt_start_date: Optional[date] = None
+    cpt_end_date: Optional[date] = None
+    traveling_soon: Optional[bool] = None
+    changing_employer: Optional[bool] = None
+    changing_courses: Optional[bool] = None
+
+    @field_validator("enrollment_status", mode="before")
+    @classmethod
+    def normalize_enrollment(cls, v: Union[str, EnrollmentStatus, None]) -> Optional[EnrollmentStatus]:
+        return None if v is None else _normalize_enrollment(v)
@@ -0,0 +1,102 @@
+"""Operational endpoints: cache/index stats and manual reloads."""
+from fastapi import APIRouter
+
+from services.actian_store import get_actian_store
+from services.answer_cache import get_answer_cache
+from services.embedding_service import get_embedding_service
+from services.lexical_index import get_lexical_index
+from services.llm_scheduler import get_llm_scheduler
+from services.model_router import get_model_router
+from services.rag_service import RAG_RETRIEVAL
+from services.risk_cache import get_risk_materializer
+from services.risk_engine import get_insight_registry, rule_stats
+from services.shared_state import get_change_feed
+from services.vector_index import get_vector_index, vector_backend
+
+router = APIRouter(prefix="/admin", tags=["admin"])
+
+
+@router.get("/insights")
+def insight_stats() -> dict:
+    """Load counts and last reload time of the clusters.json insight index."""
+    return get_insight_registry().stats()
+
+
+@router.post("/insights/reload")
+def reload_insights() -> dict:
+    """Force a re-read of data/clusters.json (e.g. after re-running cluster_reddit.py)."""
+    registry = get_insight_registry()
+    reloaded = registry.refresh(force=True)
+    return {"reloaded": reloaded, **registry.stats()}
+
+
+@router.get("/risk-cache")
+def risk_cache_stats() -> dict:
+    """Size, hit/recompute counters and next change date of the materialized risk results."""
+    return get_risk_materializer().stats()
+
+
+@router.get("/shared-state")
+def shared_state_stats() -> dict:
+    """This worker's position in the cross-worker change log (UNIVISA_STORE=sqlite only)."""
+    feed = get_change_feed()
+    return {"enabled": feed is not None, **(feed.stats() if feed else {})}
+
+
+@router.get("/answer-cache")
+def answer_cache_stats() -> dict:
+    """Entries, hit/miss/eviction counters and corpus version of the semantic chat answer cache."""
+    return get_answer_cache().stats()
+
+
+@router.post("/answer-cache/clear")
+def clear_answer_cache() -> dict:
+    """Drop every cached chat answer (ingestion does this automatically via corpus_version.json)."""
+    cache = get_answer_cache()
+    cache.clear()
+    return cache.stats()
+
+
+@router.get("/models")
+def model_routing_stats() -> dict:
+    """Per-model breaker state, rolling latency and error rate, and the latest routing decisions."""
+    return get_model_router().stats()
+
+
+@router.get("/embeddings")
+def embedding_stats() -> dict:
+    """Embedding micro-batcher: batch sizes, per-item latency, encode time and LRU cache counters."""
+    return get_embedding_service().stats()
+
+
+@router.get("/vector-index")
+def vector_index_stats() -> dict:
+    """Configured vector backend and the loaded NumPy index version, size and search count."""
+    return {"backend": vector_backend(), **get_vector_index().stats()}
+
+
+@router.get("/actian")
+def actian_stats() -> dict:
+    """Actian client pool (VECTOR_BACKEND=actian): clients, call latency, timeouts, retries, cached count."""
+    if vector_backend() != "actian":
+        return {"backend": vector_backend()}
+    return {"backend": "actian", **get_actian_store().stats()}
+
+
+@router.get("/lexical-index")
+def lexical_index_stats() -> dict:
+    """Retrieval mode and the loaded BM25 index version, chunk/term/posting counts and searches."""
+    return {"retrieval": RAG_RETRIEVAL, **get_lexical_index().stats()}
+
+
+@router.get("/llm-scheduler")
+async def llm_scheduler_stats() -> dict:
+    """Gemini admission control: tokens, queue depth, wait percentiles, grants, rejections, 429 pauses."""
+    # async: the scheduler's state belongs to the event loop thread.
+    return get_llm_scheduler().stats()
+
+
+@router.get("/risk/rules")
+def risk_rule_stats() -> list[dict]:
+    """Per-rule evaluation count, hit rate and cumulative time of the compiled risk rules."""
+    return rule_stats()
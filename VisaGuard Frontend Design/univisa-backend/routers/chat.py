@@ -1,29 +1,34 @@
 """AI advisor chat endpoint."""
+import json
+
 from fastapi import APIRouter, HTTPException
+from fastapi.responses import StreamingResponse
 
 from models.student import StudentProfile
-from services.rag_service import query_rag
+from services.llm_scheduler import Priority
+from services.rag_service import query_rag, stream_rag
 from routers.student import get_student_store
 
 router = APIRouter(prefix="/chat", tags=["chat"])
 
 
-@router.post("", response_model=dict)
-def chat(body: dict):
-    """Body: { student_id, question }. Load profile, run RAG, return { answer, sources }."""
+def _question_and_profile(body: dict) -> tuple[str, StudentProfile]:
     question = body.get("question")
     if not question:
         raise HTTPException(status_code=400, detail="question is required")
     store = get_student_store()
     student_id = (body.get("student_id") or "").strip()
     if student_id and student_id in store:
-        profile: StudentProfile = store[student_id]
-    elif "demo" in store:
-        profile = store["demo"]
-    else:
-        raise HTTPException(status_code=404, detail="Student not found")
+        return question.strip(), store[student_id]
+    if "demo" in store:
+        return question.strip(), store["demo"]
+    raise HTTPException(status_code=404, detail="Student not found")
+
+
+async def ask_advisor(question: str, profile: StudentProfile, priority: Priority = Priority.STUDENT) -> dict:
+    """Run RAG for one question; errors become an apology answer rather than a 500."""
     try:
-        result = query_rag(question.strip(), profile)
+        result = await query_rag(question, profile, priority)
         return {
             "answer": result.get("answer") or "No response.",
             "sources": result.get("sources") or [],
@@ -33,3 +38,33 @@ def chat(body: dict):
             "answer": f"Sorry, the AI advisor encountered an error. Please try again or contact your DSO. Error: {e!s}",
             "sources": [],
         }
+
+
+@router.post("", response_model=dict)
+async def chat(body: dict):
+    """Body: { student_id, question }. Load profile, run RAG, return { answer, sources }."""
+    question, profile = _question_and_profile(body)
+    return await ask_advisor(question, profile)
+
+
+@router.post("/stream")
+async def chat_stream(body: dict):
+    """Same body as /chat; answers as Server-Sent Events while Gemini generates.
+
+    Events: `token` {text} (repeated), then `sources` {sources}, then `done` {ttft_ms, total_ms, cached}.
+    An `error` {message} event may precede `sources` if the answer breaks off.
+    """
+    question, profile = _question_and_profile(body)
+
+    async def events():
+        try:
+            async for event, data in stream_rag(question, profile):
+                yield f"event: {event}\ndata: {json.dumps(data)}\n\n"
+        except Exception as e:
+            yield f"event: error\ndata: {json.dumps({'message': str(e)})}\n\n"
+            yield 'event: sources\ndata: {"sources": []}\n\n'
+            yield 'event: done\ndata: {"ttft_ms": null, "total_ms": null, "cached": false}\n\n'
+
+    # No proxy buffering, so each token reaches the browser when it is sent.
+    headers = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    return StreamingResponse(events(), media_type="text/event-stream", headers=headers)
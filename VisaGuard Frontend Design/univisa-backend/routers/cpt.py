@@ -1,15 +1,21 @@
 """CPT requests — start before signing offer, DSO early visibility."""
 import uuid
 from datetime import datetime, timezone
+from typing import Optional, Union
 
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Query, Response
 
 from models.cpt_request import CPTRequest, CPTRequestCreate, CPTRequestStatus
 from routers.student import get_student_store
+from services.cpt_index import IndexedCPTStore
+from services.store import SQLiteCPTTable, open_cpt_store
 
-_store: dict[str, CPTRequest] = {}
+# CPT requests keyed by request id, indexed by student, status and creation time (see services/store.py)
+_store: Union[IndexedCPTStore, SQLiteCPTTable] = open_cpt_store()
 router = APIRouter(prefix="/cpt", tags=["cpt"])
 
+MAX_PAGE_SIZE = 1000
+
 
 def _ts() -> str:
     return datetime.now(timezone.utc).isoformat()
@@ -42,9 +48,7 @@ def create_cpt_request(student_id: str, body: CPTRequestCreate):
 def list_cpt_requests(student_id: str):
     if student_id not in get_student_store():
         raise HTTPException(status_code=404, detail="Student not found")
-    out = [r for r in _store.values() if r.student_id == student_id]
-    out.sort(key=lambda r: r.created_at, reverse=True)
-    return out
+    return _store.for_student(student_id)
 
 
 @router.patch("/student/{student_id}/requests/{request_id}", response_model=CPTRequest)
@@ -68,9 +72,27 @@ def update_cpt_request(student_id: str, request_id: str, body: dict):
 
 
 @router.get("/dso/requests")
-def dso_list_cpt_requests():
+def dso_list_cpt_requests(
+    response: Response,
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    status: Optional[CPTRequestStatus] = None,
+):
+    """CPT requests newest first, optionally only one status (e.g. offer_signed awaiting review).
+
+    With limit, returns one page and sets the X-Next-Cursor header when more may follow.
+    """
+    try:
+        requests, next_cursor = _store.page(limit, cursor, status.value if status else None)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid cursor: {e}")
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
     store = get_student_store()
-    return [
-        {**r.model_dump(), "student_name": store[r.student_id].full_name if r.student_id in store else r.student_id}
-        for r in sorted(_store.values(), key=lambda x: x.created_at, reverse=True)
-    ]
+    names = {sid: store[sid].full_name if sid in store else sid for sid in {r.student_id for r in requests}}
+    return [{**r.model_dump(), "student_name": names[r.student_id]} for r in requests]
+
+
+def get_cpt_store() -> Union[IndexedCPTStore, SQLiteCPTTable]:
+    """Return the CPT request store."""
+    return _store
@@ -1,33 +1,129 @@
 """DSO dashboard endpoints."""
 from datetime import date
+from typing import Optional
 
-from fastapi import APIRouter
+from fastapi import APIRouter, HTTPException, Query, Response
+from fastapi.responses import StreamingResponse
 
+from routers.chat import ask_advisor
 from routers.student import get_student_store
-from services.risk_engine import calculate_risk
+from services.llm_scheduler import Priority
+from services.cohort_export import iter_csv, iter_ndjson
+from services.risk_batch import store_columns, store_values
+from services.risk_cache import get_cohort_index, get_risk_materializer
+from services.risk_timeline import MAX_TIMELINE_DAYS, first_high_risk_date, project_columns
 
 router = APIRouter(prefix="/dso", tags=["dso"])
 
+MAX_PAGE_SIZE = 1000
+
 
 @router.get("/cohort")
-def get_cohort():
-    """List all students with risk score and top flag, sorted by risk score descending."""
+def get_cohort(
+    response: Response,
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    risk_level: Optional[str] = None,
+    visa_type: Optional[str] = None,
+    country_of_origin: Optional[str] = None,
+    top_flag: Optional[str] = None,
+    include_flags: bool = False,
+):
+    """Students sorted by risk score descending (then student_id), from the maintained cohort index.
+
+    With limit, returns one page and sets the X-Next-Cursor header when more rows may follow;
+    pass it back as cursor. Flag lists are included only with include_flags=true.
+    """
+    store = get_student_store()
+    materializer = get_risk_materializer()
+    today = date.today()
+    materializer.sync(store, today)
+    try:
+        rows, next_cursor = get_cohort_index().page(
+            limit,
+            cursor,
+            risk_level=risk_level,
+            visa_type=visa_type,
+            country_of_origin=country_of_origin,
+            top_risk_flag=top_flag,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid cursor: {e}")
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    if include_flags:
+        flagged = []
+        for row in rows:
+            output = materializer.peek(row["student_id"])
+            if output is None:
+                # Forgotten or reset since the page was read: recompute, or skip if deleted.
+                profile = store.get(row["student_id"])
+                if profile is None:
+                    continue
+                output = materializer.get(profile, today)
+            flagged.append({**row, "flags": [f.model_dump() for f in output.flags]})
+        rows = flagged
+    return rows
+
+
+@router.get("/cohort/export")
+def export_cohort(format: str = Query("ndjson", pattern="^(ndjson|csv)$")):
+    """Stream every student's risk row (get_cohort columns plus one column per flag category).
+
+    Rows are scored in chunks as they are sent, in store order (not sorted by risk).
+    """
     store = get_student_store()
     today = date.today()
+    if format == "csv":
+        body, media_type = iter_csv(store, today), "text/csv"
+    else:
+        body, media_type = iter_ndjson(store, today), "application/x-ndjson"
+    filename = f"cohort-{today}.{format}"
+    return StreamingResponse(
+        body, media_type=media_type, headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
+
+
+@router.get("/cohort/timeline")
+def get_cohort_timeline(
+    days: int = Query(365, ge=1, le=MAX_TIMELINE_DAYS),
+    crossing_only: bool = False,
+):
+    """Projected risk change points per student; soonest high-risk crossing first.
+
+    crossing_only=true keeps only students who are not high risk today but become so in the range.
+    """
+    store = get_student_store()
+    cols = store_columns(store, list(store.keys()))
+    names = store_values(store, "full_name", cols.student_ids)
     rows = []
-    for sid, profile in store.items():
-        out = calculate_risk(profile, today=today)
-        top_flag = out.flags[0].category if out.flags else "All requirements met"
+    for sid, name, changes in zip(cols.student_ids, names, project_columns(cols, date.today(), days)):
+        high_from = first_high_risk_date(changes)
+        if crossing_only and (high_from is None or changes[0]["risk_level"] == "high"):
+            continue
         rows.append({
             "student_id": sid,
-            "full_name": profile.full_name,
-            "country_of_origin": profile.country_of_origin,
-            "visa_type": profile.visa_type.value,
-            "program_end_date": str(profile.program_end_date),
-            "risk_score": out.risk_score,
-            "risk_level": out.risk_level,
-            "top_risk_flag": top_flag,
-            "flags": [f.model_dump() for f in out.flags],
+            "full_name": name,
+            "risk_score": changes[0]["risk_score"],
+            "risk_level": changes[0]["risk_level"],
+            "high_risk_from": high_from,
+            "changes": changes,
         })
-    rows.sort(key=lambda r: r["risk_score"], reverse=True)
+    rows.sort(key=lambda r: (r["high_risk_from"] is None, r["high_risk_from"] or ""))
     return rows
+
+
+@router.post("/chat", response_model=dict)
+async def dso_chat(body: dict):
+    """Body: { student_id, question }. AI advisor answer about one student for a DSO.
+
+    Same as /chat, but scheduled ahead of student chats when Gemini calls are queued.
+    """
+    question = (body.get("question") or "").strip()
+    if not question:
+        raise HTTPException(status_code=400, detail="question is required")
+    store = get_student_store()
+    student_id = (body.get("student_id") or "").strip()
+    if student_id not in store:
+        raise HTTPException(status_code=404, detail="Student not found")
+    return await ask_advisor(question, store[student_id], Priority.DSO)
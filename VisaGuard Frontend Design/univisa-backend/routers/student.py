@@ -1,14 +1,23 @@
 """Student profile and risk endpoints."""
+import time
 import uuid
 from datetime import date
+from typing import MutableMapping, Optional
 
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Query, Request
+from pydantic import ValidationError
+from starlette.concurrency import run_in_threadpool
 
-from models.student import StudentProfile, StudentProfileCreate, VisaType, EnrollmentStatus
-from services.risk_engine import calculate_risk
+from models.student import StudentProfile, StudentProfileCreate, StudentProfileUpdate, VisaType, EnrollmentStatus
+from services.risk_cache import get_risk_materializer
+from services.risk_timeline import MAX_TIMELINE_DAYS, project_timelines
+from services.student_import import (
+    IMPORT_BATCH_SIZE, MAX_REPORTED_ERRORS, MAX_REPORTED_STUDENTS, RecordParser, RowError, iter_records, validate_batch,
+)
+from services.store import open_student_store
 
-# In-memory store for hackathon (key: student_id)
-_students: dict[str, StudentProfile] = {}
+# Student profiles keyed by student_id (in-memory dict or SQLite, see services/store.py)
+_students: MutableMapping[str, StudentProfile] = open_student_store()
 
 router = APIRouter(prefix="/student", tags=["student"])
 
@@ -22,16 +31,124 @@ def create_profile(body: StudentProfileCreate) -> dict:
         **body.model_dump(),
     )
     _students[student_id] = profile
+    get_risk_materializer().invalidate(student_id)
     return {"student_id": student_id}
 
 
+@router.post("/profiles/bulk", response_model=dict)
+async def bulk_import_profiles(
+    request: Request,
+    format: Optional[str] = Query(None, pattern="^(csv|jsonl)$"),
+    score: bool = False,
+) -> dict:
+    """Import many profiles from a CSV (header row of StudentProfileCreate fields) or JSONL body.
+
+    The body is streamed and processed IMPORT_BATCH_SIZE rows at a time. Valid rows are stored,
+    invalid ones reported by row number (1-based, data rows only). With score=true each batch is
+    risk-scored on insert and counted per risk level. Per-row output is capped (the first
+    MAX_REPORTED_ERRORS errors and MAX_REPORTED_STUDENTS students, with students_truncated set
+    past that), so the response stays bounded however large the upload.
+    """
+    if format is None:
+        format = "jsonl" if "json" in request.headers.get("content-type", "") else "csv"
+    parser = RecordParser(format)
+    materializer = get_risk_materializer()
+    today = date.today()
+    result: dict = {
+        "format": format, "rows": 0, "imported": 0, "failed": 0, "errors": [], "students": [],
+        "students_truncated": False,
+    }
+    if score:
+        result["risk_levels"] = {"high": 0, "medium": 0, "low": 0}
+
+    def process(records: list[str]) -> None:
+        parsed = parser.parse(records)
+        first_row = result["rows"] + 1
+        result["rows"] += len(parsed)
+        failed: dict[int, object] = {i: p for i, p in enumerate(parsed) if isinstance(p, RowError)}
+        valid, invalid = validate_batch([None if i in failed else p for i, p in enumerate(parsed)])
+        failed.update(invalid)
+        result["failed"] += len(failed)
+        for i in sorted(failed)[:max(0, MAX_REPORTED_ERRORS - len(result["errors"]))]:
+            err = failed[i]
+            detail = [{"loc": [], "msg": str(err), "type": "parse_error"}] if isinstance(err, RowError) else err
+            result["errors"].append({"row": first_row + i, "errors": detail})
+        profiles = [StudentProfile(student_id=str(uuid.uuid4()), **dict(m)) for _, m in valid]
+        if not profiles:
+            return
+        _students.update((p.student_id, p) for p in profiles)
+        result["imported"] += len(profiles)
+        room = max(0, MAX_REPORTED_STUDENTS - len(result["students"]))
+        result["students_truncated"] |= len(profiles) > room
+        if score:
+            outputs = materializer.score_batch(profiles, today)
+            for o in outputs:
+                result["risk_levels"][o.risk_level] += 1
+            result["students"].extend(
+                {"row": first_row + i, "student_id": p.student_id, "risk_score": o.risk_score, "risk_level": o.risk_level}
+                for (i, _), p, o in zip(valid[:room], profiles, outputs)
+            )
+        else:
+            for p in profiles:
+                materializer.invalidate(p.student_id)
+            result["students"].extend(
+                {"row": first_row + i, "student_id": p.student_id} for (i, _), p in zip(valid[:room], profiles)
+            )
+
+    t0 = time.perf_counter()
+    batch: list[str] = []
+    async for record in iter_records(request.stream(), format):
+        batch.append(record)
+        if len(batch) >= IMPORT_BATCH_SIZE:
+            await run_in_threadpool(process, batch)
+            batch = []
+    if batch:
+        await run_in_threadpool(process, batch)
+    elapsed = time.perf_counter() - t0
+    result["elapsed_s"] = round(elapsed, 3)
+    result["rows_per_second"] = round(result["rows"] / elapsed) if elapsed > 0 else None
+    return result
+
+
+@router.patch("/{student_id}/profile", response_model=dict)
+def update_profile(student_id: str, body: StudentProfileUpdate) -> dict:
+    """Apply a partial profile update and re-score only the risk rules that read a changed field."""
+    if student_id not in _students:
+        raise HTTPException(status_code=404, detail="Student not found")
+    current = _students[student_id]
+    updates = body.model_dump(exclude_unset=True)
+    try:
+        profile = StudentProfile.model_validate({**current.model_dump(), **updates})
+    except ValidationError as e:
+        raise HTTPException(status_code=422, detail=e.errors(include_url=False, include_context=False))
+    changed = {k for k in updates if getattr(current, k) != getattr(profile, k)}
+    _students[student_id] = profile
+    output, rescored = get_risk_materializer().apply_update(profile, changed, date.today())
+    return {
+        "student_id": student_id,
+        "changed_fields": sorted(changed),
+        "rescored_rules": rescored,
+        "risk": output,
+    }
+
+
 @router.get("/{student_id}/risk")
 def get_risk(student_id: str):
-    """Run risk engine for the student, return RiskOutput."""
+    """Return the student's RiskOutput (materialized; recomputed only when stale)."""
     if student_id not in _students:
         raise HTTPException(status_code=404, detail="Student not found")
     profile = _students[student_id]
-    return calculate_risk(profile, today=date.today())
+    return get_risk_materializer().get(profile, date.today())
+
+
+@router.get("/{student_id}/risk/timeline")
+def get_risk_timeline(student_id: str, days: int = Query(365, ge=1, le=MAX_TIMELINE_DAYS)):
+    """Projected risk from today over the next `days` days, as change points only."""
+    if student_id not in _students:
+        raise HTTPException(status_code=404, detail="Student not found")
+    today = date.today()
+    (changes,) = project_timelines([_students[student_id]], today, days)
+    return {"student_id": student_id, "start": str(today), "days": days, "changes": changes}
 
 
 @router.get("/{student_id}/alerts")
@@ -40,10 +157,10 @@ def get_alerts(student_id: str):
     if student_id not in _students:
         raise HTTPException(status_code=404, detail="Student not found")
     profile = _students[student_id]
-    output = calculate_risk(profile, today=date.today())
+    output = get_risk_materializer().get(profile, date.today())
     return output.alerts
 
 
-def get_student_store() -> dict[str, StudentProfile]:
-    """Return the in-memory student store (for demo seeding and DSO router)."""
+def get_student_store() -> MutableMapping[str, StudentProfile]:
+    """Return the student store (for demo seeding and DSO router)."""
     return _students
@@ -0,0 +1,177 @@
+"""
+Load-test POST /chat against a local stand-in for the Gemini API.
+Usage: python scripts/bench_chat_concurrency.py [CONCURRENT_CHATS] [GEMINI_LATENCY_MS] [stream]
+Starts the stand-in and the API as separate uvicorn processes, fires the chats at once and
+reports throughput, peak in-flight Gemini calls and TCP connections used (and how many
+were new rather than reused keep-alive connections from the warm-up round). A sync route
+on the default 40-thread pool would cap peak in-flight at 40 and throughput at 40 / latency.
+With `stream`, chats go to POST /chat/stream; the stand-in sends its answer in STREAM_CHUNKS
+pieces spread over the latency, and time-to-first-token is reported next to total time.
+"""
+import asyncio
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import httpx
+from fastapi import FastAPI, Request
+from fastapi.responses import StreamingResponse
+
+ROOT = Path(__file__).resolve().parent.parent
+THREADPOOL_SIZE = 40
+STREAM_CHUNKS = 5
+ANSWER = "Yes, up to 20 hours per week on campus."
+
+# Stand-in Gemini (run by uvicorn in its own process): answers after STAND_IN_LATENCY_MS.
+stand_in_app = FastAPI()
+_stats = {"calls": 0, "in_flight": 0, "peak_in_flight": 0, "connections": set(), "known": set()}
+
+
+def _candidate(text: str) -> dict:
+    return {"candidates": [{"content": {"parts": [{"text": text}]}}]}
+
+
+async def _sse_answer(latency_s: float):
+    words = ANSWER.split(" ")
+    step = -(-len(words) // STREAM_CHUNKS)
+    try:
+        for i in range(0, len(words), step):
+            await asyncio.sleep(latency_s / STREAM_CHUNKS)
+            piece = " ".join(words[i:i + step]) + (" " if i + step < len(words) else "")
+            yield f"data: {json.dumps(_candidate(piece))}\r\n\r\n"
+    finally:
+        _stats["in_flight"] -= 1
+
+
+@stand_in_app.post("/v1beta/models/{model_action}")
+async def _generate(model_action: str, request: Request):
+    _stats["calls"] += 1
+    _stats["connections"].add(request.client.port)
+    _stats["in_flight"] += 1
+    _stats["peak_in_flight"] = max(_stats["peak_in_flight"], _stats["in_flight"])
+    latency_s = float(os.getenv("STAND_IN_LATENCY_MS", "500")) / 1000
+    if model_action.endswith(":streamGenerateContent"):
+        return StreamingResponse(_sse_answer(latency_s), media_type="text/event-stream")
+    try:
+        await asyncio.sleep(latency_s)
+    finally:
+        _stats["in_flight"] -= 1
+    return _candidate(ANSWER)
+
+
+@stand_in_app.post("/stats/reset")
+def _reset_stats() -> dict:
+    _stats.update(calls=0, peak_in_flight=0, known=_stats["known"] | _stats["connections"], connections=set())
+    return {}
+
+
+@stand_in_app.get("/stats")
+def _get_stats() -> dict:
+    used = _stats["connections"]
+    return {**_stats, "connections": len(used), "new_connections": len(used - _stats["known"]), "known": None}
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+async def _wait_ready(client: httpx.AsyncClient, url: str) -> None:
+    for _ in range(300):
+        try:
+            await client.get(url)
+            return
+        except httpx.TransportError:
+            await asyncio.sleep(0.1)
+    raise RuntimeError(f"{url} did not start")
+
+
+async def _stream_chat(client: httpx.AsyncClient, url: str, body: dict) -> tuple[bool, float, float]:
+    """POST to /chat/stream; returns (answer complete, seconds to first token, total seconds)."""
+    t0 = time.perf_counter()
+    ttft, event, text, sources = None, None, "", None
+    async with client.stream("POST", url, json=body) as resp:
+        async for line in resp.aiter_lines():
+            if line.startswith("event: "):
+                event = line[7:]
+            elif line.startswith("data: "):
+                data = json.loads(line[6:])
+                if event == "token":
+                    ttft = ttft if ttft is not None else time.perf_counter() - t0
+                    text += data["text"]
+                elif event == "sources":
+                    sources = data["sources"]
+    return text == ANSWER and sources == ["UniVisa AI"], ttft or 0.0, time.perf_counter() - t0
+
+
+async def run(n: int, latency_ms: float, stream: bool = False) -> bool:
+    gemini_port, api_port = _free_port(), _free_port()
+    env = {
+        **os.environ,
+        "STAND_IN_LATENCY_MS": str(latency_ms),
+        "GEMINI_BASE_URL": f"http://127.0.0.1:{gemini_port}/v1beta",
+        "GEMINI_API_KEY": "stand-in",
+        # Every chat asks the same question; measure Gemini calls, not the answer cache.
+        "ANSWER_CACHE_ENABLED": "false",
+        "RAG_TOP_K": "0",
+        "GEMINI_RPM": os.getenv("GEMINI_RPM", "0"),
+        "GEMINI_MAX_CONNECTIONS": os.getenv("GEMINI_MAX_CONNECTIONS", str(n)),
+    }
+    uvicorn = [sys.executable, "-m", "uvicorn", "--log-level", "warning", "--backlog", "4096", "--timeout-keep-alive", "120"]
+    procs = [
+        subprocess.Popen([*uvicorn, "scripts.bench_chat_concurrency:stand_in_app", "--port", str(gemini_port)], cwd=ROOT, env=env),
+        subprocess.Popen([*uvicorn, "main:app", "--port", str(api_port)], cwd=ROOT, env=env),
+    ]
+    try:
+        limits = httpx.Limits(max_connections=n)
+        async with httpx.AsyncClient(timeout=120, limits=limits) as client:
+            gemini, api = f"http://127.0.0.1:{gemini_port}", f"http://127.0.0.1:{api_port}"
+            await _wait_ready(client, f"{gemini}/stats")
+            await _wait_ready(client, f"{api}/")
+            body = {"student_id": "demo", "question": "Can I work 10 hours on campus?"}
+            # Warm up both hops' connection pools, then measure.
+            await asyncio.gather(*(client.post(f"{api}/chat", json=body) for _ in range(n)))
+            await client.post(f"{gemini}/stats/reset")
+            t0 = time.perf_counter()
+            if stream:
+                results = await asyncio.gather(*(_stream_chat(client, f"{api}/chat/stream", body) for _ in range(n)))
+            else:
+                responses = await asyncio.gather(*(client.post(f"{api}/chat", json=body) for _ in range(n)))
+            elapsed = time.perf_counter() - t0
+            stats = (await client.get(f"{gemini}/stats")).json()
+    finally:
+        for proc in procs:
+            proc.terminate()
+        for proc in procs:
+            proc.wait(timeout=10)
+
+    if stream:
+        ok = sum(1 for complete, _, _ in results if complete)
+        ttfts = sorted(ttft for _, ttft, _ in results)
+        totals = sorted(total for _, _, total in results)
+        print(f"stream ttft_p50={ttfts[n // 2] * 1000:.0f}ms total_p50={totals[n // 2] * 1000:.0f}ms")
+    else:
+        ok = sum(1 for r in responses if r.status_code == 200 and r.json()["sources"] == ["UniVisa AI"])
+    print(f"chats={n} ok={ok} gemini_latency={latency_ms:.0f}ms elapsed={elapsed:.2f}s "
+          f"throughput={n / elapsed:.0f}/s peak_in_flight={stats['peak_in_flight']} "
+          f"gemini_connections={stats['connections']} new={stats['new_connections']}")
+    print(f"40-thread sync bound: {THREADPOOL_SIZE / (latency_ms / 1000):.0f}/s, "
+          f"{n / THREADPOOL_SIZE * latency_ms / 1000:.2f}s for {n} chats")
+    return ok == n
+
+
+def main() -> None:
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 400
+    latency_ms = float(sys.argv[2]) if len(sys.argv) > 2 else 500
+    stream = len(sys.argv) > 3 and sys.argv[3] == "stream"
+    if not asyncio.run(run(n, latency_ms, stream)):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
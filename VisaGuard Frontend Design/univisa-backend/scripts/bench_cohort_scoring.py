@@ -0,0 +1,70 @@
+"""
+Cross-check and time the per-student risk engine against the vectorized cohort scorer.
+Usage: python scripts/bench_cohort_scoring.py [N]
+"""
+import random
+import sys
+import time
+from datetime import date, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from models.student import StudentProfile, VisaType, EnrollmentStatus  # noqa: E402
+from services.risk_engine import calculate_risk  # noqa: E402
+from services.risk_batch import columns_from_profiles, materialize, score_cohort  # noqa: E402
+
+
+def synthetic_cohort(n: int, today: date, seed: int = 7) -> list[StudentProfile]:
+    rng = random.Random(seed)
+    out = []
+    for i in range(n):
+        on_opt = rng.random() < 0.2
+        end = today + timedelta(days=rng.randint(-30, 400))
+        opt_end = today + timedelta(days=rng.randint(-10, 365)) if on_opt and rng.random() < 0.9 else None
+        out.append(StudentProfile(
+            student_id=f"s{i}",
+            full_name=f"Student {i}",
+            university="Synthetic University",
+            country_of_origin=rng.choice(["India", "China", "Brazil", "Nigeria"]),
+            visa_type=rng.choice([VisaType.F1, VisaType.J1]),
+            program_start_date=end - timedelta(days=730),
+            program_end_date=end,
+            enrollment_status=rng.choice(list(EnrollmentStatus)),
+            weekly_work_hours=rng.choice([0.0, 10.0, 17.0, 17.5, 18.0, 20.0, 20.5, 25.0]),
+            on_opt=on_opt,
+            on_cpt=not on_opt and rng.random() < 0.15,
+            opt_start_date=None,
+            opt_end_date=opt_end,
+            traveling_soon=rng.random() < 0.1,
+            changing_employer=False,
+            changing_courses=False,
+        ))
+    return out
+
+
+def main() -> None:
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    today = date.today()
+    profiles = synthetic_cohort(n, today)
+
+    t0 = time.perf_counter()
+    scalar = [calculate_risk(p, today=today) for p in profiles]
+    t_scalar = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    result = score_cohort(columns_from_profiles(profiles), today)
+    t_batch = time.perf_counter() - t0
+
+    mismatches = 0
+    for i, p in enumerate(profiles):
+        if materialize(p, result, i) != scalar[i]:
+            mismatches += 1
+    print(f"students={n} scalar={t_scalar * 1000:.1f}ms batch={t_batch * 1000:.1f}ms "
+          f"speedup={t_scalar / t_batch:.1f}x mismatches={mismatches}")
+    if mismatches:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
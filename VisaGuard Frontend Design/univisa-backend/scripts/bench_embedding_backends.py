@@ -0,0 +1,106 @@
+"""
+Compare the torch and int8 ONNX embedding backends: load time, peak RSS, throughput and agreement.
+Usage: python scripts/bench_embedding_backends.py [N_SENTENCES] [MIN_COSINE]
+Each backend runs in a fresh subprocess, so load time includes importing its libraries and RSS
+is that process alone. Fails unless every sentence's ONNX embedding has cosine similarity of at
+least MIN_COSINE (default 0.98) with the torch embedding. Export the ONNX model first with
+scripts/export_onnx_embedder.py.
+"""
+import json
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+TOPICS = ["on-campus work", "CPT", "OPT", "STEM OPT", "travel", "a reduced course load", "a program extension", "an H-1B petition"]
+ASKS = [
+    "Can I work {h} hours a week during {t}?",
+    "What happens to my status if I miss the deadline for {t}?",
+    "How many days before my program ends should I apply for {t}?",
+    "Do I need a new I-20 for {t} if I change employers after {h} days?",
+    "My DSO mentioned {t}; what documents should I bring?",
+]
+
+
+def sentences(n: int) -> list[str]:
+    return [ASKS[i % len(ASKS)].format(h=10 + i % 31, t=TOPICS[i // len(ASKS) % len(TOPICS)]) + f" (#{i})" for i in range(n)]
+
+
+def _peak_rss_mib() -> float:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 2**20 if sys.platform == "darwin" else peak / 2**10  # bytes on macOS, KiB on Linux
+
+
+def worker(backend: str, n: int, out_path: str) -> None:
+    """Runs in the subprocess: load one backend, time it and save its embeddings."""
+    from services.embedding_service import model_loader
+
+    texts = sentences(n)
+    rss_before = _peak_rss_mib()
+    t0 = time.perf_counter()
+    model = model_loader(backend)()
+    model.encode(["warm-up"], normalize_embeddings=True)
+    load_s = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    vectors = np.asarray(model.encode(texts, batch_size=64, normalize_embeddings=True), np.float32)
+    encode_s = time.perf_counter() - t0
+    singles = []
+    for text in texts[:50]:
+        t1 = time.perf_counter()
+        model.encode([text], normalize_embeddings=True)
+        singles.append(time.perf_counter() - t1)
+    np.save(out_path, vectors)
+    print(json.dumps({
+        "load_s": round(load_s, 2),
+        "rss_mib": round(_peak_rss_mib(), 1),
+        "rss_before_load_mib": round(rss_before, 1),
+        "per_second": round(n / encode_s, 1),
+        "single_p50_ms": round(sorted(singles)[len(singles) // 2] * 1000, 2),
+    }))
+
+
+def run_backend(backend: str, n: int, tmp: Path) -> tuple[dict, np.ndarray]:
+    out = tmp / f"{backend}.npy"
+    proc = subprocess.run(
+        [sys.executable, __file__, "--worker", backend, str(n), str(out)],
+        cwd=ROOT, capture_output=True, text=True,
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(f"{backend} backend failed:\n{proc.stderr.strip()[-2000:]}")
+    return json.loads(proc.stdout.strip().splitlines()[-1]), np.load(out)
+
+
+def main() -> None:
+    if len(sys.argv) > 1 and sys.argv[1] == "--worker":
+        worker(sys.argv[2], int(sys.argv[3]), sys.argv[4])
+        return
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    min_cosine = float(sys.argv[2]) if len(sys.argv) > 2 else 0.98
+    with tempfile.TemporaryDirectory() as tmp:
+        results = {}
+        for backend in ("torch", "onnx"):
+            try:
+                results[backend] = run_backend(backend, n, Path(tmp))
+            except RuntimeError as e:
+                print(e)
+                sys.exit(1)
+            stats = results[backend][0]
+            print(f"{backend:5s} load={stats['load_s']}s peak_rss={stats['rss_mib']}MiB "
+                  f"(before load {stats['rss_before_load_mib']}MiB) throughput={stats['per_second']}/s "
+                  f"single_p50={stats['single_p50_ms']}ms")
+    cosines = np.sum(results["torch"][1] * results["onnx"][1], axis=1)
+    print(f"cosine(onnx, torch) over {n} sentences: min={cosines.min():.4f} mean={cosines.mean():.4f} "
+          f"threshold={min_cosine}")
+    if cosines.min() < min_cosine:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
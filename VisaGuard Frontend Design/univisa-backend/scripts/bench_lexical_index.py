@@ -0,0 +1,87 @@
+"""
+Build time, size and query latency of the BM25 lexical index on a synthetic corpus.
+Usage: python scripts/bench_lexical_index.py [N_CHUNKS] [QUERIES]
+Chunks are ~300 Zipf-distributed words (~2000 chars, like scripts/ingest_docs.py chunks) with
+form numbers and program terms mixed in. Queries are short known-term questions (the ones
+RAG_RETRIEVAL=hybrid answers from BM25 alone) and longer free-text questions.
+"""
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from services.lexical_index import LexicalIndex, is_known_term_query, write_index  # noqa: E402
+
+WORDS_PER_CHUNK = 300
+VOCAB_SIZE = 30000
+TERMS = ["I-20", "I-94", "I-765", "I-983", "DS-2019", "cap-gap", "SEVIS", "OPT", "CPT", "STEM OPT", "H-1B",
+         "E-Verify", "travel signature", "grace period", "reduced course load", "unemployment days"]
+KNOWN_QUERIES = ["I-20 travel signature", "cap-gap", "SEVIS transfer", "I-983 training plan", "DS-2019 extension",
+                 "I-765 processing", "H-1B cap-gap", "OPT unemployment days"]
+
+
+def vocabulary(rng: np.random.Generator) -> np.ndarray:
+    syllables = ["ba", "ce", "di", "fo", "gu", "ha", "je", "ki", "lo", "mu", "na", "pe", "qi", "ro", "su", "ta",
+                 "ve", "wi", "xo", "yu", "za", "tion", "ment", "er", "ing", "al"]
+    words = {"".join(rng.choice(syllables, rng.integers(2, 5))) for _ in range(VOCAB_SIZE * 2)}
+    return np.array(sorted(words)[:VOCAB_SIZE], dtype=object)
+
+
+def corpus(n: int, vocab: np.ndarray, rng: np.random.Generator) -> list[str]:
+    ranks = np.minimum(rng.zipf(1.1, n * WORDS_PER_CHUNK), len(vocab)) - 1
+    words = vocab[ranks].reshape(n, WORDS_PER_CHUNK)
+    # ~1 in 5 chunks mentions a form or program term a few times
+    for i in np.flatnonzero(rng.random(n) < 0.2):
+        words[i, rng.integers(0, WORDS_PER_CHUNK, 3)] = TERMS[i % len(TERMS)]
+    return [" ".join(row) for row in words]
+
+
+def latencies(index: LexicalIndex, questions: list[str]) -> tuple[float, float]:
+    ms = []
+    for q in questions:
+        t0 = time.perf_counter()
+        index.search(q, 8)
+        ms.append((time.perf_counter() - t0) * 1000)
+    return float(np.percentile(ms, 50)), float(np.percentile(ms, 99))
+
+
+def main() -> None:
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    count = int(sys.argv[2]) if len(sys.argv) > 2 else 500
+    rng = np.random.default_rng(0)
+    vocab = vocabulary(rng)
+    t0 = time.perf_counter()
+    texts = corpus(n, vocab, rng)
+    sources = [f"uscis_doc_{i % 500}" for i in range(n)]
+    print(f"{n} chunks generated in {time.perf_counter() - t0:.1f}s")
+
+    known = [KNOWN_QUERIES[i % len(KNOWN_QUERIES)] for i in range(count)]
+    free = [" ".join(vocab[rng.integers(0, 2000, 8)]) + "?" for _ in range(count)]
+    routed = sum(is_known_term_query(q) for q in known + free)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        t0 = time.perf_counter()
+        path = write_index(texts, sources, index_dir=Path(tmp))
+        build_s = time.perf_counter() - t0
+        size_mb = sum(f.stat().st_size for f in path.iterdir()) / 2**20
+        payload_mb = sum((path / f).stat().st_size for f in ("texts.bin", "offsets.npy", "source_ids.npy")) / 2**20
+        t0 = time.perf_counter()
+        index = LexicalIndex(Path(tmp))
+        stats = (len(index), index.stats())
+        load_s = time.perf_counter() - t0
+        print(f"build {build_s:.1f}s ({n / build_s:,.0f} chunks/s), {stats[1]['terms']:,} terms, "
+              f"{stats[1]['postings']:,} postings, {size_mb:.0f}MiB on disk ({payload_mb:.0f}MiB chunk text), "
+              f"load {load_s:.2f}s")
+        for name, questions in (("known-term", known), ("free-text", free)):
+            index.search(questions[0], 8)
+            p50, p99 = latencies(index, questions)
+            print(f"{name:10s} queries: p50={p50:.2f}ms p99={p99:.2f}ms")
+    print(f"short-circuited to BM25 only in hybrid mode: {routed}/{len(known) + len(free)} queries")
+
+
+if __name__ == "__main__":
+    main()
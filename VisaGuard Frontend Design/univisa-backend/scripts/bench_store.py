@@ -0,0 +1,62 @@
+"""
+Compare read/write throughput of the in-memory and SQLite student stores.
+Usage: python scripts/bench_store.py [N]
+Uses a throwaway database in a temp directory; data/univisa.db is not touched.
+"""
+import random
+import sys
+import tempfile
+import time
+from datetime import date
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from scripts.bench_cohort_scoring import synthetic_cohort  # noqa: E402
+from services.store import ConnectionPool, student_table  # noqa: E402
+
+
+def _rate(n: int, seconds: float) -> str:
+    return f"{n / seconds:,.0f}/s" if seconds > 0 else "inf"
+
+
+def bench(name: str, store, profiles, lookups: list[str]) -> None:
+    n = len(profiles)
+
+    t0 = time.perf_counter()
+    for p in profiles:
+        store[p.student_id] = p
+    t_single = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    store.update((p.student_id, p) for p in profiles)
+    t_batch = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    for sid in lookups:
+        store[sid]
+    t_get = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    scanned = len(list(store.values()))
+    t_scan = time.perf_counter() - t0
+
+    assert scanned == n and len(store) == n
+    print(f"{name:7s} write={_rate(n, t_single)} batch_write={_rate(n, t_batch)} "
+          f"get={_rate(len(lookups), t_get)} scan={_rate(n, t_scan)}")
+
+
+def main() -> None:
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    profiles = synthetic_cohort(n, date.today())
+    rng = random.Random(3)
+    lookups = [rng.choice(profiles).student_id for _ in range(n)]
+
+    bench("memory", {}, profiles, lookups)
+    with tempfile.TemporaryDirectory() as tmp:
+        pool = ConnectionPool(Path(tmp) / "bench.db", size=4)
+        bench("sqlite", student_table(pool), profiles, lookups)
+
+
+if __name__ == "__main__":
+    main()
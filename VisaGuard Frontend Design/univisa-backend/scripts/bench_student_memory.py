@@ -0,0 +1,77 @@
+"""
+Bytes per student of the dict-of-StudentProfile store vs the columnar student table.
+Usage: python scripts/bench_student_memory.py [N]
+Also checks that every profile and the cohort columns read back unchanged, and times a full
+pass over each store: profile by profile (read_all) and as score_cohort columns (columns).
+"""
+import gc
+import sys
+import time
+import tracemalloc
+from datetime import date
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import numpy as np  # noqa: E402
+
+from models.student import StudentProfile  # noqa: E402
+from scripts.bench_cohort_scoring import synthetic_cohort  # noqa: E402
+from services.risk_batch import columns_from_profiles, store_columns  # noqa: E402
+from services.student_table import ColumnarStudentTable  # noqa: E402
+
+
+def measure(name: str, build, profiles: list[StudentProfile]) -> object:
+    """Build a store from JSON copies of profiles and report the memory it retains."""
+    payloads = [p.model_dump_json() for p in profiles]
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    store = build(StudentProfile.model_validate_json(s) for s in payloads)
+    gc.collect()
+    retained = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+
+    t0 = time.perf_counter()
+    for sid in store:
+        store[sid]
+    t_scan = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    store_columns(store, list(store))
+    t_cols = time.perf_counter() - t0
+    n = len(profiles)
+    print(f"{name:8s} bytes/student={retained / n:,.0f} total={retained / 2**20:.1f}MiB "
+          f"read_all={t_scan * 1000:.0f}ms columns={t_cols * 1000:.0f}ms")
+    return store
+
+
+# CohortColumns arrays compared exactly; weekly_work_hours only has to give the same rule outcomes
+COLUMN_FIELDS = ("program_end", "opt_end", "has_opt_end", "enrollment", "on_opt", "on_cpt", "traveling_soon")
+
+
+def build_columnar(profiles) -> ColumnarStudentTable:
+    table = ColumnarStudentTable()
+    for p in profiles:
+        table[p.student_id] = p
+    return table
+
+
+def main() -> None:
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    profiles = synthetic_cohort(n, date.today())
+    measure("dict", lambda ps: {p.student_id: p for p in ps}, profiles)
+    table = measure("columnar", build_columnar, profiles)
+
+    mismatches = sum(1 for p in profiles if table[p.student_id] != p)
+    expected, got = columns_from_profiles(profiles), table.columns()
+    columns_match = expected.student_ids == got.student_ids and all(
+        np.array_equal(getattr(expected, f), getattr(got, f)) for f in COLUMN_FIELDS
+    )
+    mismatches += not columns_match
+    print(f"students={n} mismatches={mismatches} columns_match={columns_match}")
+    if mismatches:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
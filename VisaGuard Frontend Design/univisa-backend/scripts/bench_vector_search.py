@@ -0,0 +1,111 @@
+"""
+Compare top-k query latency of the NumPy vector index (exact, and HNSW when hnswlib is installed)
+with the ChromaDB path, on a synthetic corpus of clustered 384-d vectors with ~2000-char chunks.
+Usage: python scripts/bench_vector_search.py [N_CHUNKS] [QUERIES]
+Each store is built in a temp dir and queried the way services/rag_service._vector_search does
+(count, then top-5 with documents and metadata). Recall@5 is measured against exact search.
+"""
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from services.embedding_service import EMBED_DIM  # noqa: E402
+from services.vector_index import NumpyVectorIndex, write_index  # noqa: E402
+
+TOP_K = 5
+CLUSTERS = 64
+
+
+def corpus(n: int, rng: np.random.Generator) -> tuple[np.ndarray, list[str], list[str]]:
+    centers = rng.standard_normal((CLUSTERS, EMBED_DIM)).astype(np.float32)
+    labels = rng.integers(0, CLUSTERS, n)
+    vectors = centers[labels] + 0.8 * rng.standard_normal((n, EMBED_DIM)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    filler = "F-1 students may work on campus up to 20 hours per week while school is in session. " * 24
+    texts = [f"[chunk {i}] {filler}"[:2000] for i in range(n)]
+    sources = [f"uscis_doc_{label}" for label in labels]
+    return vectors, texts, sources
+
+
+def queries(vectors: np.ndarray, count: int, rng: np.random.Generator) -> np.ndarray:
+    q = vectors[rng.integers(0, len(vectors), count)] + 0.3 * rng.standard_normal((count, EMBED_DIM)).astype(np.float32)
+    return q / np.linalg.norm(q, axis=1, keepdims=True)
+
+
+def timed(search, qs: np.ndarray) -> tuple[list[float], list[set]]:
+    search(qs[0])  # first query pays page-in / lazy load
+    latencies, hits = [], []
+    for q in qs:
+        t0 = time.perf_counter()
+        hits.append(search(q))
+        latencies.append(time.perf_counter() - t0)
+    return latencies, hits
+
+
+def report(name: str, latencies: list[float], hits: list[set], truth: list[set]) -> None:
+    ms = np.array(latencies) * 1000
+    recall = np.mean([len(h & t) / len(t) for h, t in zip(hits, truth)])
+    print(f"{name:14s} p50={np.percentile(ms, 50):7.2f}ms p99={np.percentile(ms, 99):7.2f}ms recall@{TOP_K}={recall:.3f}")
+
+
+def main() -> None:
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    count = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+    rng = np.random.default_rng(0)
+    vectors, texts, sources = corpus(n, rng)
+    qs = queries(vectors, count, rng)
+    truth = [set(np.argsort(-(vectors @ q))[:TOP_K].tolist()) for q in qs]
+    chunk_id = {t: i for i, t in enumerate(texts)}
+
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        t0 = time.perf_counter()
+        write_index(vectors, texts, sources, index_dir=tmp / "exact", hnsw_threshold=n + 1)
+        print(f"{n} chunks, {count} queries; numpy index written in {time.perf_counter() - t0:.1f}s")
+        index = NumpyVectorIndex(tmp / "exact")
+        report("numpy exact", *timed(lambda q: {chunk_id[r["text"]] for r in index.search(q, TOP_K)}, qs), truth)
+
+        try:
+            import hnswlib  # noqa: F401
+        except ImportError:
+            print("numpy hnsw     skipped (pip install hnswlib)")
+        else:
+            t0 = time.perf_counter()
+            write_index(vectors, texts, sources, index_dir=tmp / "hnsw", hnsw_threshold=0)
+            print(f"HNSW graph built in {time.perf_counter() - t0:.1f}s")
+            graph = NumpyVectorIndex(tmp / "hnsw")
+            report("numpy hnsw", *timed(lambda q: {chunk_id[r["text"]] for r in graph.search(q, TOP_K)}, qs), truth)
+
+        try:
+            import chromadb
+            from chromadb.config import Settings
+        except ImportError:
+            print("chroma         skipped (chromadb not installed)")
+            return
+        t0 = time.perf_counter()
+        client = chromadb.PersistentClient(path=str(tmp / "chroma"), settings=Settings(anonymized_telemetry=False))
+        coll = client.get_or_create_collection("uscis_docs", metadata={"description": "USCIS policy chunks"})
+        for i in range(0, n, 5000):
+            coll.add(
+                ids=[f"doc_{j}" for j in range(i, min(n, i + 5000))],
+                embeddings=vectors[i:i + 5000].tolist(),
+                documents=texts[i:i + 5000],
+                metadatas=[{"source": s} for s in sources[i:i + 5000]],
+            )
+        print(f"Chroma collection built in {time.perf_counter() - t0:.1f}s")
+
+        def chroma_search(q: np.ndarray) -> set:
+            k = min(TOP_K, coll.count())
+            res = coll.query(query_embeddings=[q.tolist()], n_results=k, include=["documents", "metadatas"])
+            return {chunk_id[t] for t in res["documents"][0]}
+
+        report("chroma", *timed(chroma_search, qs), truth)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,186 @@
+"""
+Check services/actian_store.ActianStore against a fake cortex client: pooled concurrency,
+cached collection count, batch search and delete, timeouts and retries.
+Usage: python scripts/check_actian_pool.py
+FakeCortexClient mimics the cortex client calls the store makes (has_collection, count,
+search, batch_upsert, delete, close) over an in-process "server" with a fixed latency per call, and
+serializes calls per client like one gRPC channel does; BatchFakeCortexClient adds batch_search
+and batch_delete. No Actian server or cortex install needed.
+"""
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from types import SimpleNamespace
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from services.actian_store import ActianStore  # noqa: E402
+from services.answer_cache import write_corpus_version  # noqa: E402
+
+LATENCY_S = 0.02
+DIM = 8
+
+
+class FakeServer:
+    def __init__(self):
+        self.collections: dict[str, dict] = {}
+        self.calls: dict[str, int] = {}
+        self.fail_next = 0  # raise on this many upcoming calls
+        self.hang_next = 0  # block this many upcoming calls for 10x the latency budget
+        self.lock = threading.Lock()
+
+    def enter(self, method: str) -> None:
+        with self.lock:
+            self.calls[method] = self.calls.get(method, 0) + 1
+            fail, hang = self.fail_next > 0, self.fail_next <= 0 and self.hang_next > 0
+            self.fail_next -= fail
+            self.hang_next -= hang
+        time.sleep(LATENCY_S * (50 if hang else 1))
+        if fail:
+            raise ConnectionError("UNAVAILABLE: fake server dropped the call")
+
+
+class FakeCortexClient:
+    def __init__(self, server: FakeServer, address: str):
+        self.server = server
+        self.address = address
+        self.channel = threading.Lock()
+        self.closed = False
+
+    def _enter(self, method: str) -> None:
+        if self.closed:
+            raise RuntimeError("client closed")
+        self.server.enter(method)
+
+    def has_collection(self, name):
+        with self.channel:
+            self._enter("has_collection")
+            return name in self.server.collections
+
+    def count(self, name):
+        with self.channel:
+            self._enter("count")
+            return len(self.server.collections[name])
+
+    def batch_upsert(self, name, ids, vectors, payloads):
+        with self.channel:
+            self._enter("batch_upsert")
+            coll = self.server.collections.setdefault(name, {})
+            coll.update({i: (v, p) for i, v, p in zip(ids, vectors, payloads)})
+
+    def search(self, name, query, top_k):
+        with self.channel:
+            self._enter("search")
+        return [SimpleNamespace(payload=p, score=s) for s, p in self._rank(name, query, top_k)]
+
+    def _rank(self, name, query, top_k):
+        scored = [(sum(a * b for a, b in zip(v, query)), p) for v, p in self.server.collections[name].values()]
+        return sorted(scored, key=lambda sp: -sp[0])[:top_k]
+
+    def delete(self, name, point_id):
+        with self.channel:
+            self._enter("delete")
+            self.server.collections[name].pop(point_id, None)
+
+    def close(self):
+        self.closed = True
+
+
+class BatchFakeCortexClient(FakeCortexClient):
+    def batch_search(self, name, queries, top_k):
+        with self.channel:
+            self._enter("batch_search")
+        return [[SimpleNamespace(payload=p, score=s) for s, p in self._rank(name, q, top_k)] for q in queries]
+
+    def batch_delete(self, name, ids):
+        with self.channel:
+            self._enter("batch_delete")
+            for point_id in ids:
+                self.server.collections[name].pop(point_id, None)
+
+
+def _check(label: str, ok: bool) -> bool:
+    print(f"{'ok  ' if ok else 'FAIL'} {label}")
+    return ok
+
+
+def main() -> None:
+    server = FakeServer()
+    version_path = Path(tempfile.mkdtemp()) / "corpus_version.json"
+    store = ActianStore(
+        address="fake:50051", client_factory=lambda addr: FakeCortexClient(server, addr),
+        pool_size=4, timeout=LATENCY_S * 10, retries=2, metadata_ttl=60, version_path=version_path,
+    )
+    vectors = [[float((i >> b) & 1) for b in range(DIM)] for i in range(64)]
+    store.upsert(list(range(64)), vectors, [{"source": f"doc{i % 4}", "text": f"chunk {i}"} for i in range(64)])
+    write_corpus_version(64, version_path)
+    results = []
+
+    store.search(vectors[0], 3)
+    server.calls.clear()
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(16) as pool:
+        hits = list(pool.map(lambda v: store.search(v, 3), vectors[:32]))
+    elapsed = time.perf_counter() - t0
+    serial = 32 * LATENCY_S
+    results.append(_check(f"32 concurrent searches in {elapsed * 1000:.0f}ms (one client: ~{serial * 1000:.0f}ms)",
+                          elapsed < serial / 2))
+    results.append(_check("top hit is the query's own chunk", all(h[0]["text"] == f"chunk {i}" for i, h in enumerate(hits))))
+    results.append(_check(f"no count round trips while cached (calls: {server.calls})",
+                          server.calls.get("count", 0) == 0 and server.calls.get("search") == 32))
+
+    store.upsert([64], [[1.0] * DIM], [{"source": "doc0", "text": "chunk 64"}])
+    write_corpus_version(65, version_path)
+    results.append(_check("count re-read after ingest", store.count() == 65 and server.calls.get("count") == 1))
+
+    server.calls.clear()
+    batch = store.batch_search(vectors[:16], 2)
+    results.append(_check(f"batch_search returns {len(batch)} result lists in input order",
+                          len(batch) == 16 and all(b[0]["text"] == f"chunk {i}" for i, b in enumerate(batch))))
+
+    store.delete(list(range(56, 65)))
+    write_corpus_version(56, version_path)
+    results.append(_check(f"delete: one call per id without batch_delete ({server.calls.get('delete')} calls)",
+                          server.calls.get("delete") == 9 and store.count() == 56))
+
+    server.fail_next = 1
+    results.append(_check("transient failure retried", store.search(vectors[5], 1)[0]["text"] == "chunk 5"))
+    server.hang_next = 1
+    t0 = time.perf_counter()
+    hit = store.search(vectors[6], 1)
+    results.append(_check(f"hung call abandoned after the timeout and retried ({(time.perf_counter() - t0) * 1000:.0f}ms)",
+                          hit[0]["text"] == "chunk 6" and store.timeouts == 1 and store.clients_replaced == 1))
+    server.fail_next = 10
+    try:
+        store.search(vectors[7], 1)
+        failed = False
+    except ConnectionError:
+        failed = True
+    server.fail_next = 0
+    results.append(_check("error raised once retries are exhausted", failed))
+    print(store.stats())
+    store.close()
+
+    store = ActianStore(
+        address="fake:50051", client_factory=lambda addr: BatchFakeCortexClient(server, addr),
+        pool_size=4, timeout=LATENCY_S * 10, retries=2, metadata_ttl=60, version_path=version_path,
+    )
+    server.calls.clear()
+    batch = store.batch_search(vectors[:16], 2)
+    results.append(_check(f"batch_search is one call when the client has it (calls: {server.calls})",
+                          server.calls.get("batch_search") == 1 and "search" not in server.calls
+                          and all(b[0]["text"] == f"chunk {i}" for i, b in enumerate(batch))))
+    store.delete(list(range(40, 56)), batch_size=10)
+    write_corpus_version(40, version_path)
+    results.append(_check(f"batch_delete per batch of ids ({server.calls.get('batch_delete')} calls)",
+                          server.calls.get("batch_delete") == 2 and store.count() == 40))
+    store.close()
+    if not all(results):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
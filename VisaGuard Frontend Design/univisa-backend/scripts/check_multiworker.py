@@ -0,0 +1,129 @@
+"""
+Start two API processes on one SQLite database and check that writes through one are
+immediately visible, with correct risk, through the other.
+Usage: python scripts/check_multiworker.py
+Each process stands in for one `uvicorn --workers N` worker; separate ports let the check
+pick which one serves each request. Uses a throwaway database in a temp directory.
+"""
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.error
+import urllib.request
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+PROFILE = {
+    "full_name": "Multi Worker",
+    "university": "Georgia Institute of Technology",
+    "country_of_origin": "India",
+    "visa_type": "F-1",
+    "program_start_date": "2024-08-15",
+    "program_end_date": "2027-05-15",
+    "enrollment_status": "full_time",
+    "weekly_work_hours": 10,
+    "on_opt": False,
+    "on_cpt": False,
+    "traveling_soon": False,
+    "changing_employer": False,
+    "changing_courses": False,
+}
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _call(port: int, method: str, path: str, body=None):
+    data = json.dumps(body).encode() if body is not None else None
+    req = urllib.request.Request(
+        f"http://127.0.0.1:{port}{path}", data=data, method=method, headers={"Content-Type": "application/json"}
+    )
+    with urllib.request.urlopen(req, timeout=30) as resp:
+        return json.loads(resp.read())
+
+
+def _wait_ready(port: int, proc: subprocess.Popen) -> None:
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError(f"worker on port {port} exited with {proc.returncode}")
+        try:
+            _call(port, "GET", "/")
+            return
+        except (urllib.error.URLError, ConnectionError):
+            time.sleep(0.2)
+    raise RuntimeError(f"worker on port {port} did not start")
+
+
+def _check(label: str, ok: bool) -> bool:
+    print(f"{'ok  ' if ok else 'FAIL'} {label}")
+    return ok
+
+
+def main() -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        env = {**os.environ, "UNIVISA_STORE": "sqlite", "UNIVISA_DB_PATH": str(Path(tmp) / "univisa.db")}
+        ports = [_free_port(), _free_port()]
+        procs = [
+            subprocess.Popen(
+                [sys.executable, "-m", "uvicorn", "main:app", "--port", str(p), "--log-level", "warning"],
+                cwd=ROOT, env=env,
+            )
+            for p in ports
+        ]
+        results: list[bool] = []
+        try:
+            for p, proc in zip(ports, procs):
+                _wait_ready(p, proc)
+            a, b = ports
+
+            sid = _call(a, "POST", "/student/profile", PROFILE)["student_id"]
+            risk_a = _call(a, "GET", f"/student/{sid}/risk")
+            risk_b = _call(b, "GET", f"/student/{sid}/risk")
+            results.append(_check("profile created on A is served by B with the same risk", risk_a == risk_b))
+
+            update = _call(a, "PATCH", f"/student/{sid}/profile", {"weekly_work_hours": 25})
+            risk_b = _call(b, "GET", f"/student/{sid}/risk")
+            results.append(_check(
+                "update on A replaces B's cached risk",
+                risk_b == update["risk"] and risk_b["risk_score"] != risk_a["risk_score"],
+            ))
+
+            cohort_b = {row["student_id"]: row for row in _call(b, "GET", "/dso/cohort")}
+            results.append(_check(
+                "B's cohort view has the updated score",
+                cohort_b.get(sid, {}).get("risk_score") == update["risk"]["risk_score"],
+            ))
+
+            _call(b, "PATCH", f"/student/{sid}/profile", {"weekly_work_hours": 10})
+            cohort_a = {row["student_id"]: row for row in _call(a, "GET", "/dso/cohort")}
+            results.append(_check(
+                "update on B replaces A's cohort row",
+                cohort_a.get(sid, {}).get("risk_score") == risk_a["risk_score"],
+            ))
+
+            cpt = _call(a, "POST", f"/cpt/student/{sid}/requests", {
+                "company_name": "Acme", "role": "Intern",
+                "expected_start_date": "2026-06-01", "expected_end_date": "2026-08-15",
+            })
+            listed = _call(b, "GET", f"/cpt/student/{sid}/requests")
+            results.append(_check("CPT request created on A is listed by B", [r["id"] for r in listed] == [cpt["id"]]))
+        finally:
+            for proc in procs:
+                proc.terminate()
+            for proc in procs:
+                proc.wait(timeout=10)
+    if not all(results):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -2,13 +2,17 @@
 Clustering pipeline: load reddit_posts.json -> embed -> UMAP -> HDBSCAN -> save clusters.json.
 """
 import json
+import sys
 from pathlib import Path
 
 import pandas as pd
-from sentence_transformers import SentenceTransformer
 import umap
 import hdbscan
 
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from services.embedding_service import get_embedding_service  # noqa: E402
+
 def main():
     data_dir = Path(__file__).resolve().parent.parent / "data"
     with open(data_dir / "reddit_posts.json", encoding="utf-8") as f:
@@ -23,8 +27,7 @@ def main():
             json.dump({}, f, indent=2)
         return
 
-    model = SentenceTransformer("all-MiniLM-L6-v2")
-    embeddings = model.encode(df["text"].tolist(), show_progress_bar=True)
+    embeddings = get_embedding_service().embed(df["text"].tolist(), use_cache=False)
 
     reducer = umap.UMAP(n_components=5, random_state=42)
     reduced = reducer.fit_transform(embeddings)
@@ -0,0 +1,56 @@
+"""
+Export all-MiniLM-L6-v2 to ONNX and quantize its weights to int8 for EMBEDDING_BACKEND=onnx.
+Usage: python scripts/export_onnx_embedder.py [OUT_DIR]
+Writes model_int8.onnx and tokenizer.json (and the fp32 model_fp32.onnx it was made from) to
+OUT_DIR, default data/models/all-MiniLM-L6-v2-onnx/. Needs the main requirements (torch,
+transformers) plus `pip install onnx onnxruntime`; serving needs only requirements-onnx.txt.
+"""
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from services.embedding_service import EMBEDDING_MODEL_NAME  # noqa: E402
+from services.onnx_embedder import ONNX_DIR  # noqa: E402
+
+HF_MODEL = f"sentence-transformers/{EMBEDDING_MODEL_NAME}"
+INPUTS = ("input_ids", "attention_mask", "token_type_ids")
+
+
+def export(out_dir: Path) -> Path:
+    import torch
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+    from transformers import AutoModel, AutoTokenizer
+
+    out_dir.mkdir(parents=True, exist_ok=True)
+    tokenizer = AutoTokenizer.from_pretrained(HF_MODEL)
+    model = AutoModel.from_pretrained(HF_MODEL).eval()
+    sample = tokenizer(["Can I work 20 hours on campus?", "OPT"], padding=True, return_tensors="pt")
+    fp32_path = out_dir / "model_fp32.onnx"
+    int8_path = out_dir / "model_int8.onnx"
+    axes = {0: "batch", 1: "sequence"}
+    with torch.no_grad():
+        torch.onnx.export(
+            model,
+            tuple(sample[name] for name in INPUTS),
+            str(fp32_path),
+            input_names=list(INPUTS),
+            output_names=["last_hidden_state", "pooler_output"],
+            dynamic_axes={**{name: axes for name in INPUTS}, "last_hidden_state": axes, "pooler_output": {0: "batch"}},
+            opset_version=14,
+        )
+    quantize_dynamic(str(fp32_path), str(int8_path), weight_type=QuantType.QInt8)
+    tokenizer.backend_tokenizer.save(str(out_dir / "tokenizer.json"))
+    return int8_path
+
+
+def main() -> None:
+    out_dir = Path(sys.argv[1]) if len(sys.argv) > 1 else ONNX_DIR
+    int8_path = export(out_dir)
+    fp32_mb = (out_dir / "model_fp32.onnx").stat().st_size / 2**20
+    print(f"Wrote {int8_path} ({int8_path.stat().st_size / 2**20:.1f}MiB, fp32 {fp32_mb:.1f}MiB) and tokenizer.json")
+    print("Check agreement with the torch model: python scripts/bench_embedding_backends.py")
+
+
+if __name__ == "__main__":
+    main()
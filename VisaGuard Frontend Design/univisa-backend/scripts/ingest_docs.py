@@ -1,18 +1,46 @@
 """
-Ingest USCIS docs from data/uscis_docs/: chunk (~500 tokens), embed with sentence-transformers,
-store in Actian VectorAI DB (if ACTIAN_VECTORAI_URL set) or ChromaDB.
+Ingest USCIS docs from data/uscis_docs/: chunk (~500 tokens), embed (services/embedding_service),
+store in the VECTOR_BACKEND store (numpy index in data/vector_index/, Actian VectorAI DB, or ChromaDB;
+unset means Actian if ACTIAN_VECTORAI_URL is set, else ChromaDB) and a BM25 index of the same chunks in
+data/lexical_index/, then record a new corpus version in data/corpus_version.json so cached chat
+answers are invalidated.
+
+Ingestion is incremental: each chunk's id is a hash of its file path and text, so only chunks
+that are not in the store yet are embedded, and chunks of edited or removed files are deleted.
+data/ingest_manifest.json records the files and chunk ids of the last run (the Actian collection
+cannot be listed). Re-running on an unchanged corpus embeds nothing and keeps the corpus version.
 See https://github.com/hackmamba-io/actian-vectorAI-db-beta
 """
+import hashlib
+import json
 import os
+import sys
+from datetime import datetime, timezone
 from pathlib import Path
+from typing import NamedTuple
+
+import numpy as np
 
-from sentence_transformers import SentenceTransformer
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from services.answer_cache import write_corpus_version  # noqa: E402
+from services import lexical_index  # noqa: E402
+from services.actian_store import ActianStore  # noqa: E402
+from services.embedding_service import EMBED_DIM, get_embedding_service  # noqa: E402
+from services.vector_index import stored_vectors, vector_backend, write_index  # noqa: E402
 
 # ~500 tokens ≈ ~2000 chars per chunk (rough)
 CHUNK_CHARS = 2000
 OVERLAP = 200
 COLLECTION_NAME = "uscis_docs"
-EMBED_DIM = 384  # all-MiniLM-L6-v2
+DATA_DIR = Path(__file__).resolve().parent.parent / "data"
+MANIFEST_PATH = DATA_DIR / "ingest_manifest.json"
+
+
+class Chunk(NamedTuple):
+    id: str
+    text: str
+    source: str
 
 
 def chunk_text(text: str, source: str) -> list[tuple[str, dict]]:
@@ -30,67 +58,149 @@ def chunk_text(text: str, source: str) -> list[tuple[str, dict]]:
     return chunks
 
 
+def chunk_id(path: str, text: str) -> str:
+    """Stable id for a chunk: the same text in the same file always gets the same id."""
+    text_hash = hashlib.sha256(text.encode("utf-8")).hexdigest()
+    return hashlib.sha256(f"{path}\0{text_hash}".encode("utf-8")).hexdigest()[:32]
+
+
+def actian_id(cid: str) -> int:
+    """Actian point ids are integers: the chunk id's first 60 bits."""
+    return int(cid[:15], 16)
+
+
+def read_corpus(docs_dir: Path) -> tuple[dict, list[Chunk]]:
+    """({relative path: {sha256, chunks}}, chunks in file order with duplicate ids dropped)."""
+    files, chunks = {}, {}
+    for path in sorted(docs_dir.glob("**/*.txt")):
+        rel = path.relative_to(docs_dir).as_posix()
+        raw = path.read_bytes()
+        text = raw.decode("utf-8", errors="ignore")
+        ids = []
+        for chunk, meta in chunk_text(text, source=path.stem):
+            cid = chunk_id(rel, chunk)
+            ids.append(cid)
+            chunks.setdefault(cid, Chunk(cid, chunk, meta["source"]))
+        files[rel] = {"sha256": hashlib.sha256(raw).hexdigest(), "chunks": ids}
+    return files, list(chunks.values())
+
+
+def load_manifest(path: Path = MANIFEST_PATH) -> dict:
+    try:
+        return json.loads(path.read_text(encoding="utf-8"))
+    except (FileNotFoundError, ValueError):
+        return {}
+
+
+def save_manifest(backend: str, files: dict, path: Path = MANIFEST_PATH) -> None:
+    manifest = {"backend": backend, "files": files, "ingested_at": datetime.now(timezone.utc).isoformat()}
+    tmp = path.with_suffix(".tmp")
+    tmp.write_text(json.dumps(manifest), encoding="utf-8")
+    os.replace(tmp, path)
+
+
+def embed(chunks: list[Chunk]) -> np.ndarray:
+    if not chunks:
+        return np.zeros((0, EMBED_DIM), np.float32)
+    print(f"Embedding {len(chunks)} new or changed chunks")
+    return get_embedding_service().embed([c.text for c in chunks], use_cache=False)
+
+
+def sync_numpy(chunks: list[Chunk]) -> tuple[int, int]:
+    """Rewrite the vector index if the chunk set changed, reusing stored embeddings by id."""
+    stored = stored_vectors()
+    new = [c for c in chunks if c.id not in stored]
+    stale = len(stored.keys() - {c.id for c in chunks})
+    if new or stale:
+        stored.update(zip((c.id for c in new), embed(new)))
+        vectors = np.stack([stored[c.id] for c in chunks])
+        path = write_index(vectors, [c.text for c in chunks], [c.source for c in chunks], ids=[c.id for c in chunks])
+        print(f"Wrote vector index of {len(chunks)} chunks to {path}")
+    return len(new), stale
+
+
+def sync_actian(chunks: list[Chunk], previous: set[str], legacy: bool) -> tuple[int, int]:
+    """Upsert chunks missing from the last run and delete the ones no longer in the corpus.
+
+    legacy: no manifest of an Actian ingest, so the collection may hold points from the positional ingest
+    (ids 0..n-1); n is taken from the collection's size before upserting, and they are all replaced.
+    """
+    new = [c for c in chunks if c.id not in previous]
+    stale = [actian_id(cid) for cid in previous - {c.id for c in chunks}]
+    store = ActianStore(pool_size=1, timeout=30)
+    try:
+        store.ensure_collection(EMBED_DIM)
+        if legacy:
+            stale += range(store.count())
+        if new:
+            payloads = [{"source": c.source, "text": c.text} for c in new]
+            store.upsert([actian_id(c.id) for c in new], embed(new).tolist(), payloads)
+        if stale:
+            store.delete(stale)
+    finally:
+        store.close()
+    print(f"Actian VectorAI DB at {store.address}: {len(new)} chunks upserted, {len(stale)} deleted")
+    return len(new), len(stale)
+
+
+def sync_chroma(chunks: list[Chunk]) -> tuple[int, int]:
+    """Upsert chunks whose id is not in the collection and delete ids no longer in the corpus."""
+    import chromadb
+    from chromadb.config import Settings
+    persist_dir = str(DATA_DIR / "chroma_db")
+    client = chromadb.PersistentClient(path=persist_dir, settings=Settings(anonymized_telemetry=False))
+    coll = client.get_or_create_collection(COLLECTION_NAME, metadata={"description": "USCIS policy chunks"})
+    existing = set(coll.get(include=[])["ids"])
+    new = [c for c in chunks if c.id not in existing]
+    stale = sorted(existing - {c.id for c in chunks})
+    if new:
+        coll.upsert(ids=[c.id for c in new], documents=[c.text for c in new],
+                    metadatas=[{"source": c.source} for c in new], embeddings=embed(new).tolist())
+    if stale:
+        coll.delete(ids=stale)
+    print(f"ChromaDB at {persist_dir}: {len(new)} chunks upserted, {len(stale)} deleted")
+    return len(new), len(stale)
+
+
 def main():
-    data_dir = Path(__file__).resolve().parent.parent / "data"
-    docs_dir = data_dir / "uscis_docs"
+    docs_dir = DATA_DIR / "uscis_docs"
     if not docs_dir.exists():
         docs_dir.mkdir(parents=True, exist_ok=True)
-    txt_files = list(docs_dir.glob("**/*.txt"))
-    if not txt_files:
+    files, chunks = read_corpus(docs_dir)
+    if not files:
         print("No .txt files in data/uscis_docs/. Add USCIS plain-text docs and re-run.")
         return
-    model = SentenceTransformer("all-MiniLM-L6-v2")
-    all_chunks = []
-    all_metas = []
-    for path in txt_files:
-        text = path.read_text(encoding="utf-8", errors="ignore")
-        for chunk_text_val, meta in chunk_text(text, source=path.stem):
-            all_chunks.append(chunk_text_val)
-            all_metas.append(meta)
-    if not all_chunks:
+    if not chunks:
         print("No chunks produced.")
         return
-    embeddings = model.encode(all_chunks).tolist()
-    n = len(all_chunks)
-    use_actian = bool(os.getenv("ACTIAN_VECTORAI_URL", "").strip())
-    if use_actian:
+    backend = vector_backend()
+    manifest = load_manifest()
+    previous = manifest.get("files", {}) if manifest.get("backend") == backend else {}
+    changed = sum(1 for rel, f in files.items() if rel in previous and previous[rel]["sha256"] != f["sha256"])
+    print(f"{len(files)} files ({len(files.keys() - previous.keys())} new, {changed} changed, "
+          f"{len(previous.keys() - files.keys())} removed), {len(chunks)} chunks")
+
+    if backend == "numpy":
+        new, stale = sync_numpy(chunks)
+    elif backend == "actian":
+        previous_ids = {cid for f in previous.values() for cid in f["chunks"]}
         try:
-            from cortex import CortexClient, DistanceMetric
+            new, stale = sync_actian(chunks, previous_ids, legacy=manifest.get("backend") != "actian")
         except ImportError:
             print("ACTIAN_VECTORAI_URL is set but cortex client not installed. Install from actian-vectorAI-db-beta repo.")
             return
-        url = os.getenv("ACTIAN_VECTORAI_URL", "localhost:50051").strip()
-        if url.startswith("http://"):
-            url = url[7:]
-        if url.startswith("https://"):
-            url = url[8:]
-        host, _, port = url.partition(":")
-        addr = f"{host}:{port}" if port else f"{url}:50051"
-        ids = list(range(n))
-        payloads = [{"source": m["source"], "text": c} for c, m in zip(all_chunks, all_metas)]
-        with CortexClient(addr) as client:
-            if not client.has_collection(COLLECTION_NAME):
-                client.create_collection(
-                    name=COLLECTION_NAME,
-                    dimension=EMBED_DIM,
-                    distance_metric=DistanceMetric.COSINE,
-                )
-            batch_size = 100
-            for i in range(0, n, batch_size):
-                batch_ids = ids[i : i + batch_size]
-                batch_vectors = embeddings[i : i + batch_size]
-                batch_payloads = payloads[i : i + batch_size]
-                client.batch_upsert(COLLECTION_NAME, batch_ids, batch_vectors, batch_payloads)
-        print(f"Ingested {len(all_chunks)} chunks from {len(txt_files)} files into Actian VectorAI DB at {addr}")
     else:
-        import chromadb
-        from chromadb.config import Settings
-        persist_dir = str(data_dir / "chroma_db")
-        client = chromadb.PersistentClient(path=persist_dir, settings=Settings(anonymized_telemetry=False))
-        coll = client.get_or_create_collection(COLLECTION_NAME, metadata={"description": "USCIS policy chunks"})
-        chroma_ids = [f"doc_{i}" for i in range(n)]
-        coll.upsert(ids=chroma_ids, documents=all_chunks, metadatas=all_metas, embeddings=embeddings)
-        print(f"Ingested {len(all_chunks)} chunks from {len(txt_files)} files into ChromaDB at {persist_dir}")
+        new, stale = sync_chroma(chunks)
+
+    if new or stale or not (lexical_index.INDEX_DIR / "CURRENT").exists():
+        path = lexical_index.write_index([c.text for c in chunks], [c.source for c in chunks])
+        print(f"Wrote BM25 index of {len(chunks)} chunks to {path}")
+    save_manifest(backend, files)
+    if not (new or stale):
+        print("Corpus unchanged; nothing embedded, corpus version kept.")
+        return
+    # Tells running backends to drop chat answers built on the previous corpus.
+    print(f"Corpus version {write_corpus_version(len(chunks))}")
 
 
 if __name__ == "__main__":
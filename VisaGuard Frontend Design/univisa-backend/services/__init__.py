@@ -1,5 +1,6 @@
 from .risk_engine import calculate_risk
+from .risk_batch import score_cohort
 from .alert_service import generate_alerts
 from .rag_service import query_rag
 
-__all__ = ["calculate_risk", "generate_alerts", "query_rag"]
+__all__ = ["calculate_risk", "score_cohort", "generate_alerts", "query_rag"]
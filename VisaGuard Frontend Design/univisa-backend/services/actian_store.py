@@ -0,0 +1,323 @@
+"""Actian VectorAI DB access for RAG (VECTOR_BACKEND=actian): a small pool of cortex clients,
+cached collection metadata, batch search, and per-call timeouts with retries.
+
+The cortex client is synchronous and one client serializes its calls, so concurrent chats
+each check out their own client (up to ACTIAN_POOL_SIZE). Collection existence and size are
+cached for ACTIAN_METADATA_TTL seconds and re-read as soon as ingestion writes a new
+data/corpus_version.json, so a search is one round trip instead of count + search.
+A call that times out leaves its client behind (it may still be blocked) and a fresh one is
+created in its place. Needs the cortex client from github.com/hackmamba-io/actian-vectorAI-db-beta.
+
+The cortex beta client is only known to search one query vector and delete one id per call.
+If the installed client has batch_search / batch_delete, those are used (one call per batch);
+otherwise batch_search() fans single searches out over the pool and delete() sends one call per id.
+"""
+import logging
+import os
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeout
+from pathlib import Path
+from typing import Callable, Optional, Sequence
+
+from services.answer_cache import CORPUS_VERSION_PATH
+from services.embedding_service import EMBED_DIM
+
+logger = logging.getLogger(__name__)
+
+COLLECTION_NAME = "uscis_docs"
+POOL_SIZE = int(os.getenv("ACTIAN_POOL_SIZE", "4"))
+CALL_TIMEOUT_S = float(os.getenv("ACTIAN_TIMEOUT", "2"))
+# Extra attempts after a failed or timed-out call (backoff 50ms, 100ms, ...)
+RETRIES = int(os.getenv("ACTIAN_RETRIES", "2"))
+METADATA_TTL_S = float(os.getenv("ACTIAN_METADATA_TTL", "30"))
+STAT_SAMPLES = 1000
+
+
+def actian_address(url: Optional[str] = None) -> str:
+    """host:port for the cortex client from ACTIAN_VECTORAI_URL (scheme stripped, port 50051 by default)."""
+    url = (url if url is not None else os.getenv("ACTIAN_VECTORAI_URL", "localhost:50051")).strip()
+    for scheme in ("http://", "https://"):
+        if url.startswith(scheme):
+            url = url[len(scheme):]
+    host, _, port = url.partition(":")
+    return f"{host}:{port or '50051'}"
+
+
+def cortex_client(address: str):
+    try:
+        from cortex import CortexClient
+    except ImportError as e:
+        raise ImportError(
+            "Actian VectorAI DB is set (ACTIAN_VECTORAI_URL) but the cortex client is not installed. "
+            "Install from: https://github.com/hackmamba-io/actian-vectorAI-db-beta "
+            "e.g. pip install actiancortex-0.1.0b1-py3-none-any.whl"
+        ) from e
+    return CortexClient(address)
+
+
+def _hit(result) -> dict:
+    payload = getattr(result, "payload", None) or {}
+    hit = {"source": payload.get("source", "USCIS"), "text": payload.get("text", "")}
+    score = getattr(result, "score", None)
+    if score is not None:
+        hit["score"] = float(score)
+    return hit
+
+
+def _close(client) -> None:
+    try:
+        close = getattr(client, "close", None)
+        if close is not None:
+            close()
+    except Exception:
+        pass
+
+
+class ActianStore:
+    """Pooled access to one Actian collection. Methods block; call them off the event loop."""
+
+    def __init__(
+        self,
+        address: Optional[str] = None,
+        client_factory: Callable[[str], object] = cortex_client,
+        pool_size: int = POOL_SIZE,
+        timeout: float = CALL_TIMEOUT_S,
+        retries: int = RETRIES,
+        metadata_ttl: float = METADATA_TTL_S,
+        collection: str = COLLECTION_NAME,
+        version_path: Path = CORPUS_VERSION_PATH,
+    ):
+        self.address = address or actian_address()
+        self._factory = client_factory
+        self.pool_size = max(1, pool_size)
+        self.timeout = timeout
+        self.retries = max(0, retries)
+        self.metadata_ttl = metadata_ttl
+        self.collection = collection
+        self._version_path = version_path
+        self._idle: queue.LifoQueue = queue.LifoQueue()
+        self._created = 0
+        self._pool_lock = threading.Lock()
+        # Runs each call so it can be abandoned at the timeout; sized for a full pool of stuck calls plus a fresh one.
+        self._calls = ThreadPoolExecutor(max_workers=self.pool_size * 2, thread_name_prefix="actian-call")
+        self._fanout = ThreadPoolExecutor(max_workers=self.pool_size, thread_name_prefix="actian-batch")
+        self._meta_lock = threading.Lock()
+        self._count: Optional[int] = None
+        self._count_expires = 0.0
+        self._count_signature: Optional[tuple[int, int]] = None
+        self._latencies: deque[float] = deque(maxlen=STAT_SAMPLES)
+        self.calls = 0
+        self.errors = 0
+        self.timeouts = 0
+        self.retried = 0
+        self.clients_replaced = 0
+        self.metadata_refreshes = 0
+        self.metadata_hits = 0
+        self._supported: dict[str, bool] = {}
+
+    def _checkout(self):
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self._pool_lock:
+            create = self._created < self.pool_size
+            if create:
+                self._created += 1
+        if create:
+            try:
+                return self._factory(self.address)
+            except BaseException:
+                with self._pool_lock:
+                    self._created -= 1
+                raise
+        try:
+            return self._idle.get(timeout=self.timeout)
+        except queue.Empty:
+            raise TimeoutError(f"no Actian client free within {self.timeout}s (pool of {self.pool_size})") from None
+
+    def _checkin(self, client, broken: bool) -> None:
+        if not broken:
+            self._idle.put(client)
+            return
+        with self._pool_lock:
+            self._created -= 1
+        self.clients_replaced += 1
+        self._calls.submit(_close, client)
+
+    def call(self, method: str, *args, **kwargs):
+        """client.<method>(*args, **kwargs) on a pooled client, with timeout and retries."""
+        last: Optional[BaseException] = None
+        for attempt in range(self.retries + 1):
+            if attempt:
+                self.retried += 1
+                time.sleep(min(0.05 * 2 ** (attempt - 1), 1.0))
+            try:
+                client = self._checkout()
+            except ImportError:
+                raise
+            except Exception as e:
+                last = e
+                continue
+            broken = False
+            t0 = time.perf_counter()
+            self.calls += 1
+            try:
+                result = self._calls.submit(getattr(client, method), *args, **kwargs).result(timeout=self.timeout)
+                self._latencies.append(time.perf_counter() - t0)
+                return result
+            except FutureTimeout:
+                broken = True
+                self.timeouts += 1
+                last = TimeoutError(f"Actian {method} timed out after {self.timeout}s")
+            except Exception as e:
+                self.errors += 1
+                last = e
+            finally:
+                self._checkin(client, broken)
+            logger.warning("Actian %s failed (attempt %d of %d): %s", method, attempt + 1, self.retries + 1, last)
+        raise last
+
+    def supports(self, method: str) -> bool:
+        """Whether the cortex client has `method` (looked up once, on a pooled client)."""
+        if method not in self._supported:
+            client = self._checkout()
+            try:
+                self._supported[method] = callable(getattr(client, method, None))
+            finally:
+                self._checkin(client, False)
+        return self._supported[method]
+
+    def _corpus_signature(self) -> Optional[tuple[int, int]]:
+        try:
+            st = os.stat(self._version_path)
+        except FileNotFoundError:
+            return None
+        return st.st_mtime_ns, st.st_size
+
+    def count(self) -> int:
+        """Chunks in the collection (0 if it does not exist), cached until the TTL or the next ingest."""
+        signature = self._corpus_signature()
+        if self._count is not None and time.monotonic() < self._count_expires and signature == self._count_signature:
+            self.metadata_hits += 1
+            return self._count
+        with self._meta_lock:
+            if self._count is None or time.monotonic() >= self._count_expires or signature != self._count_signature:
+                exists = self.call("has_collection", self.collection)
+                self._count = self.call("count", self.collection) if exists else 0
+                self._count_expires = time.monotonic() + self.metadata_ttl
+                self._count_signature = signature
+                self.metadata_refreshes += 1
+            return self._count
+
+    def invalidate(self) -> None:
+        """Drop the cached collection metadata (after writing to the collection from this process)."""
+        with self._meta_lock:
+            self._count = None
+
+    def search(self, vector: Sequence[float], top_k: int = 5) -> list[dict]:
+        """Top-k chunks for one query vector: [{source, text, score?}], best first."""
+        n = self.count()
+        if n == 0:
+            return []
+        results = self.call("search", self.collection, query=list(vector), top_k=min(top_k, n))
+        return [_hit(r) for r in results]
+
+    def batch_search(self, vectors: Sequence[Sequence[float]], top_k: int = 5) -> list[list[dict]]:
+        """search() for several query vectors at once; results in input order.
+
+        One batch_search call when the client has it, else one search per vector spread over the pool.
+        """
+        if not vectors:
+            return []
+        n = self.count()
+        if n == 0:
+            return [[] for _ in vectors]
+        if self.supports("batch_search"):
+            results = self.call("batch_search", self.collection, [list(v) for v in vectors], top_k=min(top_k, n))
+            return [[_hit(r) for r in hits] for hits in results]
+        return list(self._fanout.map(lambda v: self.search(v, top_k), vectors))
+
+    def ensure_collection(self, dimension: int = EMBED_DIM) -> None:
+        """Create the collection (cosine distance) if it does not exist yet."""
+        if not self.call("has_collection", self.collection):
+            from cortex import DistanceMetric
+            self.call("create_collection", name=self.collection, dimension=dimension,
+                      distance_metric=DistanceMetric.COSINE)
+        self.invalidate()
+
+    def upsert(self, ids: Sequence, vectors: Sequence, payloads: Sequence[dict], batch_size: int = 100) -> None:
+        for i in range(0, len(ids), batch_size):
+            self.call("batch_upsert", self.collection, list(ids[i:i + batch_size]),
+                      list(vectors[i:i + batch_size]), list(payloads[i:i + batch_size]))
+        self.invalidate()
+
+    def delete(self, ids: Sequence, batch_size: int = 100) -> None:
+        """Remove points by id: one batch_delete per batch_size ids when the client has it, else
+        one delete call per id, a batch at a time per pooled client."""
+        batches = [list(ids[i:i + batch_size]) for i in range(0, len(ids), batch_size)]
+        if self.supports("batch_delete"):
+            for batch in batches:
+                self.call("batch_delete", self.collection, batch)
+        else:
+            list(self._fanout.map(lambda batch: [self.call("delete", self.collection, i) for i in batch], batches))
+        self.invalidate()
+
+    def close(self) -> None:
+        while True:
+            try:
+                _close(self._idle.get_nowait())
+            except queue.Empty:
+                break
+        self._fanout.shutdown(wait=False)
+        self._calls.shutdown(wait=False)
+
+    def stats(self) -> dict:
+        latencies = sorted(self._latencies)
+
+        def pct(q: float):
+            return round(latencies[min(len(latencies) - 1, int(q * len(latencies)))] * 1000, 2) if latencies else None
+
+        return {
+            "address": self.address,
+            "collection": self.collection,
+            "pool_size": self.pool_size,
+            "clients_open": self._created,
+            "clients_idle": self._idle.qsize(),
+            "clients_replaced": self.clients_replaced,
+            "calls": self.calls,
+            "errors": self.errors,
+            "timeouts": self.timeouts,
+            "retries": self.retried,
+            "call_p50_ms": pct(0.5),
+            "call_p95_ms": pct(0.95),
+            "cached_count": self._count,
+            "metadata_hits": self.metadata_hits,
+            "metadata_refreshes": self.metadata_refreshes,
+        }
+
+
+_store: Optional[ActianStore] = None
+_store_lock = threading.Lock()
+
+
+def get_actian_store() -> ActianStore:
+    """Return the process-wide Actian store (created on first use from ACTIAN_VECTORAI_URL)."""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = ActianStore()
+    return _store
+
+
+def close_actian_store() -> None:
+    global _store
+    with _store_lock:
+        store, _store = _store, None
+    if store is not None:
+        store.close()
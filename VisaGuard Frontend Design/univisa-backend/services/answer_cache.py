@@ -0,0 +1,200 @@
+"""Semantic cache of AI advisor answers, keyed by question embedding and a coarse profile bucket.
+
+A new question reuses a stored answer when its embedding is close enough (cosine similarity)
+to an earlier question from a student in the same bucket. scripts/ingest_docs.py writes
+data/corpus_version.json; the cache empties itself when that version changes.
+"""
+import json
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Hashable, NamedTuple, Optional
+
+import numpy as np
+
+from models.student import StudentProfile
+
+CORPUS_VERSION_PATH = Path(__file__).resolve().parent.parent / "data" / "corpus_version.json"
+ANSWER_CACHE_ENABLED = os.getenv("ANSWER_CACHE_ENABLED", "true").strip().lower() in ("1", "true", "yes")
+# Minimum cosine similarity between questions for a stored answer to be reused
+SIMILARITY_THRESHOLD = float(os.getenv("ANSWER_CACHE_THRESHOLD", "0.92"))
+MAX_ENTRIES = int(os.getenv("ANSWER_CACHE_MAX_ENTRIES", "2000"))
+TTL_S = float(os.getenv("ANSWER_CACHE_TTL", "86400"))
+# Seconds between stat() checks of corpus_version.json on the lookup path
+CHECK_INTERVAL_S = float(os.getenv("ANSWER_CACHE_CHECK_INTERVAL", "30"))
+
+
+def profile_bucket(profile: StudentProfile) -> tuple:
+    """Profile fields that change what a correct answer says; answers are shared only within a bucket."""
+    return (profile.visa_type.value, profile.enrollment_status.value, profile.on_opt, profile.on_cpt)
+
+
+def read_corpus_version(path: Path = CORPUS_VERSION_PATH) -> Optional[str]:
+    try:
+        return json.loads(path.read_text(encoding="utf-8")).get("version")
+    except (FileNotFoundError, ValueError):
+        return None
+
+
+def write_corpus_version(chunks: int, path: Path = CORPUS_VERSION_PATH) -> str:
+    """Record a new corpus version after ingestion (atomic replace). Returns the version."""
+    version = uuid.uuid4().hex
+    payload = {"version": version, "chunks": chunks, "ingested_at": datetime.now(timezone.utc).isoformat()}
+    tmp = path.with_suffix(".tmp")
+    tmp.write_text(json.dumps(payload), encoding="utf-8")
+    os.replace(tmp, path)
+    return version
+
+
+class _Entry(NamedTuple):
+    bucket: Hashable
+    vector: np.ndarray  # unit-length question embedding
+    answer: str
+    sources: list[str]
+    expires_at: float  # time.monotonic() deadline
+
+
+class SemanticAnswerCache:
+    """LRU + TTL cache of answers looked up by nearest question embedding within a bucket.
+
+    Entries live in one OrderedDict in LRU order (a hit moves its entry to the end; the size
+    cap evicts from the front). Each bucket keeps its own entry ids and a stacked embedding
+    matrix, rebuilt lazily after the bucket changes, so a lookup is one matrix-vector product.
+    """
+
+    def __init__(
+        self,
+        threshold: float = SIMILARITY_THRESHOLD,
+        max_entries: int = MAX_ENTRIES,
+        ttl_s: float = TTL_S,
+        version_path: Path = CORPUS_VERSION_PATH,
+        check_interval: float = CHECK_INTERVAL_S,
+    ):
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.ttl_s = ttl_s
+        self._version_path = version_path
+        self._check_interval = check_interval
+        self._lock = threading.Lock()
+        self._entries: OrderedDict[int, _Entry] = OrderedDict()
+        self._buckets: dict[Hashable, list[int]] = {}
+        self._matrices: dict[Hashable, np.ndarray] = {}
+        self._next_id = 0
+        self._signature: Optional[tuple[int, int]] = None  # (mtime_ns, size) of corpus_version.json
+        self._next_check = 0.0
+        self.corpus_version = read_corpus_version(version_path)
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    def get(self, vector: np.ndarray, bucket: Hashable) -> Optional[dict]:
+        """Stored {answer, sources} for the most similar question in the bucket, if above threshold."""
+        self._check_corpus_version()
+        with self._lock:
+            ids = self._buckets.get(bucket)
+            best = None
+            if ids:
+                matrix = self._matrices.get(bucket)
+                if matrix is None:
+                    matrix = self._matrices[bucket] = np.stack([self._entries[i].vector for i in ids])
+                sims = matrix @ vector
+                now = time.monotonic()
+                for j in np.argsort(-sims):
+                    if sims[j] < self.threshold:
+                        break
+                    entry_id = ids[j]
+                    if self._entries[entry_id].expires_at > now:
+                        best = entry_id
+                        break
+                self._drop_expired(bucket, now)
+            if best is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._entries.move_to_end(best)
+            entry = self._entries[best]
+            return {"answer": entry.answer, "sources": list(entry.sources)}
+
+    def put(self, vector: np.ndarray, bucket: Hashable, answer: str, sources: list[str]) -> None:
+        with self._lock:
+            entry_id = self._next_id
+            self._next_id += 1
+            self._entries[entry_id] = _Entry(bucket, vector, answer, list(sources), time.monotonic() + self.ttl_s)
+            self._buckets.setdefault(bucket, []).append(entry_id)
+            self._matrices.pop(bucket, None)
+            self.stores += 1
+            while len(self._entries) > self.max_entries:
+                old_id, old = self._entries.popitem(last=False)
+                self._unlink(old_id, old.bucket)
+                self.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._buckets.clear()
+            self._matrices.clear()
+            self.invalidations += 1
+
+    def _drop_expired(self, bucket: Hashable, now: float) -> None:
+        expired = [i for i in self._buckets[bucket] if self._entries[i].expires_at <= now]
+        for entry_id in expired:
+            del self._entries[entry_id]
+            self._unlink(entry_id, bucket)
+            self.expirations += 1
+
+    def _unlink(self, entry_id: int, bucket: Hashable) -> None:
+        ids = self._buckets[bucket]
+        ids.remove(entry_id)
+        if not ids:
+            del self._buckets[bucket]
+        self._matrices.pop(bucket, None)
+
+    def _check_corpus_version(self) -> None:
+        if time.monotonic() < self._next_check:
+            return
+        self._next_check = time.monotonic() + self._check_interval
+        try:
+            st = os.stat(self._version_path)
+            signature = (st.st_mtime_ns, st.st_size)
+        except FileNotFoundError:
+            signature = None
+        if signature == self._signature:
+            return
+        self._signature = signature
+        version = read_corpus_version(self._version_path)
+        if version != self.corpus_version:
+            self.corpus_version = version
+            self.clear()
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "buckets": len(self._buckets),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else None,
+            "stores": self.stores,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "invalidations": self.invalidations,
+            "corpus_version": self.corpus_version,
+            "threshold": self.threshold,
+            "max_entries": self.max_entries,
+            "ttl_s": self.ttl_s,
+        }
+
+
+_cache = SemanticAnswerCache()
+
+
+def get_answer_cache() -> SemanticAnswerCache:
+    """Return the process-wide answer cache."""
+    return _cache
@@ -0,0 +1,106 @@
+"""In-memory index of community insights from data/clusters.json, reloaded only when the file changes."""
+import hashlib
+import json
+import os
+import threading
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Optional
+
+CLUSTERS_PATH = Path(__file__).resolve().parent.parent / "data" / "clusters.json"
+# Seconds between stat() checks of clusters.json on the lookup path; lookups in between touch no files.
+CHECK_INTERVAL_S = float(os.getenv("CLUSTER_INSIGHT_CHECK_INTERVAL", "30"))
+
+
+class ClusterInsightRegistry:
+    """Maps a risk flag category (or its cluster label) to its reddit_insight string.
+
+    clusters.json is parsed once and turned into a label -> insight dict. The file is
+    re-read only when its mtime/size changes and its sha256 differs from the loaded copy;
+    the new dict is swapped in whole, so readers never see a half-built index.
+    """
+
+    def __init__(self, path: Path, labels: dict[str, Optional[str]], check_interval: float = CHECK_INTERVAL_S):
+        self._path = path
+        self._labels = dict(labels)
+        self._check_interval = check_interval
+        self._lock = threading.Lock()
+        self._index: dict[str, str] = self._build_index({})
+        self._signature: Optional[tuple[int, int]] = None  # (mtime_ns, size)
+        self._digest: Optional[str] = None
+        self._next_check = 0.0
+        self.load_count = 0  # times the file was read and parsed
+        self.check_count = 0  # times the file was stat()ed
+        self.lookup_count = 0
+        self.last_reload_at: Optional[str] = None
+        self.last_error: Optional[str] = None
+
+    def get(self, category: str) -> Optional[str]:
+        """Insight for a flag category; "Community insight: <label>" if the label is a known cluster."""
+        return self.for_label(self._labels.get(category))
+
+    def for_label(self, label: Optional[str]) -> Optional[str]:
+        """Insight for a cluster label (the label itself if clusters.json has no such cluster)."""
+        if label is None:
+            return None
+        if time.monotonic() >= self._next_check:
+            self.refresh()
+        self.lookup_count += 1
+        return self._index.get(label, label)
+
+    def refresh(self, force: bool = False) -> bool:
+        """Reload if clusters.json changed (or always when force). Returns True if the index was rebuilt."""
+        with self._lock:
+            self._next_check = time.monotonic() + self._check_interval
+            self.check_count += 1
+            try:
+                st = os.stat(self._path)
+            except FileNotFoundError:
+                changed = self._signature is not None or force
+                self._index = self._build_index({})
+                self._signature = None
+                self._digest = None
+                return changed
+            signature = (st.st_mtime_ns, st.st_size)
+            if signature == self._signature and not force:
+                return False
+            try:
+                raw = self._path.read_bytes()
+                digest = hashlib.sha256(raw).hexdigest()
+                self._signature = signature
+                if digest == self._digest and not force:
+                    return False
+                self.load_count += 1
+                index = self._build_index(json.loads(raw))
+            except Exception as e:
+                # Keep serving the previous index; the next check retries.
+                self.last_error = f"{type(e).__name__}: {e}"
+                self._signature = None
+                return False
+            self._index = index
+            self._digest = digest
+            self.last_reload_at = datetime.now(timezone.utc).isoformat()
+            self.last_error = None
+            return True
+
+    def _build_index(self, clusters: dict) -> dict[str, str]:
+        known = {data.get("label") for data in clusters.values() if isinstance(data, dict)}
+        return {
+            label: f"Community insight: {label}" if label in known else label
+            for label in self._labels.values()
+            if label is not None
+        }
+
+    def stats(self) -> dict:
+        return {
+            "path": str(self._path),
+            "sha256": self._digest,
+            "labels": len(self._index),
+            "load_count": self.load_count,
+            "check_count": self.check_count,
+            "lookup_count": self.lookup_count,
+            "last_reload_at": self.last_reload_at,
+            "last_error": self.last_error,
+            "check_interval_s": self._check_interval,
+        }
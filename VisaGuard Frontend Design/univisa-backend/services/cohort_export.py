@@ -0,0 +1,101 @@
+"""Streaming cohort export: scores students chunk by chunk and yields NDJSON or CSV text."""
+import csv
+import io
+import json
+from datetime import date
+from typing import Iterator, Mapping
+
+from models.student import StudentProfile
+from services import risk_engine as engine
+from services.risk_batch import FLAG_SPECS, score_cohort, store_columns, store_values, top_flag_category
+
+EXPORT_CHUNK_SIZE = 2000
+
+
+def _slug(category: str) -> str:
+    return category.lower().replace(" ", "_")
+
+
+# One severity column per flag category, plus a days column for categories with a countdown
+_CATEGORIES = list(dict.fromkeys(spec.category for spec in engine.RULE_SPECS))
+_COUNTDOWN_CATEGORIES = list(dict.fromkeys(spec.category for spec in engine.RULE_SPECS if spec.countdown))
+
+_FLAG_COLUMNS = [
+    *(f"{_slug(c)}_severity" for c in _CATEGORIES),
+    *(f"{_slug(c)}_days" for c in _COUNTDOWN_CATEGORIES),
+]
+EXPORT_COLUMNS: list[str] = [
+    "student_id",
+    "full_name",
+    "country_of_origin",
+    "visa_type",
+    "program_end_date",
+    "risk_score",
+    "risk_level",
+    "top_risk_flag",
+    *_FLAG_COLUMNS,
+]
+
+
+def export_rows(
+    store: Mapping[str, StudentProfile], today: date, chunk_size: int = EXPORT_CHUNK_SIZE
+) -> Iterator[list[dict]]:
+    """Yield lists of flat export rows, chunk_size students at a time, in store order.
+
+    Only the student_id list is snapshotted up front; students are read and scored per chunk,
+    so memory is bounded by chunk_size rather than the cohort size. A columnar store hands over
+    the rule inputs and the exported fields as arrays, without building a profile per row.
+    """
+    sids = list(store.keys())
+    for start in range(0, len(sids), chunk_size):
+        cols = store_columns(store, sids[start:start + chunk_size])
+        if not len(cols):
+            continue
+        chunk = cols.student_ids
+        names = store_values(store, "full_name", chunk)
+        countries = store_values(store, "country_of_origin", chunk)
+        visas = store_values(store, "visa_type", chunk)
+        result = score_cohort(cols, today)
+        countdowns = {
+            "days_to_end": result.days_to_program_end,
+            "opt_deadline": result.days_to_program_end - engine.OPT_FILING_LEAD_DAYS,
+            "days_to_opt_end": result.days_to_opt_end,
+        }
+        rows = []
+        for i, sid in enumerate(chunk):
+            bits = int(result.flags[i])
+            row = {
+                "student_id": sid,
+                "full_name": names[i],
+                "country_of_origin": countries[i],
+                "visa_type": visas[i].value if visas[i] is not None else None,
+                "program_end_date": str(date.fromordinal(int(cols.program_end[i]))),
+                "risk_score": int(result.risk_score[i]),
+                "risk_level": str(result.risk_level[i]),
+                "top_risk_flag": top_flag_category(bits),
+            }
+            row.update(dict.fromkeys(_FLAG_COLUMNS))
+            for bit, spec in FLAG_SPECS:
+                if bits & bit:
+                    row[f"{_slug(spec.category)}_severity"] = spec.severity
+                    if spec.countdown:
+                        row[f"{_slug(spec.category)}_days"] = int(countdowns[spec.countdown][i])
+            rows.append(row)
+        yield rows
+
+
+def iter_ndjson(store: Mapping[str, StudentProfile], today: date) -> Iterator[str]:
+    for rows in export_rows(store, today):
+        yield "".join(json.dumps(row) + "\n" for row in rows)
+
+
+def iter_csv(store: Mapping[str, StudentProfile], today: date) -> Iterator[str]:
+    buf = io.StringIO()
+    writer = csv.DictWriter(buf, fieldnames=EXPORT_COLUMNS)
+    writer.writeheader()
+    yield buf.getvalue()
+    for rows in export_rows(store, today):
+        buf.seek(0)
+        buf.truncate()
+        writer.writerows(rows)
+        yield buf.getvalue()
@@ -0,0 +1,130 @@
+"""Cohort rows kept sorted by (risk_score desc, student_id), with secondary indexes for DSO filters."""
+import threading
+from bisect import bisect_right, insort
+from typing import Optional
+
+from models.student import StudentProfile
+from models.risk import RiskOutput
+
+# Row fields the DSO cohort view can filter on
+FILTER_FIELDS = ("risk_level", "visa_type", "country_of_origin", "top_risk_flag")
+
+# Below this fraction of the cohort, a filtered page sorts the matching set instead of scanning the index.
+_SMALL_CANDIDATE_RATIO = 0.05
+
+
+def cohort_row(profile: StudentProfile, output: RiskOutput) -> dict:
+    """Summary row for the DSO cohort view (flags omitted)."""
+    return {
+        "student_id": profile.student_id,
+        "full_name": profile.full_name,
+        "country_of_origin": profile.country_of_origin,
+        "visa_type": profile.visa_type.value,
+        "program_end_date": str(profile.program_end_date),
+        "risk_score": output.risk_score,
+        "risk_level": output.risk_level,
+        "top_risk_flag": output.flags[0].category if output.flags else "All requirements met",
+    }
+
+
+def encode_cursor(row: dict) -> str:
+    return f"{row['risk_score']}:{row['student_id']}"
+
+
+def decode_cursor(cursor: str) -> tuple[int, str]:
+    """Index key of the last row of the previous page. Raises ValueError if malformed."""
+    score, _, sid = cursor.partition(":")
+    if not sid:
+        raise ValueError("cursor must look like '<risk_score>:<student_id>'")
+    return -int(score), sid
+
+
+class CohortIndex:
+    """Maintained sort order plus value -> student_id sets for FILTER_FIELDS.
+
+    A page costs O(limit) when unfiltered (plus a bisect for the cursor); filtered pages scan
+    the index skipping non-matches, or sort the matching set when it is small.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._keys: list[tuple[int, str]] = []  # (-risk_score, student_id), ascending
+        self._rows: dict[str, dict] = {}
+        self._by: dict[str, dict[str, set[str]]] = {f: {} for f in FILTER_FIELDS}
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def upsert(self, row: dict) -> None:
+        sid = row["student_id"]
+        with self._lock:
+            old = self._rows.get(sid)
+            if old is not None:
+                if old == row:
+                    return
+                self._unlink(old)
+            self._rows[sid] = row
+            insort(self._keys, (-row["risk_score"], sid))
+            for f in FILTER_FIELDS:
+                self._by[f].setdefault(row[f], set()).add(sid)
+
+    def remove(self, student_id: str) -> None:
+        with self._lock:
+            old = self._rows.pop(student_id, None)
+            if old is not None:
+                self._unlink(old)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._keys.clear()
+            self._rows.clear()
+            self._by = {f: {} for f in FILTER_FIELDS}
+
+    def page(
+        self, limit: Optional[int] = None, cursor: Optional[str] = None, **filters: Optional[str]
+    ) -> tuple[list[dict], Optional[str]]:
+        """Rows after cursor matching all non-None filters; returns (rows, next_cursor)."""
+        after = decode_cursor(cursor) if cursor else None
+        wanted = {f: v for f, v in filters.items() if v is not None}
+        with self._lock:
+            if wanted:
+                candidates = self._candidates(wanted)
+                if len(candidates) <= _SMALL_CANDIDATE_RATIO * len(self._keys):
+                    keys = sorted((-self._rows[sid]["risk_score"], sid) for sid in candidates)
+                    start = bisect_right(keys, after) if after else 0
+                    chosen = keys[start:start + limit] if limit is not None else keys[start:]
+                    rows = [self._rows[sid] for _, sid in chosen]
+                else:
+                    rows = self._scan(after, limit, candidates)
+            else:
+                rows = self._scan(after, limit, None)
+            has_more = limit is not None and len(rows) == limit
+        return rows, encode_cursor(rows[-1]) if has_more and rows else None
+
+    def _scan(self, after: Optional[tuple[int, str]], limit: Optional[int], members: Optional[set[str]]) -> list[dict]:
+        start = bisect_right(self._keys, after) if after else 0
+        out: list[dict] = []
+        for i in range(start, len(self._keys)):
+            sid = self._keys[i][1]
+            if members is None or sid in members:
+                out.append(self._rows[sid])
+                if limit is not None and len(out) >= limit:
+                    break
+        return out
+
+    def _candidates(self, wanted: dict[str, str]) -> set[str]:
+        sets = sorted((self._by[f].get(v, set()) for f, v in wanted.items()), key=len)
+        return sets[0].intersection(*sets[1:]) if len(sets) > 1 else sets[0]
+
+    def _unlink(self, row: dict) -> None:
+        sid = row["student_id"]
+        key = (-row["risk_score"], sid)
+        i = bisect_right(self._keys, key) - 1
+        if i >= 0 and self._keys[i] == key:
+            del self._keys[i]
+        for f in FILTER_FIELDS:
+            members = self._by[f].get(row[f])
+            if members is not None:
+                members.discard(sid)
+                if not members:
+                    del self._by[f][row[f]]
@@ -0,0 +1,186 @@
+"""Context assembly for RAG prompts: merge overlapping chunks, drop near-duplicates, pack to a token budget.
+
+scripts/ingest_docs.py cuts documents into 2000-char chunks that share 200 chars with their
+neighbours, so top-k retrieval often returns adjacent chunks of one document with the overlap
+repeated. Those are stitched back into one passage; passages whose embeddings are nearly
+identical (the same paragraph in two documents) are kept once; then passages are taken best
+first until RAG_CONTEXT_TOKENS is reached, cutting the last one at a sentence boundary.
+
+Token counts are local estimates (words and punctuation, long words counted as several
+tokens), within roughly 10-15% of Gemini's tokenizer for English policy text.
+"""
+import os
+import re
+from dataclasses import dataclass
+from typing import Optional, Sequence
+
+import numpy as np
+
+CONTEXT_TOKEN_BUDGET = int(os.getenv("RAG_CONTEXT_TOKENS", "1500"))
+DEDUP_THRESHOLD = float(os.getenv("RAG_DEDUP_THRESHOLD", "0.95"))
+# Shortest suffix/prefix match treated as chunk overlap rather than coincidence
+MIN_OVERLAP_CHARS = 64
+# A truncated passage shorter than this is not worth including
+MIN_PIECE_TOKENS = 48
+
+_TOKEN_RE = re.compile(r"\w+|[^\w\s]")
+_SENTENCE_END_RE = re.compile(r"[.!?](?=\s)")
+
+
+def estimate_tokens(text: str) -> int:
+    """Approximate LLM token count of text."""
+    return sum(1 + len(piece) // 8 for piece in _TOKEN_RE.findall(text))
+
+
+def format_chunk(source: str, text: str) -> str:
+    return f"[{source}]\n{text}"
+
+
+def join_chunks(chunks: Sequence[dict]) -> str:
+    """Chunks as they appear in the prompt: a [source] header above each, blank line between."""
+    return "\n\n".join(format_chunk(c["source"], c["text"]) for c in chunks)
+
+
+@dataclass
+class PackedContext:
+    """Prompt context built from retrieved chunks, with before/after sizes for logging."""
+    text: str
+    sources: list[str]
+    chunks_in: int
+    chunks_out: int
+    merged: int
+    deduplicated: int
+    truncated: bool
+    tokens_in: int  # retrieved chunks concatenated verbatim
+    tokens_out: int
+
+
+def _overlap(a: str, b: str) -> int:
+    """Length of the longest suffix of a that is a prefix of b (0 below MIN_OVERLAP_CHARS)."""
+    probe = b[:MIN_OVERLAP_CHARS]
+    if len(probe) < MIN_OVERLAP_CHARS:
+        return 0
+    i = a.find(probe, max(0, len(a) - len(b)))
+    while i >= 0:
+        if b.startswith(a[i:]):
+            return len(a) - i
+        i = a.find(probe, i + 1)
+    return 0
+
+
+class _Passage:
+    __slots__ = ("source", "text", "rank", "vectors")
+
+    def __init__(self, source: str, text: str, rank: int, vector: Optional[np.ndarray]):
+        self.source = source
+        self.text = text
+        self.rank = rank
+        self.vectors = [] if vector is None else [np.asarray(vector, np.float32)]
+
+    def absorb(self, other: "_Passage") -> bool:
+        """Stitch other onto this passage if they overlap or one contains the other."""
+        if other.text in self.text:
+            pass
+        elif self.text in other.text:
+            self.text = other.text
+        elif (k := _overlap(self.text, other.text)):
+            self.text += other.text[k:]
+        elif (k := _overlap(other.text, self.text)):
+            self.text = other.text + self.text[k:]
+        else:
+            return False
+        self.rank = min(self.rank, other.rank)
+        self.vectors += other.vectors
+        return True
+
+    def vector(self) -> Optional[np.ndarray]:
+        if not self.vectors:
+            return None
+        v = np.mean(self.vectors, axis=0)
+        return v / max(float(np.linalg.norm(v)), 1e-12)
+
+
+def merge_overlapping(chunks: Sequence[dict]) -> list[_Passage]:
+    """Passages from chunks (best first), adjacent chunks of one source stitched together."""
+    passages: list[_Passage] = []
+    for rank, chunk in enumerate(chunks):
+        passage = _Passage(chunk["source"], chunk["text"], rank, chunk.get("vector"))
+        # A new chunk can bridge two passages (A, C, then B), so keep absorbing until stable.
+        absorbed = True
+        while absorbed:
+            absorbed = False
+            for other in passages:
+                if other.source == passage.source and other.absorb(passage):
+                    passages.remove(other)
+                    passage = other
+                    absorbed = True
+                    break
+        passages.append(passage)
+    passages.sort(key=lambda p: p.rank)
+    return passages
+
+
+def _truncate(text: str, max_tokens: int) -> str:
+    """Longest prefix of text within max_tokens, ending at a sentence (or word) boundary."""
+    cut = text
+    while cut and estimate_tokens(cut) > max_tokens:
+        cut = cut[:int(len(cut) * 0.9)]
+    if len(cut) == len(text):
+        return text
+    ends = [m.end() for m in _SENTENCE_END_RE.finditer(cut)]
+    if ends and ends[-1] > len(cut) // 2:
+        return cut[:ends[-1]]
+    space = cut.rfind(" ")
+    return (cut[:space] if space > 0 else cut) + " …"
+
+
+def pack_context(
+    chunks: Sequence[dict],
+    token_budget: int = CONTEXT_TOKEN_BUDGET,
+    dedup_threshold: float = DEDUP_THRESHOLD,
+) -> PackedContext:
+    """Build the prompt context from retrieved chunks [{source, text, vector?}], best first.
+
+    Chunks without a "vector" are never treated as duplicates of anything.
+    """
+    passages = merge_overlapping(chunks)
+    merged = len(chunks) - len(passages)
+
+    kept: list[_Passage] = []
+    kept_vectors: list[np.ndarray] = []
+    for passage in passages:
+        v = passage.vector()
+        if v is not None and kept_vectors and float(np.max(np.stack(kept_vectors) @ v)) >= dedup_threshold:
+            continue
+        kept.append(passage)
+        if v is not None:
+            kept_vectors.append(v)
+
+    packed: list[dict] = []
+    remaining = token_budget
+    truncated = False
+    for passage in kept:
+        cost = estimate_tokens(format_chunk(passage.source, passage.text))
+        if cost <= remaining:
+            packed.append({"source": passage.source, "text": passage.text})
+            remaining -= cost
+            continue
+        header = estimate_tokens(format_chunk(passage.source, ""))
+        if remaining - header >= MIN_PIECE_TOKENS:
+            text = _truncate(passage.text, remaining - header)
+            packed.append({"source": passage.source, "text": text})
+            remaining -= estimate_tokens(format_chunk(passage.source, text))
+        truncated = True
+
+    text = join_chunks(packed)
+    return PackedContext(
+        text=text,
+        sources=list(dict.fromkeys(c["source"] for c in packed)),
+        chunks_in=len(chunks),
+        chunks_out=len(packed),
+        merged=merged,
+        deduplicated=len(passages) - len(kept),
+        truncated=truncated,
+        tokens_in=estimate_tokens(join_chunks(chunks)),
+        tokens_out=estimate_tokens(text),
+    )
@@ -0,0 +1,99 @@
+"""In-memory CPT request store with per-student, per-status and creation-order indexes."""
+import threading
+from bisect import bisect_left, insort
+from typing import Iterator, MutableMapping, Optional
+
+from models.cpt_request import CPTRequest
+
+# Sort key for creation order; id breaks ties between requests created in the same microsecond.
+Key = tuple[str, str]
+
+
+def creation_key(req: CPTRequest) -> Key:
+    return (req.created_at, req.id)
+
+
+def newest_first(keys: list[Key], before: Optional[Key], limit: Optional[int]) -> list[str]:
+    """Ids from an ascending key list, newest first, strictly older than `before`."""
+    end = bisect_left(keys, before) if before else len(keys)
+    start = max(0, end - limit) if limit is not None else 0
+    return [rid for _, rid in reversed(keys[start:end])]
+
+
+class IndexedCPTStore(MutableMapping[str, CPTRequest]):
+    """Dict of CPT requests by id that keeps its secondary indexes in step on every write.
+
+    for_student() costs O(requests for that student) and page() O(limit) plus a bisect,
+    instead of scanning and sorting every request.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._items: dict[str, CPTRequest] = {}
+        self._by_student: dict[str, list[Key]] = {}
+        self._by_status: dict[str, list[Key]] = {}
+        self._created: list[Key] = []
+
+    def __getitem__(self, rid: str) -> CPTRequest:
+        return self._items[rid]
+
+    def __setitem__(self, rid: str, req: CPTRequest) -> None:
+        with self._lock:
+            old = self._items.get(rid)
+            if old is not None:
+                self._unlink(old)
+            self._items[rid] = req
+            key = creation_key(req)
+            insort(self._created, key)
+            insort(self._by_student.setdefault(req.student_id, []), key)
+            insort(self._by_status.setdefault(req.status.value, []), key)
+
+    def __delitem__(self, rid: str) -> None:
+        with self._lock:
+            self._unlink(self._items.pop(rid))
+
+    def __contains__(self, rid: object) -> bool:
+        return rid in self._items
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(list(self._items))
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def for_student(self, student_id: str) -> list[CPTRequest]:
+        """A student's requests, newest first."""
+        with self._lock:
+            ids = newest_first(self._by_student.get(student_id, []), None, None)
+            return [self._items[rid] for rid in ids]
+
+    def page(
+        self, limit: Optional[int] = None, cursor: Optional[str] = None, status: Optional[str] = None
+    ) -> tuple[list[CPTRequest], Optional[str]]:
+        """Requests newest first, optionally one status only, after the request id in cursor.
+
+        Returns (requests, next_cursor). Raises ValueError for an unknown cursor.
+        """
+        with self._lock:
+            before = None
+            if cursor:
+                if cursor not in self._items:
+                    raise ValueError(f"unknown request id {cursor!r}")
+                before = creation_key(self._items[cursor])
+            keys = self._created if status is None else self._by_status.get(status, [])
+            out = [self._items[rid] for rid in newest_first(keys, before, limit)]
+        has_more = limit is not None and len(out) == limit
+        return out, out[-1].id if has_more and out else None
+
+    def _unlink(self, req: CPTRequest) -> None:
+        key = creation_key(req)
+        for keys in (self._created, self._by_student.get(req.student_id), self._by_status.get(req.status.value)):
+            if keys is None:
+                continue
+            i = bisect_left(keys, key)
+            if i < len(keys) and keys[i] == key:
+                del keys[i]
+        if not self._by_student.get(req.student_id, True):
+            del self._by_student[req.student_id]
+        if not self._by_status.get(req.status.value, True):
+            del self._by_status[req.status.value]
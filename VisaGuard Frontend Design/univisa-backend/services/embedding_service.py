@@ -0,0 +1,260 @@
+"""Shared all-MiniLM-L6-v2 embedding service: micro-batched encoding plus an LRU cache.
+
+Callers submit single strings; one worker thread collects whatever arrives within
+EMBED_MAX_WAIT_MS (up to EMBED_MAX_BATCH strings) and encodes it in one model call,
+which is several times faster per string than encoding one at a time. The encoder
+releases the GIL while it runs, so the event loop and request threads keep going.
+
+EMBEDDING_BACKEND picks the encoder: torch (sentence-transformers, default) or onnx
+(int8 ONNX Runtime export of the same model, see services/onnx_embedder.py).
+"""
+import asyncio
+import logging
+import os
+import queue
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import Future, InvalidStateError
+from typing import Callable, Optional, Sequence
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+EMBEDDING_MODEL_NAME = "all-MiniLM-L6-v2"
+EMBED_DIM = 384
+BACKENDS = ("torch", "onnx")
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "torch").strip().lower()
+# Load the model during app startup instead of on the first request that needs it
+EMBEDDING_WARMUP = os.getenv("EMBEDDING_WARMUP", "").strip().lower() in ("1", "true", "yes")
+MAX_BATCH = int(os.getenv("EMBED_MAX_BATCH", "64"))
+# How long the worker waits for more strings after the first one arrives
+MAX_WAIT_MS = float(os.getenv("EMBED_MAX_WAIT_MS", "5"))
+CACHE_SIZE = int(os.getenv("EMBED_CACHE_SIZE", "10000"))
+STAT_SAMPLES = 1000
+
+_STOP = object()
+
+
+def load_sentence_transformer():
+    from sentence_transformers import SentenceTransformer
+    return SentenceTransformer(EMBEDDING_MODEL_NAME)
+
+
+def load_onnx_embedder():
+    from services.onnx_embedder import OnnxEmbedder
+    return OnnxEmbedder()
+
+
+def model_loader(backend: str = EMBEDDING_BACKEND) -> Callable[[], object]:
+    if backend not in BACKENDS:
+        raise ValueError(f"EMBEDDING_BACKEND must be one of {', '.join(BACKENDS)}, got {backend!r}")
+    return load_onnx_embedder if backend == "onnx" else load_sentence_transformer
+
+
+def _resolve(future: Future, result=None, error: Optional[BaseException] = None) -> None:
+    # The caller may have cancelled (e.g. the chat request went away); nothing to deliver then.
+    try:
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(result)
+    except InvalidStateError:
+        pass
+
+
+class _Request:
+    __slots__ = ("text", "future", "enqueued_at", "use_cache")
+
+    def __init__(self, text: str, future: Future, use_cache: bool):
+        self.text = text
+        self.future = future
+        self.enqueued_at = time.perf_counter()
+        self.use_cache = use_cache
+
+
+class EmbeddingService:
+    """Micro-batching encoder on a dedicated worker thread, with an LRU of recent strings.
+
+    Vectors are unit-length float32 and read-only (cached arrays are shared between callers).
+    The model is loaded by the worker on the first batch; if loading fails, every waiting
+    request gets the exception and the next batch tries again.
+    """
+
+    def __init__(
+        self,
+        loader: Optional[Callable[[], object]] = None,
+        max_batch: int = MAX_BATCH,
+        max_wait_ms: float = MAX_WAIT_MS,
+        cache_size: int = CACHE_SIZE,
+    ):
+        self._loader = loader or model_loader()
+        self._model = None
+        self.load_s: Optional[float] = None
+        self.max_batch = max(1, max_batch)
+        self.max_wait_s = max_wait_ms / 1000
+        self.cache_size = cache_size
+        self._queue: queue.SimpleQueue = queue.SimpleQueue()
+        self._thread: Optional[threading.Thread] = None
+        self._start_lock = threading.Lock()
+        self._cache: OrderedDict[str, np.ndarray] = OrderedDict()
+        self._cache_lock = threading.Lock()
+        self._batch_sizes: deque[int] = deque(maxlen=STAT_SAMPLES)
+        self._latencies: deque[float] = deque(maxlen=STAT_SAMPLES)
+        self.batches = 0
+        self.encoded = 0  # distinct strings run through the model
+        self.encode_s = 0.0
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.errors = 0
+
+    def submit(self, text: str, use_cache: bool = True) -> Future:
+        """Future resolving to the embedding of text."""
+        if use_cache:
+            with self._cache_lock:
+                vector = self._cache.get(text)
+                if vector is not None:
+                    self._cache.move_to_end(text)
+                    self.cache_hits += 1
+                else:
+                    self.cache_misses += 1
+            if vector is not None:
+                future: Future = Future()
+                future.set_result(vector)
+                return future
+        future = Future()
+        self._ensure_worker()
+        self._queue.put(_Request(text, future, use_cache))
+        return future
+
+    def embed(self, texts: Sequence[str], use_cache: bool = True) -> np.ndarray:
+        """Embeddings of texts as an (n, EMBED_DIM) array; blocks the calling thread.
+
+        Bulk callers (ingestion, clustering) should pass use_cache=False so one-off
+        documents do not push recent questions out of the cache.
+        """
+        futures = [self.submit(t, use_cache) for t in texts]
+        if not futures:
+            return np.zeros((0, EMBED_DIM), np.float32)
+        return np.stack([f.result() for f in futures])
+
+    async def aembed(self, text: str, use_cache: bool = True) -> np.ndarray:
+        """Embedding of one string without blocking the event loop."""
+        return await asyncio.wrap_future(self.submit(text, use_cache))
+
+    def warm_up(self) -> None:
+        """Load the model and run one encode so the first real request pays neither cost."""
+        self.embed(["How many hours can I work on campus?"], use_cache=False)
+        logger.info("Embedding model ready (%s backend, loaded in %.1fs)", EMBEDDING_BACKEND, self.load_s or 0.0)
+
+    def close(self, timeout: float = 5.0) -> None:
+        """Stop the worker after the requests already queued."""
+        with self._start_lock:
+            thread, self._thread = self._thread, None
+        if thread is not None:
+            self._queue.put(_STOP)
+            thread.join(timeout)
+
+    def _ensure_worker(self) -> None:
+        if self._thread is None:
+            with self._start_lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name="embedding-batcher", daemon=True)
+                    self._thread.start()
+
+    def _run(self) -> None:
+        while True:
+            first = self._queue.get()
+            if first is _STOP:
+                return
+            batch = [first]
+            stop = False
+            deadline = time.perf_counter() + self.max_wait_s
+            while len(batch) < self.max_batch:
+                remaining = deadline - time.perf_counter()
+                try:
+                    item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    stop = True
+                    break
+                batch.append(item)
+            self._encode(batch)
+            if stop:
+                return
+
+    def _encode(self, batch: list[_Request]) -> None:
+        texts = list(dict.fromkeys(r.text for r in batch))
+        t0 = time.perf_counter()
+        try:
+            if self._model is None:
+                self._model = self._loader()
+                self.load_s = time.perf_counter() - t0
+                t0 = time.perf_counter()
+            vectors = np.asarray(
+                self._model.encode(texts, batch_size=len(texts), normalize_embeddings=True), dtype=np.float32
+            )
+        except BaseException as e:
+            self.errors += 1
+            for r in batch:
+                _resolve(r.future, error=e)
+            return
+        vectors.setflags(write=False)
+        by_text = dict(zip(texts, vectors))
+        done = time.perf_counter()
+        self.batches += 1
+        self.encoded += len(texts)
+        self.encode_s += done - t0
+        self._batch_sizes.append(len(batch))
+        cached = {r.text for r in batch if r.use_cache}
+        if cached and self.cache_size > 0:
+            with self._cache_lock:
+                for text in cached:
+                    self._cache[text] = by_text[text]
+                    self._cache.move_to_end(text)
+                while len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+        for r in batch:
+            self._latencies.append(done - r.enqueued_at)
+            _resolve(r.future, by_text[r.text])
+
+    def stats(self) -> dict:
+        sizes = sorted(self._batch_sizes)
+        latencies = sorted(self._latencies)
+        lookups = self.cache_hits + self.cache_misses
+
+        def pct(values: list, q: float):
+            return values[min(len(values) - 1, int(q * len(values)))] if values else None
+
+        p50, p95 = pct(latencies, 0.5), pct(latencies, 0.95)
+        return {
+            "backend": EMBEDDING_BACKEND,
+            "model_loaded": self._model is not None,
+            "load_s": round(self.load_s, 3) if self.load_s is not None else None,
+            "batches": self.batches,
+            "encoded": self.encoded,
+            "errors": self.errors,
+            "queue_depth": self._queue.qsize(),
+            "batch_size_mean": round(sum(sizes) / len(sizes), 2) if sizes else None,
+            "batch_size_p50": pct(sizes, 0.5),
+            "batch_size_max": sizes[-1] if sizes else None,
+            "item_latency_p50_ms": round(p50 * 1000, 2) if p50 is not None else None,
+            "item_latency_p95_ms": round(p95 * 1000, 2) if p95 is not None else None,
+            "encode_ms_per_item": round(self.encode_s / self.encoded * 1000, 3) if self.encoded else None,
+            "cache_entries": len(self._cache),
+            "cache_hits": self.cache_hits,
+            "cache_misses": self.cache_misses,
+            "cache_hit_rate": round(self.cache_hits / lookups, 4) if lookups else None,
+            "max_batch": self.max_batch,
+            "max_wait_ms": self.max_wait_s * 1000,
+        }
+
+
+_service = EmbeddingService()
+
+
+def get_embedding_service() -> EmbeddingService:
+    """Return the process-wide embedding service."""
+    return _service
@@ -0,0 +1,140 @@
+"""Shared async HTTP client for the Gemini REST API.
+
+One httpx.AsyncClient per process, opened at app startup and closed at shutdown, so chat
+requests reuse pooled keep-alive connections instead of a new TLS handshake per call.
+"""
+import json
+import logging
+import os
+import time
+from email.utils import parsedate_to_datetime
+from typing import AsyncIterator, Optional
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+GEMINI_BASE_URL = os.getenv("GEMINI_BASE_URL", "https://generativelanguage.googleapis.com/v1beta").rstrip("/")
+# Models tried in order until one returns text
+GEMINI_MODELS = ("gemini-2.5-flash", "gemini-2.0-flash", "gemini-2.5-pro", "gemini-2.0-flash-lite")
+MAX_CONNECTIONS = int(os.getenv("GEMINI_MAX_CONNECTIONS", "100"))
+MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("GEMINI_MAX_KEEPALIVE_CONNECTIONS", "20"))
+# Seconds an idle pooled connection is kept; must stay below the server's own idle timeout.
+KEEPALIVE_EXPIRY_S = float(os.getenv("GEMINI_KEEPALIVE_EXPIRY", "30"))
+CONNECT_TIMEOUT_S = float(os.getenv("GEMINI_CONNECT_TIMEOUT", "5"))
+READ_TIMEOUT_S = float(os.getenv("GEMINI_READ_TIMEOUT", "60"))
+# Seconds to wait for a free pooled connection before failing the call
+POOL_TIMEOUT_S = float(os.getenv("GEMINI_POOL_TIMEOUT", "10"))
+# HTTP/2 multiplexes calls over fewer connections; needs the optional h2 package.
+USE_HTTP2 = os.getenv("GEMINI_HTTP2", "").strip().lower() in ("1", "true", "yes")
+
+_client: Optional[httpx.AsyncClient] = None
+
+
+def _new_client() -> httpx.AsyncClient:
+    limits = httpx.Limits(
+        max_connections=MAX_CONNECTIONS,
+        max_keepalive_connections=MAX_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry=KEEPALIVE_EXPIRY_S,
+    )
+    timeout = httpx.Timeout(READ_TIMEOUT_S, connect=CONNECT_TIMEOUT_S, pool=POOL_TIMEOUT_S)
+    http2 = USE_HTTP2
+    if http2:
+        try:
+            import h2  # noqa: F401
+        except ImportError:
+            logger.warning("GEMINI_HTTP2 is set but the h2 package is not installed; using HTTP/1.1")
+            http2 = False
+    return httpx.AsyncClient(base_url=GEMINI_BASE_URL, limits=limits, timeout=timeout, http2=http2)
+
+
+async def start_gemini_client() -> None:
+    """Open the shared client (app startup)."""
+    global _client
+    if _client is None:
+        _client = _new_client()
+
+
+async def close_gemini_client() -> None:
+    """Close pooled connections (app shutdown)."""
+    global _client
+    if _client is not None:
+        client, _client = _client, None
+        await client.aclose()
+
+
+def get_gemini_client() -> httpx.AsyncClient:
+    """The shared client; created on first use when the app lifecycle did not start it (scripts, tests)."""
+    global _client
+    if _client is None:
+        _client = _new_client()
+    return _client
+
+
+def generate_body(question: str, system_prompt: str) -> dict:
+    return {
+        "contents": [{"parts": [{"text": question}]}],
+        "systemInstruction": {"parts": [{"text": system_prompt}]},
+        "generationConfig": {"maxOutputTokens": 1024, "temperature": 0.4},
+    }
+
+
+def _parts_text(data: dict) -> str:
+    text = ""
+    for c in data.get("candidates", []) or []:
+        for p in c.get("content", {}).get("parts", []) or []:
+            text += p.get("text", "") or ""
+    return text
+
+
+def response_text(data: dict) -> str:
+    """Concatenated text parts of every candidate in a generateContent response."""
+    return _parts_text(data).strip()
+
+
+def retry_after_seconds(resp: httpx.Response) -> Optional[float]:
+    """Delay a 429 asks for: the Retry-After header (seconds or HTTP date), else the
+    RetryInfo retryDelay ("17s") in the error body. None if the response gives neither."""
+    header = resp.headers.get("retry-after")
+    if header:
+        try:
+            return max(0.0, float(header))
+        except ValueError:
+            try:
+                return max(0.0, parsedate_to_datetime(header).timestamp() - time.time())
+            except (TypeError, ValueError):
+                pass
+    try:
+        details = resp.json().get("error", {}).get("details", [])
+    except ValueError:
+        return None
+    for detail in details if isinstance(details, list) else []:
+        delay = detail.get("retryDelay") if isinstance(detail, dict) else None
+        if isinstance(delay, str) and delay.endswith("s"):
+            try:
+                return max(0.0, float(delay[:-1]))
+            except ValueError:
+                pass
+    return None
+
+
+async def stream_text(model: str, body: dict, api_key: str) -> AsyncIterator[str]:
+    """Yield text pieces from streamGenerateContent (SSE) as they arrive.
+
+    Raises httpx.HTTPStatusError for a non-2xx response before any text is yielded.
+    """
+    client = get_gemini_client()
+    async with client.stream(
+        "POST", f"/models/{model}:streamGenerateContent", params={"alt": "sse"}, json=body,
+        headers={"x-goog-api-key": api_key},
+    ) as resp:
+        if resp.status_code >= 400:
+            await resp.aread()
+            resp.raise_for_status()
+        async for line in resp.aiter_lines():
+            if not line.startswith("data:"):
+                continue
+            # Not stripped: whitespace at chunk edges separates words across chunks.
+            text = _parts_text(json.loads(line[5:]))
+            if text:
+                yield text
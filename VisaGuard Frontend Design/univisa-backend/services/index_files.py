@@ -0,0 +1,140 @@
+"""Versioned on-disk indexes shared by the vector index and the lexical (BM25) index.
+
+Each build is written to a new <index_dir>/<version>/ directory and then published by
+atomically replacing <index_dir>/CURRENT with the version name, so readers never see a
+half-written index. The previous version is kept for processes that have not reloaded yet.
+Chunk payloads are one UTF-8 blob plus byte offsets and per-chunk source codes, read through
+memory maps.
+"""
+import json
+import os
+import shutil
+import threading
+import time
+import uuid
+from abc import ABC, abstractmethod
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Optional, Sequence
+
+import numpy as np
+
+KEEP_VERSIONS = 2
+
+
+def new_version_dir(index_dir: Path) -> Path:
+    index_dir.mkdir(parents=True, exist_ok=True)
+    path = index_dir / f"{datetime.now(timezone.utc):%Y%m%dT%H%M%S}-{uuid.uuid4().hex[:8]}"
+    path.mkdir()
+    return path
+
+
+def publish(index_dir: Path, path: Path) -> None:
+    """Make the version at path CURRENT and delete all but the newest older version."""
+    tmp = index_dir / "CURRENT.tmp"
+    tmp.write_text(path.name, encoding="utf-8")
+    os.replace(tmp, index_dir / "CURRENT")
+    versions = sorted(
+        (p for p in index_dir.iterdir() if p.is_dir() and p.name != path.name), key=lambda p: p.stat().st_mtime_ns
+    )
+    for old in versions[:max(0, len(versions) - (KEEP_VERSIONS - 1))]:
+        shutil.rmtree(old, ignore_errors=True)
+
+
+def write_payload(path: Path, texts: Sequence[str], sources: Sequence[str]) -> None:
+    """texts.bin + offsets.npy (n+1 byte offsets) and source_ids.npy + sources.json."""
+    blobs = [t.encode("utf-8") for t in texts]
+    offsets = np.zeros(len(blobs) + 1, np.int64)
+    np.cumsum([len(b) for b in blobs], out=offsets[1:])
+    (path / "texts.bin").write_bytes(b"".join(blobs))
+    np.save(path / "offsets.npy", offsets)
+    names = sorted(set(sources))
+    codes = {name: i for i, name in enumerate(names)}
+    np.save(path / "source_ids.npy", np.array([codes[s] for s in sources], np.uint32))
+    (path / "sources.json").write_text(json.dumps(names), encoding="utf-8")
+
+
+class Payload:
+    """Chunk texts and sources written by write_payload, memory-mapped."""
+
+    def __init__(self, path: Path):
+        self.offsets = np.load(path / "offsets.npy", mmap_mode="r")
+        self.source_ids = np.load(path / "source_ids.npy", mmap_mode="r")
+        self.sources = json.loads((path / "sources.json").read_text(encoding="utf-8"))
+        size = (path / "texts.bin").stat().st_size
+        self.texts = np.memmap(path / "texts.bin", dtype=np.uint8, mode="r") if size else np.zeros(0, np.uint8)
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def source(self, i: int) -> str:
+        return self.sources[self.source_ids[i]]
+
+    def text(self, i: int) -> str:
+        return self.texts[self.offsets[i]:self.offsets[i + 1]].tobytes().decode("utf-8")
+
+
+class VersionedIndex(ABC):
+    """Serves the CURRENT version of an index directory, swapping in a new one when a build publishes it.
+
+    Subclasses implement the abstract _load(path) -> snapshot. The pointer file is stat()ed at
+    most every check_interval seconds (via current()); a load failure keeps the previous
+    snapshot and is reported in stats().
+    """
+
+    def __init__(self, index_dir: Path, check_interval: float):
+        self._dir = index_dir
+        self._check_interval = check_interval
+        self._lock = threading.Lock()
+        self._snapshot = None
+        self._version: Optional[str] = None
+        self._signature: Optional[tuple[int, int]] = None
+        self._next_check = 0.0
+        self.load_count = 0
+        self.last_error: Optional[str] = None
+
+    @abstractmethod
+    def _load(self, path: Path):
+        """Read the version directory at path into the snapshot current() returns."""
+
+    def current(self):
+        """The loaded snapshot (None if no version has been published), refreshed if due."""
+        if time.monotonic() >= self._next_check:
+            self.refresh()
+        return self._snapshot
+
+    def refresh(self, force: bool = False) -> bool:
+        """Load CURRENT if it changed (or always when force). Returns True if a new snapshot was loaded."""
+        with self._lock:
+            self._next_check = time.monotonic() + self._check_interval
+            pointer = self._dir / "CURRENT"
+            try:
+                st = os.stat(pointer)
+            except FileNotFoundError:
+                return False
+            signature = (st.st_mtime_ns, st.st_size)
+            if signature == self._signature and not force:
+                return False
+            try:
+                version = pointer.read_text(encoding="utf-8").strip()
+                if version == self._version and not force:
+                    self._signature = signature
+                    return False
+                snapshot = self._load(self._dir / version)
+            except Exception as e:
+                self.last_error = f"{type(e).__name__}: {e}"
+                return False
+            self._snapshot = snapshot
+            self._version = version
+            self._signature = signature
+            self.load_count += 1
+            self.last_error = None
+            return True
+
+    def stats(self) -> dict:
+        return {
+            "path": str(self._dir),
+            "version": self._version,
+            "load_count": self.load_count,
+            "last_error": self.last_error,
+        }
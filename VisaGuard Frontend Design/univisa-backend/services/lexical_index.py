@@ -0,0 +1,196 @@
+"""In-process BM25 index over the ingested chunks, for exact-term questions and hybrid retrieval.
+
+scripts/ingest_docs.py writes it next to the vector store, as versioned directories under
+data/lexical_index/ (see services/index_files.py), each holding:
+
+- terms.json: the vocabulary, term id = position
+- term_offsets.npy, postings_doc.npy, postings_weight.npy: postings per term (CSR layout),
+  each weight the term's full BM25 contribution to that chunk, so a query is a gather and a sum
+- texts.bin, offsets.npy, source_ids.npy, sources.json: the chunks themselves
+
+Terms are lowercase words with hyphenated compounds kept whole ("i-20", "cap-gap", "h-1b")
+and also indexed without hyphens, so "I20" finds "I-20".
+"""
+import json
+import os
+import re
+from collections import Counter
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Sequence
+
+import numpy as np
+
+from services.index_files import Payload, VersionedIndex, new_version_dir, publish, write_payload
+from services.vector_index import CHECK_INTERVAL_S
+
+INDEX_DIR = Path(os.getenv(
+    "LEXICAL_INDEX_DIR", str(Path(__file__).resolve().parent.parent / "data" / "lexical_index")
+))
+BM25_K1 = 1.2
+BM25_B = 0.75
+# Questions with at most this many distinct content words, one of them a form number or a
+# KNOWN_TERMS entry, are answered from the lexical index alone (RAG_RETRIEVAL=hybrid)
+LEXICAL_MAX_TERMS = int(os.getenv("RAG_LEXICAL_MAX_TERMS", "4"))
+RRF_K = 60
+
+KNOWN_TERMS = frozenset({
+    "cap-gap", "sevis", "sevp", "opt", "cpt", "stem", "h-1b", "e-verify", "ead", "dso", "pdso", "rcl",
+    "unemployment", "grace", "reinstatement", "transfer", "signature", "i-20", "i-94", "i-765", "i-983",
+    "i-539", "ds-2019", "ds-160",
+})
+_FORM_RE = re.compile(r"(?:i|ds|g|ar|n)-\d{2,4}[a-z]?")
+_TERM_RE = re.compile(r"[a-z0-9]+(?:-[a-z0-9]+)*")
+STOPWORDS = frozenset(
+    "a an and are as at be been but by can could did do does for from had has have how i if in into is it its "
+    "me my no not of on or our should so than that the their them then there these they this to was we were "
+    "what when where which who why will with would you your".split()
+)
+
+
+def _term_counts(text: str) -> Counter:
+    counts = Counter(_TERM_RE.findall(text.lower()))
+    for term in [t for t in counts if "-" in t]:
+        counts[term.replace("-", "")] += counts[term]
+    for term in STOPWORDS.intersection(counts):
+        del counts[term]
+    return counts
+
+
+def query_terms(question: str) -> list[str]:
+    """Distinct index terms of a question, in order."""
+    return list(_term_counts(question))
+
+
+def is_known_term_query(question: str) -> bool:
+    """True for short questions naming a form or program term ("I-20 travel signature", "cap-gap")."""
+    words = [t for t in dict.fromkeys(_TERM_RE.findall(question.lower())) if t not in STOPWORDS]
+    if not words or len(words) > LEXICAL_MAX_TERMS:
+        return False
+    return any(t in KNOWN_TERMS or _FORM_RE.fullmatch(t) for t in words)
+
+
+def write_index(texts: Sequence[str], sources: Sequence[str], index_dir: Path = INDEX_DIR) -> Path:
+    """Build the BM25 index for chunks, write a new version and make it CURRENT."""
+    if len(sources) != len(texts):
+        raise ValueError("texts and sources must have the same length")
+    vocab: dict[str, int] = {}
+    term_ids, tfs, lengths = [], [], np.zeros(len(texts), np.float32)
+    for i, text in enumerate(texts):
+        counts = _term_counts(text)
+        term_ids.append(np.fromiter((vocab.setdefault(t, len(vocab)) for t in counts), np.int32, len(counts)))
+        tfs.append(np.fromiter(counts.values(), np.float32, len(counts)))
+        lengths[i] = sum(counts.values())
+    n = len(texts)
+    terms = np.concatenate(term_ids) if term_ids else np.zeros(0, np.int32)
+    tf = np.concatenate(tfs) if tfs else np.zeros(0, np.float32)
+    docs = np.repeat(np.arange(n, dtype=np.int32), [len(t) for t in term_ids])
+
+    order = np.argsort(terms, kind="stable")
+    terms, tf, docs = terms[order], tf[order], docs[order]
+    df = np.bincount(terms, minlength=len(vocab))
+    term_offsets = np.zeros(len(vocab) + 1, np.int64)
+    np.cumsum(df, out=term_offsets[1:])
+    idf = np.log1p((n - df + 0.5) / (df + 0.5))
+    avgdl = float(lengths.mean()) if n else 0.0
+    norm = BM25_K1 * (1 - BM25_B + BM25_B * lengths[docs] / max(avgdl, 1e-9))
+    weights = (idf[terms] * tf * (BM25_K1 + 1) / (tf + norm)).astype(np.float32)
+
+    path = new_version_dir(index_dir)
+    (path / "terms.json").write_text(json.dumps(list(vocab)), encoding="utf-8")
+    np.save(path / "term_offsets.npy", term_offsets)
+    np.save(path / "postings_doc.npy", docs)
+    np.save(path / "postings_weight.npy", weights)
+    write_payload(path, texts, sources)
+    meta = {"count": n, "terms": len(vocab), "postings": int(len(docs)), "avgdl": avgdl,
+            "k1": BM25_K1, "b": BM25_B, "created_at": datetime.now(timezone.utc).isoformat()}
+    (path / "meta.json").write_text(json.dumps(meta), encoding="utf-8")
+    publish(index_dir, path)
+    return path
+
+
+class _Snapshot:
+    """One loaded, immutable lexical index version."""
+
+    def __init__(self, path: Path):
+        self.meta = json.loads((path / "meta.json").read_text(encoding="utf-8"))
+        self.count = self.meta["count"]
+        terms = json.loads((path / "terms.json").read_text(encoding="utf-8"))
+        self.vocab = {t: i for i, t in enumerate(terms)}
+        self.term_offsets = np.load(path / "term_offsets.npy", mmap_mode="r")
+        self.postings_doc = np.load(path / "postings_doc.npy", mmap_mode="r")
+        self.postings_weight = np.load(path / "postings_weight.npy", mmap_mode="r")
+        self.payload = Payload(path)
+
+    def search(self, question: str, top_k: int) -> list[dict]:
+        ids = [self.vocab[t] for t in query_terms(question) if t in self.vocab]
+        if not ids or top_k <= 0:
+            return []
+        spans = [(self.term_offsets[t], self.term_offsets[t + 1]) for t in ids]
+        docs = np.concatenate([self.postings_doc[a:b] for a, b in spans])
+        weights = np.concatenate([self.postings_weight[a:b] for a, b in spans])
+        scores = np.bincount(docs, weights, minlength=self.count)
+        k = min(top_k, self.count)
+        top = np.argpartition(-scores, k - 1)[:k] if k < self.count else np.arange(self.count)
+        top = top[np.argsort(-scores[top], kind="stable")]
+        return [
+            {"source": self.payload.source(i), "text": self.payload.text(i), "score": float(scores[i])}
+            for i in top.tolist() if scores[i] > 0
+        ]
+
+
+class LexicalIndex(VersionedIndex):
+    """The CURRENT BM25 index version, reloaded within check_interval seconds of a new ingest."""
+
+    def __init__(self, index_dir: Path = INDEX_DIR, check_interval: float = CHECK_INTERVAL_S):
+        super().__init__(index_dir, check_interval)
+        self.searches = 0
+
+    def _load(self, path: Path) -> _Snapshot:
+        return _Snapshot(path)
+
+    def search(self, question: str, top_k: int = 5) -> list[dict]:
+        """Top-k chunks by BM25 score: [{source, text, score}], best first; only chunks sharing a term."""
+        snapshot = self.current()
+        self.searches += 1
+        return snapshot.search(question, top_k) if snapshot is not None else []
+
+    def __len__(self) -> int:
+        snapshot = self.current()
+        return snapshot.count if snapshot is not None else 0
+
+    def stats(self) -> dict:
+        snapshot = self._snapshot
+        meta = snapshot.meta if snapshot is not None else {}
+        return {
+            **super().stats(),
+            "count": meta.get("count", 0),
+            "terms": meta.get("terms", 0),
+            "postings": meta.get("postings", 0),
+            "searches": self.searches,
+        }
+
+
+def reciprocal_rank_fusion(rankings: Sequence[Sequence[dict]], top_k: int, k: int = RRF_K) -> list[dict]:
+    """Merge best-first result lists by sum of 1 / (k + rank); chunks are matched on (source, text).
+
+    Where a chunk appears in several lists, the first list's copy is kept (so put the vector
+    results first to keep their "vector").
+    """
+    fused: dict[tuple[str, str], float] = {}
+    chunks: dict[tuple[str, str], dict] = {}
+    for ranking in rankings:
+        for rank, chunk in enumerate(ranking):
+            key = (chunk["source"], chunk["text"])
+            fused[key] = fused.get(key, 0.0) + 1.0 / (k + rank + 1)
+            chunks.setdefault(key, chunk)
+    best = sorted(fused, key=fused.get, reverse=True)[:top_k]
+    return [{**chunks[key], "score": fused[key]} for key in best]
+
+
+_index = LexicalIndex()
+
+
+def get_lexical_index() -> LexicalIndex:
+    """Return the process-wide BM25 index."""
+    return _index
@@ -0,0 +1,221 @@
+"""Admission control for Gemini calls: token bucket, bounded priority queue and 429 backoff.
+
+Every Gemini HTTP call first takes a token. When none is free, callers wait in a priority
+queue (DSO before student, then arrival order) until a token frees up or their deadline
+passes. A 429 pauses all grants for its Retry-After (or an exponential backoff), so bursts
+turn into short waits instead of failures. Limits are per worker process.
+"""
+import asyncio
+import heapq
+import itertools
+import os
+import time
+from collections import deque
+from enum import IntEnum
+from typing import Optional
+
+from services.model_router import Throttled
+
+# Requests per minute this worker may send to Gemini (0 = no limit) and the burst allowance
+RATE_LIMIT_RPM = float(os.getenv("GEMINI_RPM", "1000"))
+BURST = int(os.getenv("GEMINI_BURST", "50"))
+MAX_QUEUE = int(os.getenv("GEMINI_QUEUE_MAX", "500"))
+# Seconds a chat may wait for admission (queueing plus 429 pauses) before it is turned away
+QUEUE_TIMEOUT_S = float(os.getenv("GEMINI_QUEUE_TIMEOUT", "15"))
+# Backoff after a 429 without Retry-After: BACKOFF_BASE_S, doubling per consecutive 429
+BACKOFF_BASE_S = 1.0
+BACKOFF_MAX_S = 30.0
+WAIT_SAMPLES = 1000
+
+
+class Priority(IntEnum):
+    """Lower value is served first."""
+
+    DSO = 0
+    STUDENT = 1
+
+
+class SchedulerRejected(Throttled):
+    """No Gemini slot before the deadline; `reason` is queue_full, displaced, deadline or rate_limited."""
+
+    def __init__(self, reason: str):
+        self.reason = reason
+        super().__init__(f"Gemini request not scheduled: {reason}")
+
+
+class _Waiter:
+    __slots__ = ("priority", "seq", "future")
+
+    def __init__(self, priority: int, seq: int, future: asyncio.Future):
+        self.priority = priority
+        self.seq = seq
+        self.future = future
+
+
+class LLMScheduler:
+    """Token bucket plus priority wait queue, drained by one pump task on the event loop.
+
+    All state is touched only from the event loop thread. Waiters that time out or are
+    cancelled stay in the heap until the pump pops them (their future is already done).
+    """
+
+    def __init__(
+        self,
+        rpm: float = RATE_LIMIT_RPM,
+        burst: int = BURST,
+        max_queue: int = MAX_QUEUE,
+        queue_timeout: float = QUEUE_TIMEOUT_S,
+    ):
+        self.rpm = rpm
+        self.rate = rpm / 60.0
+        self.burst = max(1, burst)
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self._tokens = float(self.burst)
+        self._refilled_at = time.monotonic()
+        self._paused_until = 0.0
+        self._backoff_streak = 0
+        self._heap: list[tuple[int, int, _Waiter]] = []
+        self._seq = itertools.count()
+        self._waiting = 0
+        self._pump_task: Optional[asyncio.Task] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._waits: deque[float] = deque(maxlen=WAIT_SAMPLES)
+        self.peak_depth = 0
+        self.granted = {p.name.lower(): 0 for p in Priority}
+        self.queued = 0
+        self.rejected = {"queue_full": 0, "displaced": 0, "deadline": 0, "rate_limited": 0}
+        self.rate_limited_responses = 0
+
+    def deadline(self) -> float:
+        """time.monotonic() deadline for a request starting now."""
+        return time.monotonic() + self.queue_timeout
+
+    async def acquire(self, priority: Priority, deadline: float) -> None:
+        """Wait for a token; raises SchedulerRejected if none is granted before deadline."""
+        self._bind(asyncio.get_running_loop())
+        now = time.monotonic()
+        self._refill(now)
+        if self._paused_until > deadline:
+            self._reject("rate_limited")
+        if not self._waiting and now >= self._paused_until and self._tokens >= 1:
+            self._tokens -= 1
+            self._granted(priority, 0.0)
+            return
+        if self._waiting >= self.max_queue:
+            self._displace(priority)
+        waiter = _Waiter(priority, next(self._seq), self._loop.create_future())
+        heapq.heappush(self._heap, (waiter.priority, waiter.seq, waiter))
+        self._waiting += 1
+        self.queued += 1
+        self.peak_depth = max(self.peak_depth, self._waiting)
+        if self._pump_task is None:
+            self._pump_task = self._loop.create_task(self._pump())
+        try:
+            await asyncio.wait_for(waiter.future, timeout=max(0.0, deadline - now))
+        except asyncio.TimeoutError:
+            self._reject("deadline")
+        finally:
+            self._waiting -= 1
+        self._granted(priority, time.monotonic() - now)
+
+    def rate_limited(self, retry_after_s: Optional[float]) -> float:
+        """Pause every grant after a 429; returns the pause in seconds."""
+        self.rate_limited_responses += 1
+        if retry_after_s is None:
+            retry_after_s = min(BACKOFF_MAX_S, BACKOFF_BASE_S * 2 ** self._backoff_streak)
+            self._backoff_streak += 1
+        self._paused_until = max(self._paused_until, time.monotonic() + retry_after_s)
+        return retry_after_s
+
+    def succeeded(self) -> None:
+        """A call got through: the next 429 without Retry-After starts the backoff over."""
+        self._backoff_streak = 0
+
+    def _bind(self, loop: asyncio.AbstractEventLoop) -> None:
+        # Futures and the pump belong to one loop; start fresh if a new loop calls in (scripts, tests).
+        if self._loop is not loop:
+            self._loop = loop
+            self._heap.clear()
+            self._waiting = 0
+            self._pump_task = None
+
+    def _refill(self, now: float) -> None:
+        if self.rate <= 0:
+            self._tokens = float(self.burst)
+        else:
+            self._tokens = min(self.burst, self._tokens + (now - self._refilled_at) * self.rate)
+        self._refilled_at = now
+
+    def _displace(self, priority: Priority) -> None:
+        """Queue full: turn away the newest lowest-priority waiter if it ranks below the newcomer."""
+        live = [w for _, _, w in self._heap if not w.future.done()]
+        victim = max(live, key=lambda w: (w.priority, w.seq), default=None)
+        if victim is None or victim.priority <= priority:
+            self._reject("queue_full")
+        victim.future.set_exception(SchedulerRejected("displaced"))
+        self.rejected["displaced"] += 1
+
+    def _reject(self, reason: str) -> None:
+        if reason != "displaced":
+            self.rejected[reason] += 1
+        raise SchedulerRejected(reason)
+
+    def _granted(self, priority: Priority, waited_s: float) -> None:
+        self.granted[priority.name.lower()] += 1
+        self._waits.append(waited_s)
+
+    async def _pump(self) -> None:
+        try:
+            while True:
+                while self._heap and self._heap[0][2].future.done():
+                    heapq.heappop(self._heap)
+                if not self._heap:
+                    return
+                now = time.monotonic()
+                self._refill(now)
+                wait = self._paused_until - now
+                if self._tokens < 1:
+                    wait = max(wait, (1 - self._tokens) / self.rate)
+                if wait > 0:
+                    await asyncio.sleep(wait)
+                    continue
+                _, _, waiter = heapq.heappop(self._heap)
+                self._tokens -= 1
+                waiter.future.set_result(None)
+        finally:
+            self._pump_task = None
+
+    def stats(self) -> dict:
+        waits = sorted(self._waits)
+        now = time.monotonic()
+        self._refill(now)
+
+        def pct(q: float) -> Optional[float]:
+            return round(waits[min(len(waits) - 1, int(q * len(waits)))] * 1000, 1) if waits else None
+
+        return {
+            "rpm": self.rpm,
+            "burst": self.burst,
+            "tokens": round(self._tokens, 2),
+            "queue_depth": self._waiting,
+            "peak_queue_depth": self.peak_depth,
+            "max_queue": self.max_queue,
+            "queue_timeout_s": self.queue_timeout,
+            "granted": dict(self.granted),
+            "queued": self.queued,
+            "wait_p50_ms": pct(0.5),
+            "wait_p95_ms": pct(0.95),
+            "wait_max_ms": round(waits[-1] * 1000, 1) if waits else None,
+            "rejected": dict(self.rejected),
+            "rate_limited_responses": self.rate_limited_responses,
+            "paused_for_s": round(max(0.0, self._paused_until - now), 2),
+        }
+
+
+_scheduler = LLMScheduler()
+
+
+def get_llm_scheduler() -> LLMScheduler:
+    """Return the process-wide Gemini call scheduler."""
+    return _scheduler
@@ -0,0 +1,319 @@
+"""Routing of Gemini calls across models: rolling stats, circuit breakers and hedged requests.
+
+Models are tried in GEMINI_MODELS order, skipping any whose breaker is open. If the model
+in flight has not answered within its rolling p95 latency, the next model is started too
+and whichever answers first wins; the other call is cancelled. Latency and the hedge delay
+are measured from the moment a call is actually sent, not from when it started waiting for
+a scheduler slot, so queueing under load neither inflates the p95 nor triggers hedges.
+"""
+import asyncio
+import os
+import threading
+import time
+from collections import deque
+from datetime import datetime, timezone
+from typing import Awaitable, Callable, Optional
+
+from services.gemini_client import GEMINI_MODELS
+
+HEDGING_ENABLED = os.getenv("GEMINI_HEDGING", "true").strip().lower() in ("1", "true", "yes")
+# Hedge delay (seconds) for a model with fewer than HEDGE_MIN_SAMPLES recorded latencies
+DEFAULT_HEDGE_DELAY_S = float(os.getenv("GEMINI_HEDGE_DELAY", "4"))
+HEDGE_MIN_SAMPLES = 20
+# Consecutive failures that open a model's breaker, and seconds it stays open before a probe
+BREAKER_FAILURES = int(os.getenv("GEMINI_BREAKER_FAILURES", "5"))
+BREAKER_COOLDOWN_S = float(os.getenv("GEMINI_BREAKER_COOLDOWN", "30"))
+LATENCY_WINDOW = 200  # successful calls kept per model for percentiles
+OUTCOME_WINDOW = 100  # calls kept per model for the error rate
+DECISION_LOG_SIZE = 50
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+
+class Throttled(Exception):
+    """The call was held back for quota reasons (no scheduler slot, 429 past the deadline).
+
+    Says nothing about the model's health, so it does not count toward its breaker.
+    """
+
+
+class ModelCallError(Exception):
+    """Every candidate model failed or returned no text, or every breaker is open.
+
+    `errors` maps model -> exception for the models that were called.
+    """
+
+    def __init__(self, errors: dict[str, BaseException]):
+        self.errors = errors
+        last = next(reversed(errors.values()), None) if errors else None
+        super().__init__(str(last) if last is not None else "every model's circuit breaker is open")
+
+
+class CallClock:
+    """Handed to each routed call: sent() right before an HTTP request goes out, queued() when
+    the call goes back to waiting (e.g. a 429 sends it back to the scheduler).
+
+    The router times the model from the last sent() and arms the hedge only while it is sent.
+    """
+
+    def __init__(self) -> None:
+        self.sent_at: Optional[float] = None
+        self.in_flight = asyncio.Event()
+
+    def sent(self) -> None:
+        self.sent_at = time.monotonic()
+        self.in_flight.set()
+
+    def queued(self) -> None:
+        self.sent_at = None
+        self.in_flight.clear()
+
+
+class _ModelState:
+    def __init__(self) -> None:
+        self.latencies: deque[float] = deque(maxlen=LATENCY_WINDOW)
+        self.outcomes: deque[bool] = deque(maxlen=OUTCOME_WINDOW)
+        self.state = CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self.probe_in_flight = False
+        self.calls = 0
+        self.failures = 0
+        self.cancelled = 0
+        self.throttled = 0
+        self.hedges = 0  # times this model was started as a hedge
+        self.hedge_wins = 0
+        self.last_error: Optional[str] = None
+
+    def percentile(self, q: float) -> Optional[float]:
+        if not self.latencies:
+            return None
+        ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+class ModelRouter:
+    """Per-model rolling latency/error stats and circuit breakers, plus the hedged call loop.
+
+    Breakers: closed -> open after BREAKER_FAILURES consecutive failures; open -> half_open
+    once BREAKER_COOLDOWN_S has passed, letting one probe call through; the probe's result
+    closes or re-opens it. State is touched from the event loop and read by the admin
+    endpoint from a worker thread, hence the lock.
+    """
+
+    def __init__(
+        self,
+        models: tuple[str, ...] = GEMINI_MODELS,
+        hedging: bool = HEDGING_ENABLED,
+        default_hedge_delay: float = DEFAULT_HEDGE_DELAY_S,
+        breaker_failures: int = BREAKER_FAILURES,
+        breaker_cooldown: float = BREAKER_COOLDOWN_S,
+    ):
+        self.models = models
+        self.hedging = hedging
+        self.default_hedge_delay = default_hedge_delay
+        self.breaker_failures = breaker_failures
+        self.breaker_cooldown = breaker_cooldown
+        self._lock = threading.Lock()
+        self._states = {m: _ModelState() for m in models}
+        self._decisions: deque[dict] = deque(maxlen=DECISION_LOG_SIZE)
+
+    def candidates(self) -> list[str]:
+        """Models to try, in order, skipping open breakers (empty if every breaker is open)."""
+        now = time.monotonic()
+        with self._lock:
+            return [m for m in self.models if self._available(m, now)]
+
+    def hedge_delay(self, model: str) -> float:
+        """Seconds to wait for model before hedging: its p95, or the default until it has enough samples."""
+        with self._lock:
+            st = self._states[model]
+            if len(st.latencies) < HEDGE_MIN_SAMPLES:
+                return self.default_hedge_delay
+            return st.percentile(0.95)
+
+    def acquire(self, model: str) -> bool:
+        """Claim a call slot; False when the breaker is open (or half-open with its probe in flight)."""
+        with self._lock:
+            st = self._states[model]
+            if not self._available(model, time.monotonic()):
+                return False
+            if st.state == HALF_OPEN:
+                st.probe_in_flight = True
+            st.calls += 1
+            return True
+
+    def record_success(self, model: str, latency_s: Optional[float] = None) -> None:
+        with self._lock:
+            st = self._states[model]
+            if latency_s is not None:
+                st.latencies.append(latency_s)
+            st.outcomes.append(True)
+            st.consecutive_failures = 0
+            st.state = CLOSED
+            st.probe_in_flight = False
+
+    def record_failure(self, model: str, error: BaseException) -> None:
+        with self._lock:
+            st = self._states[model]
+            st.outcomes.append(False)
+            st.failures += 1
+            st.consecutive_failures += 1
+            st.last_error = f"{type(error).__name__}: {error}"
+            if st.state == HALF_OPEN or st.consecutive_failures >= self.breaker_failures:
+                st.state = OPEN
+                st.opened_at = time.monotonic()
+            st.probe_in_flight = False
+
+    def record_cancelled(self, model: str) -> None:
+        """A hedged call that lost the race: neither a success nor a failure."""
+        with self._lock:
+            st = self._states[model]
+            st.cancelled += 1
+            st.probe_in_flight = False
+
+    def record_throttled(self, model: str) -> None:
+        with self._lock:
+            st = self._states[model]
+            st.throttled += 1
+            st.probe_in_flight = False
+
+    def _available(self, model: str, now: float) -> bool:
+        st = self._states[model]
+        if st.state == OPEN and now - st.opened_at >= self.breaker_cooldown:
+            st.state = HALF_OPEN
+        if st.state == OPEN:
+            return False
+        return not (st.state == HALF_OPEN and st.probe_in_flight)
+
+    async def call(self, fn: Callable[[str, CallClock], Awaitable[str]]) -> tuple[str, str]:
+        """Run fn(model, clock) across the candidates with hedging; returns (model, text) of the first answer.
+
+        A model is started when the one before it fails or returns empty text, or (at most one
+        hedge per primary) when the primary has been sent (clock.sent()) and not answered within
+        its hedge delay. Raises ModelCallError if every candidate fails.
+        """
+        t0 = time.monotonic()
+        queue = deque(self.candidates())
+        pending: dict[asyncio.Task, tuple[str, CallClock]] = {}
+        errors: dict[str, BaseException] = {}
+        decision = {"at": datetime.now(timezone.utc).isoformat(), "order": list(queue), "started": [], "hedged": []}
+        primary: Optional[tuple[str, CallClock]] = None
+
+        def start(hedge: bool) -> Optional[tuple[str, CallClock]]:
+            while queue:
+                model = queue.popleft()
+                if not self.acquire(model):
+                    decision.setdefault("skipped", []).append(model)
+                    continue
+                clock = CallClock()
+                pending[asyncio.ensure_future(fn(model, clock))] = (model, clock)
+                decision["started"].append(model)
+                if hedge:
+                    decision["hedged"].append(model)
+                    with self._lock:
+                        self._states[model].hedges += 1
+                return model, clock
+            return None
+
+        try:
+            primary = start(hedge=False)
+            hedged = False
+            while pending:
+                timeout = None
+                waiting = set(pending)
+                admission = None
+                if self.hedging and not hedged and queue and primary is not None:
+                    model, clock = primary
+                    if clock.sent_at is not None:
+                        timeout = max(0.0, clock.sent_at + self.hedge_delay(model) - time.monotonic())
+                    else:
+                        # Waiting for a scheduler slot: a hedge would only queue behind it and
+                        # spend a second slot on the same question, so arm it once sent.
+                        admission = asyncio.ensure_future(clock.in_flight.wait())
+                        waiting.add(admission)
+                try:
+                    done, _ = await asyncio.wait(waiting, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                finally:
+                    if admission is not None:
+                        admission.cancel()
+                done.discard(admission)
+                if not done:
+                    model, clock = primary
+                    # Re-checked: a 429 may have sent the primary back to the queue meanwhile.
+                    if timeout is not None and clock.sent_at is not None and (
+                        time.monotonic() >= clock.sent_at + self.hedge_delay(model)
+                    ):
+                        start(hedge=True)
+                        hedged = True
+                    continue
+                for task in done:
+                    model, clock = pending.pop(task)
+                    error = task.exception()
+                    text = None if error is not None else task.result()
+                    if error is None and text:
+                        sent_at = clock.sent_at
+                        self.record_success(model, time.monotonic() - sent_at if sent_at is not None else None)
+                        if model in decision["hedged"]:
+                            with self._lock:
+                                self._states[model].hedge_wins += 1
+                        decision.update(winner=model, elapsed_ms=round((time.monotonic() - t0) * 1000, 1))
+                        return model, text
+                    error = error or ValueError("empty response")
+                    errors[model] = error
+                    if isinstance(error, Throttled):
+                        self.record_throttled(model)
+                    else:
+                        self.record_failure(model, error)
+                if not pending:
+                    primary = start(hedge=False)
+                    hedged = False
+            decision.update(winner=None, elapsed_ms=round((time.monotonic() - t0) * 1000, 1))
+            raise ModelCallError(errors)
+        finally:
+            for task, (model, _) in pending.items():
+                task.cancel()
+                self.record_cancelled(model)
+            if errors:
+                decision["failed"] = {m: f"{type(e).__name__}: {e}" for m, e in errors.items()}
+            with self._lock:
+                self._decisions.append(decision)
+
+    def stats(self) -> dict:
+        now = time.monotonic()
+        with self._lock:
+            models = {}
+            for model, st in self._states.items():
+                self._available(model, now)  # moves expired open breakers to half_open
+                p50, p95 = st.percentile(0.5), st.percentile(0.95)
+                models[model] = {
+                    "state": st.state,
+                    "calls": st.calls,
+                    "failures": st.failures,
+                    "cancelled": st.cancelled,
+                    "throttled": st.throttled,
+                    "error_rate": round(st.outcomes.count(False) / len(st.outcomes), 4) if st.outcomes else None,
+                    "consecutive_failures": st.consecutive_failures,
+                    "p50_ms": round(p50 * 1000, 1) if p50 is not None else None,
+                    "p95_ms": round(p95 * 1000, 1) if p95 is not None else None,
+                    "hedge_delay_ms": round((p95 if len(st.latencies) >= HEDGE_MIN_SAMPLES else self.default_hedge_delay) * 1000, 1),
+                    "hedges": st.hedges,
+                    "hedge_wins": st.hedge_wins,
+                    "open_for_s": round(max(0.0, self.breaker_cooldown - (now - st.opened_at)), 1) if st.state == OPEN else None,
+                    "last_error": st.last_error,
+                }
+            return {
+                "hedging": self.hedging,
+                "breaker_failures": self.breaker_failures,
+                "breaker_cooldown_s": self.breaker_cooldown,
+                "models": models,
+                "recent_decisions": list(self._decisions),
+            }
+
+
+_router = ModelRouter()
+
+
+def get_model_router() -> ModelRouter:
+    """Return the process-wide model router."""
+    return _router
@@ -0,0 +1,67 @@
+"""all-MiniLM-L6-v2 on ONNX Runtime (EMBEDDING_BACKEND=onnx): int8 weights, CPU only, no torch.
+
+Needs onnxruntime and tokenizers (requirements-onnx.txt) and the files written by
+scripts/export_onnx_embedder.py: model_int8.onnx and tokenizer.json in EMBEDDING_ONNX_DIR.
+Reproduces SentenceTransformer.encode for this model: WordPiece tokens truncated to 256,
+mean pooling over the attention mask, optional L2 normalization.
+"""
+import os
+from pathlib import Path
+from typing import Sequence, Union
+
+import numpy as np
+
+ONNX_DIR = Path(os.getenv(
+    "EMBEDDING_ONNX_DIR", str(Path(__file__).resolve().parent.parent / "data" / "models" / "all-MiniLM-L6-v2-onnx")
+))
+ONNX_MODEL_FILE = os.getenv("EMBEDDING_ONNX_FILE", "model_int8.onnx")
+# all-MiniLM-L6-v2's max_seq_length in sentence-transformers
+MAX_SEQ_LENGTH = 256
+# ONNX Runtime intra-op threads (0 = one per core)
+ONNX_THREADS = int(os.getenv("EMBEDDING_ONNX_THREADS", "0"))
+
+
+class OnnxEmbedder:
+    """Drop-in for the subset of SentenceTransformer the embedding service uses (encode)."""
+
+    def __init__(self, model_dir: Path = ONNX_DIR, model_file: str = ONNX_MODEL_FILE, threads: int = ONNX_THREADS):
+        import onnxruntime as ort
+        from tokenizers import Tokenizer
+
+        model_path = Path(model_dir) / model_file
+        tokenizer_path = Path(model_dir) / "tokenizer.json"
+        for path in (model_path, tokenizer_path):
+            if not path.exists():
+                raise FileNotFoundError(f"{path} not found; run scripts/export_onnx_embedder.py")
+        self.tokenizer = Tokenizer.from_file(str(tokenizer_path))
+        self.tokenizer.enable_truncation(max_length=MAX_SEQ_LENGTH)
+        pad_id = self.tokenizer.token_to_id("[PAD]") or 0
+        self.tokenizer.enable_padding(pad_id=pad_id, pad_token="[PAD]")
+        options = ort.SessionOptions()
+        options.intra_op_num_threads = threads
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.session = ort.InferenceSession(str(model_path), options, providers=["CPUExecutionProvider"])
+        self._inputs = {i.name for i in self.session.get_inputs()}
+
+    def encode(
+        self, sentences: Union[str, Sequence[str]], batch_size: int = 32, normalize_embeddings: bool = False
+    ) -> np.ndarray:
+        """(n, 384) float32 embeddings, or (384,) for a single string."""
+        single = isinstance(sentences, str)
+        texts = [sentences] if single else list(sentences)
+        out = [self._encode_batch(texts[i:i + batch_size]) for i in range(0, len(texts), max(1, batch_size))]
+        vectors = np.concatenate(out) if out else np.zeros((0, 384), np.float32)
+        if normalize_embeddings:
+            vectors /= np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+        return vectors[0] if single else vectors
+
+    def _encode_batch(self, texts: list[str]) -> np.ndarray:
+        encodings = self.tokenizer.encode_batch(texts)
+        feed = {
+            "input_ids": np.array([e.ids for e in encodings], np.int64),
+            "attention_mask": np.array([e.attention_mask for e in encodings], np.int64),
+            "token_type_ids": np.array([e.type_ids for e in encodings], np.int64),
+        }
+        hidden = self.session.run(None, {k: v for k, v in feed.items() if k in self._inputs})[0]
+        mask = feed["attention_mask"][:, :, None].astype(np.float32)
+        return (hidden * mask).sum(axis=1) / np.maximum(mask.sum(axis=1), 1e-9)
@@ -1,68 +1,46 @@
-<<<<<<< HEAD
-"""RAG pipeline: embed query -> vector search -> LLM (Gemini 2.5 Flash preferred, fallback Claude) with context.
-=======
 """RAG pipeline: embed query -> vector search -> Gemini with context.
->>>>>>> 1abb0c8bfb04afefa68e7508e3210330250d88cc
-Uses Actian VectorAI DB when ACTIAN_VECTORAI_URL is set (see github.com/hackmamba-io/actian-vectorAI-db-beta),
-otherwise ChromaDB (data/chroma_db/).
+VECTOR_BACKEND picks the store: numpy (services/vector_index.py), actian (Actian VectorAI DB, see
+github.com/hackmamba-io/actian-vectorAI-db-beta) or chroma (data/chroma_db/). Unset, it is Actian
+when ACTIAN_VECTORAI_URL is set, otherwise ChromaDB.
 """
+import asyncio
+import logging
 import os
+import time
+from contextlib import aclosing
 from pathlib import Path
+from typing import AsyncIterator, Optional
+
+import httpx
+import numpy as np
 
 from models.student import StudentProfile
+from services.actian_store import get_actian_store
+from services.answer_cache import ANSWER_CACHE_ENABLED, get_answer_cache, profile_bucket
+from services.context_packer import PackedContext, estimate_tokens, pack_context
+from services.embedding_service import get_embedding_service
+from services.gemini_client import generate_body, get_gemini_client, response_text, retry_after_seconds, stream_text
+from services.lexical_index import get_lexical_index, is_known_term_query, reciprocal_rank_fusion
+from services.llm_scheduler import Priority, get_llm_scheduler
+from services.model_router import CallClock, ModelCallError, Throttled, get_model_router
+from services.vector_index import get_vector_index, vector_backend
+
+logger = logging.getLogger(__name__)
 
-# all-MiniLM-L6-v2 embedding dimension
-EMBED_DIM = 384
 COLLECTION_NAME = "uscis_docs"
+# Chunks retrieved per question before merging, deduplication and packing (0 = no retrieval)
+RAG_TOP_K = int(os.getenv("RAG_TOP_K", "8"))
+# vector: vector store only; hybrid: vector and BM25 results fused by reciprocal rank, short
+# questions naming a form or program term BM25 only; lexical: BM25 only
+RETRIEVAL_MODES = ("vector", "hybrid", "lexical")
+RAG_RETRIEVAL = os.getenv("RAG_RETRIEVAL", "vector").strip().lower()
+if RAG_RETRIEVAL not in RETRIEVAL_MODES:
+    logger.warning("RAG_RETRIEVAL must be one of %s, got %r; using vector", ", ".join(RETRIEVAL_MODES), RAG_RETRIEVAL)
+    RAG_RETRIEVAL = "vector"
 
 # Lazy-loaded to avoid slow startup when not using chat
-_embedding_model = None
 _chroma_client = None
 _chroma_collection = None
-_actian_client = None
-
-
-def _get_embedding_model():
-    global _embedding_model
-    if _embedding_model is None:
-        from sentence_transformers import SentenceTransformer
-        _embedding_model = SentenceTransformer("all-MiniLM-L6-v2")
-    return _embedding_model
-
-
-def _use_actian() -> bool:
-    return bool(os.getenv("ACTIAN_VECTORAI_URL", "").strip())
-
-
-def _get_actian_client():
-    """Lazy init Actian VectorAI DB client (requires actiancortex wheel from actian-vectorAI-db-beta)."""
-    global _actian_client
-    if _actian_client is None:
-        try:
-            from cortex import CortexClient, DistanceMetric
-        except ImportError as e:
-            raise ImportError(
-                "Actian VectorAI DB is set (ACTIAN_VECTORAI_URL) but the cortex client is not installed. "
-                "Install from: https://github.com/hackmamba-io/actian-vectorAI-db-beta "
-                "e.g. pip install actiancortex-0.1.0b1-py3-none-any.whl"
-            ) from e
-        url = os.getenv("ACTIAN_VECTORAI_URL", "localhost:50051").strip()
-        if url.startswith("http://"):
-            url = url[7:]
-        if url.startswith("https://"):
-            url = url[8:]
-        host, _, port = url.partition(":")
-        if not port:
-            port = "50051"
-        addr = f"{host}:{port}"
-        _actian_client = CortexClient(addr)
-        if not _actian_client.has_collection(COLLECTION_NAME):
-            _actian_client.create_collection(
-                name=COLLECTION_NAME,
-                dimension=EMBED_DIM,
-                distance_metric=DistanceMetric.COSINE,
-            )
-    return _actian_client
 
 
 def _get_chroma_collection():
@@ -113,170 +91,334 @@ Student profile: {student_context}
 
 
 def _vector_search(embedding: list[float], top_k: int = 5) -> list[dict]:
-    """Query vector store for top_k relevant chunks. Returns list of {source, text}."""
-    if _use_actian():
+    """Query vector store for top_k relevant chunks, best first.
+
+    Returns list of {source, text}, plus the chunk's "vector" where the store returns it.
+    """
+    backend = vector_backend()
+    if backend == "numpy":
+        return [{"source": r["source"], "text": r["text"], "vector": r["vector"]}
+                for r in get_vector_index().search(embedding, top_k)]
+    if backend == "actian":
         try:
-            client = _get_actian_client()
-            n = client.count(COLLECTION_NAME)
-            if n == 0:
-                return []
-            results = client.search(COLLECTION_NAME, query=embedding, top_k=min(top_k, n))
-            out = []
-            for r in results:
-                payload = r.payload if hasattr(r, "payload") else {}
-                out.append({
-                    "source": payload.get("source", "USCIS"),
-                    "text": payload.get("text", ""),
-                })
-            return out
-        except Exception:
+            return get_actian_store().search(embedding, top_k)
+        except Exception as e:
+            logger.warning("Actian search failed: %s", e)
             return []
     coll = _get_chroma_collection()
     n = coll.count()
     if n == 0:
         return []
-    results = coll.query(query_embeddings=[embedding], n_results=min(top_k, n), include=["documents", "metadatas"])
+    results = coll.query(
+        query_embeddings=[embedding], n_results=min(top_k, n), include=["documents", "metadatas", "embeddings"]
+    )
     out = []
     docs = results["documents"][0] if results["documents"] else []
     metas = results["metadatas"][0] if results.get("metadatas") else [{}] * len(docs)
+    vectors = results["embeddings"][0] if results.get("embeddings") is not None else [None] * len(docs)
     for i, text in enumerate(docs):
         meta = metas[i] if i < len(metas) else {}
-        out.append({"source": meta.get("source", "USCIS"), "text": text or ""})
+        out.append({"source": meta.get("source", "USCIS"), "text": text or "", "vector": vectors[i]})
     return out
 
 
-# Chat: Gemini API only.
+def _lexical_only(question: str) -> bool:
+    """Whether retrieval for question uses only the BM25 index (so it needs no question embedding)."""
+    if RAG_RETRIEVAL == "vector" or RAG_TOP_K <= 0:
+        return False
+    return RAG_RETRIEVAL == "lexical" or (is_known_term_query(question) and len(get_lexical_index()) > 0)
+
+
+def _retrieve(question: str, vector: Optional[np.ndarray], lexical_only: bool) -> tuple[list[dict], str]:
+    """Top RAG_TOP_K chunks for the question and how they were found (vector, lexical or hybrid)."""
+    lexical = get_lexical_index() if RAG_RETRIEVAL != "vector" else None
+    if lexical_only:
+        hits = lexical.search(question, RAG_TOP_K)
+        if hits or RAG_RETRIEVAL == "lexical":
+            return hits, "lexical"
+        # A known term the corpus never mentions: fall back to the vector store.
+        if vector is None:
+            if not _embedding_available:
+                return [], "lexical"
+            vector = get_embedding_service().embed([question])[0]
+    if vector is None:
+        # No embedding model: BM25 is all there is.
+        return (lexical.search(question, RAG_TOP_K), "lexical") if lexical is not None else ([], "vector")
+    dense = _vector_search(vector.tolist(), RAG_TOP_K)
+    if lexical is None or len(lexical) == 0:
+        return dense, "vector"
+    return reciprocal_rank_fusion([dense, lexical.search(question, RAG_TOP_K)], RAG_TOP_K), "hybrid"
+
+
+def _retrieve_context(
+    question: str, vector: Optional[np.ndarray], lexical_only: bool
+) -> tuple[Optional[PackedContext], str]:
+    """Retrieved chunks packed for the prompt (None when nothing is found), and the retrieval path.
+
+    Blocking (vector store client, embedding of chunks the store returned without vectors).
+    """
+    chunks, how = _retrieve(question, vector, lexical_only)
+    chunks = [c for c in chunks if c["text"].strip()]
+    if not chunks:
+        return None, how
+    missing = [c for c in chunks if c.get("vector") is None]
+    # Lexical-only answers skip the model entirely; their chunks are just not deduplicated.
+    if missing and how != "lexical":
+        for chunk, v in zip(missing, get_embedding_service().embed([c["text"] for c in missing])):
+            chunk["vector"] = v
+    return pack_context(chunks), how
+
+
+# Chat when no policy chunks were retrieved (nothing ingested, or RAG_TOP_K=0).
 CHAT_SYSTEM_PROMPT = """You are UniVisa's AI advisor for F-1 and J-1 international students in the US. Answer the student's question clearly and specifically. Give a direct answer in your first 1-2 sentences (e.g. "Yes, F-1 students may work up to 20 hours per week on campus" or "Missing the CPT deadline can mean you're not authorized to work—contact your DSO immediately."). Do not reply with only "consult your DSO." Add a brief note at the end: "For your situation, confirm with your DSO." Use plain English. Student profile: {student_context}"""
 
-<<<<<<< HEAD
-    context = (
-        "\n\n".join(f"[{chunk['source']}]\n{chunk['text']}" for chunk in relevant_chunks)
-        if relevant_chunks
-        else "(No policy documents have been ingested yet. Answer from your knowledge of F-1/J-1 rules and recommend the student confirm with their DSO for official guidance.)"
-    )
-    student_context = f"""
-    University: {student_profile.university}
-    Visa: {student_profile.visa_type.value}
-    Program ends: {student_profile.program_end_date}
-    Enrollment: {student_profile.enrollment_status.value}
-    On OPT: {student_profile.on_opt}
-    Weekly work hours: {student_profile.weekly_work_hours}
+NO_API_KEY_ANSWER = "Add GEMINI_API_KEY to .env (get a key at https://aistudio.google.com/app/apikey) and restart the backend."
+RATE_LIMITED_ANSWER = "The AI is getting too many requests. Please wait a moment and try again."
+
+
+def _rate_limited(error: BaseException) -> bool:
+    if isinstance(error, Throttled):
+        return True
+    return isinstance(error, httpx.HTTPStatusError) and error.response.status_code == 429
+
+
+async def _call_gemini_rest(
+    question: str,
+    system_prompt: str,
+    api_key: str,
+    priority: Priority = Priority.STUDENT,
+    sources: Optional[list[str]] = None,
+) -> dict:
+    """Call Gemini via REST API on the shared pooled client, routed and hedged across models.
+
+    Each HTTP call waits for a scheduler slot; a 429 pauses the scheduler and the call is
+    retried until the admission deadline. The router times (and hedges) only from each send,
+    so slot waits and Retry-After pauses are not counted as model latency. Returns {answer, sources}.
     """
-    # Prefer Gemini 2.5 Flash (GOOGLE_API_KEY or GEMINI_API_KEY), fallback to Anthropic
-    gemini_key = os.getenv("GOOGLE_API_KEY") or os.getenv("GEMINI_API_KEY") or os.getenv("gemini_api_key")
-    if gemini_key:
-        try:
-            import google.generativeai as genai
-            genai.configure(api_key=gemini_key.strip())
-            model = genai.GenerativeModel("gemini-2.5-flash")
-            full_prompt = (
-                SYSTEM_PROMPT.format(student_context=student_context)
-                + "\n\nContext:\n"
-                + context
-                + "\n\nQuestion: "
-                + question
-            )
-            response = model.generate_content(full_prompt)
-            text = response.text if response.text else ""
-            return {
-                "answer": text,
-                "sources": [chunk["source"] for chunk in relevant_chunks],
-            }
-        except Exception as e:
-            return {
-                "answer": f"Sorry, the AI advisor encountered an error. Please try again or contact your DSO. Error: {e!s}",
-                "sources": [chunk["source"] for chunk in relevant_chunks],
-            }
-    api_key = os.getenv("ANTHROPIC_API_KEY")
-    if not api_key:
-        return {
-            "answer": "AI advisor is not configured (set GOOGLE_API_KEY or GEMINI_API_KEY in .env). Please contact your DSO for visa compliance questions.",
-            "sources": [chunk["source"] for chunk in relevant_chunks],
-        }
+    client = get_gemini_client()
+    scheduler = get_llm_scheduler()
+    body = generate_body(question.strip(), system_prompt)
+    deadline = scheduler.deadline()
+
+    async def generate(model: str, clock: CallClock) -> str:
+        while True:
+            await scheduler.acquire(priority, deadline)
+            clock.sent()
+            resp = await client.post(f"/models/{model}:generateContent", json=body, headers={"x-goog-api-key": api_key})
+            if resp.status_code != 429:
+                break
+            clock.queued()
+            scheduler.rate_limited(retry_after_seconds(resp))
+        resp.raise_for_status()
+        scheduler.succeeded()
+        return response_text(resp.json())
+
     try:
-        import anthropic
-        client = anthropic.Anthropic()
-        response = client.messages.create(
-            model="claude-sonnet-4-20250514",
-            max_tokens=1024,
-            system=SYSTEM_PROMPT.format(student_context=student_context),
-            messages=[
-                {
-                    "role": "user",
-                    "content": f"Context:\n{context}\n\nQuestion: {question}",
-                }
-            ],
-        )
-        text = response.content[0].text if response.content else ""
+        _, text = await get_model_router().call(generate)
+    except ModelCallError as e:
+        if e.errors and all(_rate_limited(err) for err in e.errors.values()):
+            return {"answer": RATE_LIMITED_ANSWER, "sources": []}
         return {
-            "answer": text,
-            "sources": [chunk["source"] for chunk in relevant_chunks],
+            "answer": f"Sorry, the AI could not respond. Please try again or contact your DSO. Error: {e!s}",
+            "sources": [],
         }
-    except Exception as e:
-        return {
-            "answer": f"Sorry, the AI advisor encountered an error. Please try again or contact your DSO. Error: {e!s}",
-            "sources": [chunk["source"] for chunk in relevant_chunks],
-=======
-
-def _call_gemini_rest(question: str, system_prompt: str, api_key: str) -> dict:
-    """Call Gemini via REST API. Returns {answer, sources}. Works with any valid API key."""
-    import json
-    import urllib.request
-    import urllib.error
-
-    last_err = None
-    # Must be a tuple/list so we iterate over model names, not characters
-    for model in ("gemini-2.5-flash", "gemini-2.0-flash", "gemini-2.5-pro", "gemini-2.0-flash-lite"):
+    return {"answer": text, "sources": sources or ["UniVisa AI"]}
+
+
+async def _scheduled_stream(
+    model: str, body: dict, api_key: str, priority: Priority, deadline: float
+) -> AsyncIterator[str]:
+    """stream_text behind the scheduler, retrying 429s (which arrive before any text) until deadline."""
+    scheduler = get_llm_scheduler()
+    while True:
+        await scheduler.acquire(priority, deadline)
         try:
-            url = f"https://generativelanguage.googleapis.com/v1beta/models/{model}:generateContent?key={api_key}"
-            body = {
-                "contents": [{"parts": [{"text": question.strip()}]}],
-                "systemInstruction": {"parts": [{"text": system_prompt}]},
-                "generationConfig": {"maxOutputTokens": 1024, "temperature": 0.4},
-            }
-            req = urllib.request.Request(
-                url,
-                data=json.dumps(body).encode("utf-8"),
-                headers={"Content-Type": "application/json"},
-                method="POST",
-            )
-            with urllib.request.urlopen(req, timeout=60) as resp:
-                data = json.loads(resp.read().decode())
-            text = ""
-            for c in data.get("candidates", []) or []:
-                for p in c.get("content", {}).get("parts", []) or []:
-                    text += p.get("text", "") or ""
-            text = (text or "").strip()
-            if not text:
-                continue
-            return {"answer": text, "sources": ["UniVisa AI"]}
-        except urllib.error.HTTPError as e:
-            if e.code == 429:
-                return {"answer": "The AI is getting too many requests. Please wait a moment and try again.", "sources": []}
-            last_err = e
-            continue
-        except Exception as e:
-            last_err = e
+            # aclosing: release the upstream HTTP stream as soon as our consumer stops.
+            async with aclosing(stream_text(model, body, api_key)) as chunks:
+                async for text in chunks:
+                    yield text
+        except httpx.HTTPStatusError as e:
+            if e.response.status_code != 429:
+                raise
+            scheduler.rate_limited(retry_after_seconds(e.response))
             continue
-    return {
-        "answer": f"Sorry, the AI could not respond. Please try again or contact your DSO. Error: {last_err!s}" if last_err else "Sorry, the AI could not respond. Please try again.",
-        "sources": [],
-    }
+        scheduler.succeeded()
+        return
 
 
-def query_rag(question: str, student_profile: StudentProfile) -> dict:
-    """Answer using Gemini API only."""
-    student_context = (
+def student_context(student_profile: StudentProfile) -> str:
+    return (
         f"University: {student_profile.university}, Visa: {student_profile.visa_type.value}, "
         f"Program ends: {student_profile.program_end_date}, Enrollment: {student_profile.enrollment_status.value}, "
         f"On OPT: {student_profile.on_opt}, Weekly work hours: {student_profile.weekly_work_hours}"
     )
-    system_prompt = CHAT_SYSTEM_PROMPT.format(student_context=student_context)
+
+
+_embedding_available = True
+_retrieval_available = True
+
+
+async def _question_vector(question: str, retrieval: bool = True) -> Optional[np.ndarray]:
+    """Embedding for the answer cache and (when retrieval) vector retrieval, or None when neither
+    needs it or the model cannot load."""
+    global _embedding_available
+    if not _embedding_available or not (ANSWER_CACHE_ENABLED or (retrieval and RAG_TOP_K > 0)):
+        return None
+    try:
+        return await get_embedding_service().aembed(question)
+    except (ImportError, OSError) as e:
+        _embedding_available = False
+        logger.warning("Answer cache and retrieval disabled, embedding model unavailable: %s", e)
+    except Exception as e:
+        logger.warning("Answer cache and retrieval skipped for this question: %s", e)
+    return None
+
+
+async def _build_prompt(
+    question: str, student_profile: StudentProfile, vector: Optional[np.ndarray], lexical_only: bool = False
+) -> tuple[str, str, list[str]]:
+    """(system prompt, user message, sources), grounded in packed policy chunks when any are retrieved."""
+    global _retrieval_available
+    profile = student_context(student_profile)
+    packed = None
+    if (vector is not None or RAG_RETRIEVAL != "vector") and RAG_TOP_K > 0 and _retrieval_available:
+        try:
+            t0 = time.perf_counter()
+            packed, how = await asyncio.to_thread(_retrieve_context, question, vector, lexical_only)
+            retrieval_ms = (time.perf_counter() - t0) * 1000
+        except ImportError as e:
+            _retrieval_available = False
+            logger.warning("Retrieval disabled, vector store client unavailable: %s", e)
+        except Exception as e:
+            logger.warning("Retrieval skipped for this question: %s", e)
+    if packed is None or not packed.text:
+        return CHAT_SYSTEM_PROMPT.format(student_context=profile), question, ["UniVisa AI"]
+    system_prompt = SYSTEM_PROMPT.format(student_context=profile)
+    message = f"Context:\n{packed.text}\n\nQuestion: {question}"
+    tokens = estimate_tokens(system_prompt) + estimate_tokens(message)
+    logger.info(
+        "chat context retrieval=%s retrieval_ms=%.1f chunks=%d->%d merged=%d deduplicated=%d truncated=%s "
+        "prompt_tokens=%d->%d",
+        how, retrieval_ms, packed.chunks_in, packed.chunks_out, packed.merged, packed.deduplicated, packed.truncated,
+        tokens - packed.tokens_out + packed.tokens_in, tokens,
+    )
+    return system_prompt, message, packed.sources
+
+
+async def query_rag(
+    question: str, student_profile: StudentProfile, priority: Priority = Priority.STUDENT
+) -> dict:
+    """Answer with Gemini from the packed policy context, reusing the cached answer to a near-identical question."""
     api_key = os.getenv("GEMINI_API_KEY", "").strip()
     if not api_key:
-        return {
-            "answer": "Add GEMINI_API_KEY to .env (get a key at https://aistudio.google.com/app/apikey) and restart the backend.",
-            "sources": [],
->>>>>>> 1abb0c8bfb04afefa68e7508e3210330250d88cc
-        }
-    return _call_gemini_rest(question.strip(), system_prompt, api_key)
+        return {"answer": NO_API_KEY_ANSWER, "sources": []}
+    t0 = time.perf_counter()
+    question = question.strip()
+    bucket = profile_bucket(student_profile)
+    lexical_only = _lexical_only(question)
+    vector = await _question_vector(question, retrieval=not lexical_only)
+    cache_vector = vector if ANSWER_CACHE_ENABLED else None
+    if cache_vector is not None:
+        cached = get_answer_cache().get(cache_vector, bucket)
+        if cached is not None:
+            logger.info("chat cache_hit total_ms=%.0f", (time.perf_counter() - t0) * 1000)
+            return cached
+    system_prompt, message, sources = await _build_prompt(question, student_profile, vector, lexical_only)
+    result = await _call_gemini_rest(message, system_prompt, api_key, priority, sources)
+    if cache_vector is not None and result["sources"]:
+        get_answer_cache().put(cache_vector, bucket, result["answer"], result["sources"])
+    logger.info("chat total_ms=%.0f", (time.perf_counter() - t0) * 1000)
+    return result
+
+
+async def stream_rag(
+    question: str, student_profile: StudentProfile, priority: Priority = Priority.STUDENT
+) -> AsyncIterator[tuple[str, dict]]:
+    """Streaming query_rag: yields (event, data) pairs for the SSE endpoint.
+
+    "token" events carry text as Gemini produces it, then one "sources" event, then "done"
+    with time-to-first-token, total latency and whether the answer came from the cache.
+    A model is only swapped for the next one while nothing has been sent; a failure
+    mid-answer ends the stream with an "error" event.
+    """
+    t0 = time.perf_counter()
+    api_key = os.getenv("GEMINI_API_KEY", "").strip()
+    question = question.strip()
+    bucket = profile_bucket(student_profile)
+    sources: list[str] = []
+    ttft_ms = None
+    model_used = None
+    lexical_only = _lexical_only(question)
+    vector = await _question_vector(question, retrieval=not lexical_only) if api_key else None
+    cache_vector = vector if ANSWER_CACHE_ENABLED else None
+    cached = get_answer_cache().get(cache_vector, bucket) if cache_vector is not None else None
+    if not api_key:
+        yield "token", {"text": NO_API_KEY_ANSWER}
+    elif cached is not None:
+        ttft_ms = (time.perf_counter() - t0) * 1000
+        model_used = "cache"
+        sources = cached["sources"]
+        yield "token", {"text": cached["answer"]}
+    else:
+        system_prompt, message, answer_sources = await _build_prompt(question, student_profile, vector, lexical_only)
+        body = generate_body(message, system_prompt)
+        answer = ""
+        router = get_model_router()
+        deadline = get_llm_scheduler().deadline()
+        errors: dict[str, BaseException] = {}
+        # Streams are not hedged (tokens from two models cannot be merged), but they skip
+        # models with open breakers and feed the breakers with their outcomes.
+        for model in router.candidates():
+            if not router.acquire(model):
+                continue
+            err = None
+            try:
+                async with aclosing(_scheduled_stream(model, body, api_key, priority, deadline)) as chunks:
+                    async for text in chunks:
+                        if ttft_ms is None:
+                            ttft_ms = (time.perf_counter() - t0) * 1000
+                            model_used = model
+                            logger.info("chat stream model=%s ttft_ms=%.0f", model, ttft_ms)
+                        answer += text
+                        yield "token", {"text": text}
+            except (asyncio.CancelledError, GeneratorExit):
+                # Client went away mid-answer.
+                router.record_cancelled(model)
+                raise
+            except Exception as e:
+                err = e
+            if err is None and ttft_ms is None:
+                err = ValueError("empty response")
+            if isinstance(err, Throttled):
+                errors[model] = err
+                router.record_throttled(model)
+            elif err is not None:
+                errors[model] = err
+                router.record_failure(model, err)
+            else:
+                router.record_success(model)
+            if ttft_ms is None:
+                # Nothing sent yet: try the next model.
+                continue
+            if err is not None:
+                yield "error", {"message": f"The answer was interrupted: {err!s}"}
+            else:
+                sources = answer_sources
+                if cache_vector is not None:
+                    get_answer_cache().put(cache_vector, bucket, answer.strip(), sources)
+            break
+        else:
+            if errors and all(_rate_limited(e) for e in errors.values()):
+                yield "token", {"text": RATE_LIMITED_ANSWER}
+            else:
+                message = "Sorry, the AI could not respond. Please try again or contact your DSO."
+                yield "token", {"text": f"{message} Error: {ModelCallError(errors)!s}"}
+    total_ms = (time.perf_counter() - t0) * 1000
+    logger.info("chat stream model=%s ttft_ms=%s total_ms=%.0f", model_used,
+                "-" if ttft_ms is None else f"{ttft_ms:.0f}", total_ms)
+    yield "sources", {"sources": sources}
+    yield "done", {
+        "ttft_ms": None if ttft_ms is None else round(ttft_ms, 1),
+        "total_ms": round(total_ms, 1),
+        "cached": cached is not None,
+    }
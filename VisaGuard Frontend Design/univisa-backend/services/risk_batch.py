@@ -0,0 +1,210 @@
+"""Vectorized risk scoring: evaluates the calculate_risk rules over NumPy columns for a whole cohort."""
+import time
+from dataclasses import dataclass
+from datetime import date
+from typing import Iterable, Mapping, Sequence, Union
+
+import numpy as np
+
+from models.student import StudentProfile
+from models.risk import RiskFlag, RiskOutput
+from services import risk_engine as engine
+
+# One bit per entry of risk_engine.RULE_SPECS (bit i = RULE_SPECS[i]), so iterating
+# set bits low -> high reproduces the scalar flag order.
+FLAG_SPECS: tuple[tuple[int, engine.RuleSpec], ...] = tuple((1 << i, s) for i, s in enumerate(engine.RULE_SPECS))
+FLAG_CATEGORIES: dict[int, str] = {bit: spec.category for bit, spec in FLAG_SPECS}
+FLAG_SEVERITIES: dict[int, str] = {bit: spec.severity for bit, spec in FLAG_SPECS}
+
+ENROLLMENT_CODES = engine.ENROLLMENT_CODES
+
+# Per rule (RULES order): its stats and its tiers as (bit, spec), tried first-match like the scalar closure.
+_PLAN: tuple[tuple[engine.RuleStats, tuple[tuple[int, engine.RuleSpec], ...]], ...] = tuple(
+    (rule.stats, tuple((bit, spec) for bit, spec in FLAG_SPECS if spec.rule == rule.name))
+    for rule in engine.RULES
+)
+
+
+@dataclass
+class CohortColumns:
+    """Rule inputs for N students as parallel arrays. Dates are proleptic ordinals (date.toordinal())."""
+    student_ids: list[str]
+    program_end: np.ndarray  # int64
+    opt_end: np.ndarray  # int64, 0 where has_opt_end is False
+    has_opt_end: np.ndarray  # bool
+    weekly_work_hours: np.ndarray  # float64
+    enrollment: np.ndarray  # uint8, see ENROLLMENT_CODES
+    on_opt: np.ndarray  # bool
+    on_cpt: np.ndarray  # bool
+    traveling_soon: np.ndarray  # bool
+
+    def __len__(self) -> int:
+        return len(self.student_ids)
+
+    def take(self, idx: np.ndarray) -> "CohortColumns":
+        """Rows idx (may repeat) as a new CohortColumns."""
+        return CohortColumns(
+            student_ids=[self.student_ids[i] for i in idx],
+            program_end=self.program_end[idx],
+            opt_end=self.opt_end[idx],
+            has_opt_end=self.has_opt_end[idx],
+            weekly_work_hours=self.weekly_work_hours[idx],
+            enrollment=self.enrollment[idx],
+            on_opt=self.on_opt[idx],
+            on_cpt=self.on_cpt[idx],
+            traveling_soon=self.traveling_soon[idx],
+        )
+
+
+@dataclass
+class BatchRiskResult:
+    """Per-row scores, levels and flag bitmasks from score_cohort."""
+    student_ids: list[str]
+    today: np.ndarray  # int64 ordinal per row
+    risk_score: np.ndarray  # int64, capped at 100
+    risk_level: np.ndarray  # str ("high" / "medium" / "low")
+    flags: np.ndarray  # uint16 bitmask, bits as in FLAG_SPECS
+    days_to_program_end: np.ndarray  # int64
+    days_to_opt_end: np.ndarray  # int64, meaningless where has_opt_end is False
+
+    def __len__(self) -> int:
+        return len(self.student_ids)
+
+    def ranked(self) -> np.ndarray:
+        """Row indices by risk_score descending; ties keep input order (matches list.sort)."""
+        return np.argsort(-self.risk_score, kind="stable")
+
+
+def columns_from_profiles(profiles: Iterable[StudentProfile]) -> CohortColumns:
+    """Extract the rule inputs of each profile into NumPy columns."""
+    profiles = list(profiles)
+    n = len(profiles)
+    return CohortColumns(
+        student_ids=[p.student_id for p in profiles],
+        program_end=np.fromiter((p.program_end_date.toordinal() for p in profiles), np.int64, n),
+        opt_end=np.fromiter((p.opt_end_date.toordinal() if p.opt_end_date else 0 for p in profiles), np.int64, n),
+        has_opt_end=np.fromiter((p.opt_end_date is not None for p in profiles), bool, n),
+        weekly_work_hours=np.fromiter((p.weekly_work_hours for p in profiles), np.float64, n),
+        enrollment=np.fromiter((ENROLLMENT_CODES[p.enrollment_status] for p in profiles), np.uint8, n),
+        on_opt=np.fromiter((p.on_opt for p in profiles), bool, n),
+        on_cpt=np.fromiter((p.on_cpt for p in profiles), bool, n),
+        traveling_soon=np.fromiter((p.traveling_soon for p in profiles), bool, n),
+    )
+
+
+def store_columns(store: Mapping[str, StudentProfile], sids: Sequence[str]) -> CohortColumns:
+    """Rule inputs for the sids still in store: sliced from the arrays of a columnar store
+    (student_table.ColumnarStudentTable.columns), else read profile by profile."""
+    columns = getattr(store, "columns", None)
+    if columns is not None:
+        return columns(sids)
+    return columns_from_profiles(p for p in (store.get(sid) for sid in sids) if p is not None)
+
+
+def store_values(store: Mapping[str, StudentProfile], field: str, sids: Sequence[str]) -> list:
+    """One profile field per sid (None where the student is gone), from the columns when the store keeps them."""
+    field_values = getattr(store, "field_values", None)
+    if field_values is not None:
+        return field_values(field, sids)
+    out = []
+    for sid in sids:
+        profile = store.get(sid)
+        out.append(getattr(profile, field) if profile is not None else None)
+    return out
+
+
+def vector_context(cols: CohortColumns, t: np.ndarray) -> dict:
+    """risk_engine.rule_context() as arrays, for RuleSpec.vector."""
+    days_to_end = cols.program_end - t
+    return {
+        "on_opt": cols.on_opt,
+        "on_cpt": cols.on_cpt,
+        "enrollment_status": cols.enrollment,
+        "weekly_work_hours": cols.weekly_work_hours,
+        "traveling_soon": cols.traveling_soon,
+        "days_to_end": days_to_end,
+        "opt_deadline": days_to_end - engine.OPT_FILING_LEAD_DAYS,
+        "days_to_opt_end": cols.opt_end - t,
+        "has_opt_end": cols.has_opt_end,
+    }
+
+
+def score_cohort(cols: CohortColumns, today: Union[date, np.ndarray]) -> BatchRiskResult:
+    """Evaluate every rule's vector predicates as array operations. today is a date or an int64 ordinal per row."""
+    n = len(cols)
+    if isinstance(today, date):
+        t = np.full(n, today.toordinal(), dtype=np.int64)
+    else:
+        t = np.asarray(today, dtype=np.int64)
+    ctx = vector_context(cols, t)
+
+    score = np.zeros(n, dtype=np.int64)
+    flags = np.zeros(n, dtype=np.uint16)
+    clock = time.perf_counter_ns
+    for stats, tiers in _PLAN:
+        t0 = clock()
+        fired = np.zeros(n, dtype=bool)
+        for bit, spec in tiers:
+            mask = np.broadcast_to(spec.vector(ctx), n) & ~fired
+            fired |= mask
+            score += mask * spec.score
+            flags |= mask * np.uint16(bit)
+        stats.total_ns += clock() - t0
+        stats.evaluations += n
+        stats.hits += int(np.count_nonzero(fired))
+    np.minimum(score, 100, out=score)
+    level = np.where(
+        score > engine.HIGH_RISK_ABOVE, "high", np.where(score > engine.MEDIUM_RISK_ABOVE, "medium", "low")
+    )
+
+    return BatchRiskResult(
+        student_ids=cols.student_ids,
+        today=t,
+        risk_score=score,
+        risk_level=level,
+        flags=flags,
+        days_to_program_end=ctx["days_to_end"],
+        days_to_opt_end=ctx["days_to_opt_end"],
+    )
+
+
+def flag_categories(flag_bits: int) -> list[str]:
+    """Categories in a bitmask, in calculate_risk flag order."""
+    return [category for bit, category in FLAG_CATEGORIES.items() if flag_bits & bit]
+
+
+def flag_severities(flag_bits: int) -> list[str]:
+    """Severities in a bitmask, aligned with flag_categories()."""
+    return [severity for bit, severity in FLAG_SEVERITIES.items() if flag_bits & bit]
+
+
+def top_flag_category(flag_bits: int) -> str:
+    """Category of the first flag calculate_risk would list for this bitmask."""
+    if not flag_bits:
+        return "All requirements met"
+    return FLAG_CATEGORIES[flag_bits & -flag_bits]
+
+
+def materialize_hits(profile: StudentProfile, result: BatchRiskResult, i: int) -> dict[str, engine.RuleHit]:
+    """Per-rule hits for row i, in the shape risk_engine.evaluate_rules returns."""
+    bits = int(result.flags[i])
+    hits: dict[str, engine.RuleHit] = {rule.name: None for rule in engine.RULES}
+    if not bits:
+        return hits
+    ctx = engine.rule_context(profile, date.fromordinal(int(result.today[i])))
+    for bit, spec in FLAG_SPECS:
+        if bits & bit:
+            hits[spec.rule] = spec.score, engine.build_flag(spec, ctx)
+    return hits
+
+
+def materialize_flags(profile: StudentProfile, result: BatchRiskResult, i: int) -> list[RiskFlag]:
+    """Build the RiskFlag objects for row i (same text and order as calculate_risk)."""
+    hits = materialize_hits(profile, result, i)
+    return [hits[rule.name][1] for rule in engine.RULES if hits[rule.name] is not None]
+
+
+def materialize(profile: StudentProfile, result: BatchRiskResult, i: int) -> RiskOutput:
+    """Full RiskOutput for row i; equal to calculate_risk(profile, today) for that row's date."""
+    today = date.fromordinal(int(result.today[i]))
+    return engine.assemble_risk(profile.student_id, materialize_hits(profile, result, i), today)
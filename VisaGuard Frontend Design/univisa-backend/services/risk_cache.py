@@ -0,0 +1,232 @@
+"""Materialized risk results: each student's RiskOutput is kept until its next change date or a profile write."""
+import heapq
+import threading
+from datetime import date
+from typing import Callable, Iterable, Mapping, NamedTuple, Optional
+
+from models.student import StudentProfile
+from models.risk import RiskOutput
+from services.risk_engine import (
+    RULES, RiskRule, RuleHit, assemble_risk, evaluate_rules, next_risk_change, rules_reading,
+)
+from services.risk_batch import (
+    CohortColumns,
+    columns_from_profiles,
+    materialize_hits,
+    score_cohort,
+    store_columns,
+)
+from services.cohort_index import CohortIndex, cohort_row
+
+# Ordinal used for "no date-driven change ahead"
+_NEVER = date.max.toordinal()
+# Every rule input; RULES selects all rules.
+RULE_INPUTS = frozenset(StudentProfile.model_fields) | {"today"}
+
+
+class _Entry(NamedTuple):
+    output: RiskOutput
+    hits: dict[str, RuleHit]  # per-rule results, so a profile update can re-run only some rules
+    computed_on: int  # ordinal of the date the output was computed for
+    next_change: int  # ordinal of the first date the output may be stale
+
+
+class RiskMaterializer:
+    """Serves stored RiskOutputs and recomputes only students whose next change date has passed.
+
+    Expiry is driven by a min-heap of (next_change, student_id). Heap entries are not removed
+    on invalidation; stale ones are skipped when popped.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._entries: dict[str, _Entry] = {}
+        self._heap: list[tuple[int, str]] = []
+        self._dirty: set[str] = set()
+        self._last_today: Optional[int] = None
+        self._listeners: list[Callable[[StudentProfile, RiskOutput], None]] = []
+        self.hits = 0
+        self.recomputes = 0
+
+    def subscribe(self, listener: Callable[[StudentProfile, RiskOutput], None]) -> None:
+        """Call listener(profile, output) whenever a student's stored result is (re)computed."""
+        self._listeners.append(listener)
+
+    def peek(self, student_id: str) -> Optional[RiskOutput]:
+        """Stored result without any freshness check (None if never computed)."""
+        entry = self._entries.get(student_id)
+        return entry.output if entry is not None else None
+
+    def get(self, profile: StudentProfile, today: date) -> RiskOutput:
+        """RiskOutput for one student, recomputed only if stale."""
+        t = today.toordinal()
+        sid = profile.student_id
+        with self._lock:
+            entry = self._entries.get(sid)
+            if entry is not None and sid not in self._dirty and entry.computed_on <= t:
+                if t < entry.next_change:
+                    self.hits += 1
+                    return entry.output
+                # Only the date moved: re-run the date-driven rules.
+                return self._update(sid, profile, entry.hits, rules_reading({"today"}), today)
+            self._dirty.discard(sid)
+            return self._update(sid, profile, {}, RULES, today)
+
+    def apply_update(
+        self, profile: StudentProfile, changed_fields: set[str], today: date
+    ) -> tuple[RiskOutput, list[str]]:
+        """Re-score after a profile update, re-running only the rules that read a changed field.
+
+        Falls back to all rules if nothing usable is stored. Returns (RiskOutput, rule names run).
+        """
+        t = today.toordinal()
+        sid = profile.student_id
+        with self._lock:
+            entry = self._entries.get(sid)
+            if entry is None or sid in self._dirty or entry.computed_on > t:
+                base: dict[str, RuleHit] = {}
+                rules = RULES
+            else:
+                base = entry.hits
+                dirty = set(changed_fields)
+                if entry.computed_on != t or t >= entry.next_change:
+                    dirty.add("today")
+                rules = rules_reading(dirty)
+            self._dirty.discard(sid)
+            output = self._update(sid, profile, base, rules, today)
+            return output, [r.name for r in rules]
+
+    def score_batch(self, profiles: list[StudentProfile], today: date) -> list[RiskOutput]:
+        """Score new or rewritten profiles in one vectorized pass and store the results."""
+        with self._lock:
+            self._dirty.difference_update(p.student_id for p in profiles)
+            return self._score(profiles, today)
+
+    def invalidate(self, student_id: str) -> None:
+        """Call after a profile write; the next read recomputes this student."""
+        with self._lock:
+            self._dirty.add(student_id)
+
+    def forget(self, student_id: str) -> None:
+        """Drop a deleted student's stored result."""
+        with self._lock:
+            self._entries.pop(student_id, None)
+            self._dirty.discard(student_id)
+
+    def reset(self) -> None:
+        """Drop every stored result; the next reads recompute from the store."""
+        with self._lock:
+            self._entries.clear()
+            self._heap.clear()
+            self._dirty.clear()
+
+    def cohort(self, store: Mapping[str, StudentProfile], today: date) -> list[tuple[str, RiskOutput]]:
+        """(student_id, RiskOutput) for every student in store order, recomputing only changed students."""
+        with self._lock:
+            self._sync(store, today)
+            entries = self._entries
+            # A student added after the sync is skipped rather than failing the whole cohort.
+            return [(sid, entries[sid].output) for sid in store if sid in entries]
+
+    def sync(self, store: Mapping[str, StudentProfile], today: date) -> int:
+        """Recompute every stale or missing student in store; returns how many were recomputed."""
+        with self._lock:
+            return self._sync(store, today)
+
+    def _sync(self, store: Mapping[str, StudentProfile], today: date) -> int:
+        t = today.toordinal()
+        if self._last_today is not None and t < self._last_today:
+            # Clock went backwards (or a caller asked about the past): nothing stored is trustworthy.
+            self._entries.clear()
+            self._heap.clear()
+        self._last_today = t
+        stale = self._dirty | self._pop_due(t)
+        # Not gated on len(entries) < len(store): a delete plus an add between syncs (e.g. by
+        # another worker with shared state) keeps the lengths equal.
+        stale.update(sid for sid in store if sid not in self._entries)
+        stale = [sid for sid in stale if sid in store]
+        if stale:
+            self._recompute(store, stale, today)
+        self._dirty.clear()
+        self.hits += len(store) - len(stale)
+        return len(stale)
+
+    def stats(self) -> dict:
+        with self._lock:
+            upcoming = self._heap[0][0] if self._heap else None
+            return {
+                "entries": len(self._entries),
+                "heap_size": len(self._heap),
+                "dirty": len(self._dirty),
+                "hits": self.hits,
+                "recomputes": self.recomputes,
+                "next_change_date": str(date.fromordinal(upcoming)) if upcoming is not None else None,
+            }
+
+    def _pop_due(self, t: int) -> set[str]:
+        due: set[str] = set()
+        heap = self._heap
+        while heap and heap[0][0] <= t:
+            next_change, sid = heapq.heappop(heap)
+            entry = self._entries.get(sid)
+            if entry is not None and entry.next_change == next_change:
+                due.add(sid)
+        return due
+
+    def _recompute(self, store: Mapping[str, StudentProfile], sids: list[str], today: date) -> None:
+        # Rule inputs come straight from a columnar store; profiles are still read for flag text and listeners.
+        cols = store_columns(store, sids)
+        self._score([store[sid] for sid in cols.student_ids], today, cols)
+
+    def _score(
+        self, profiles: list[StudentProfile], today: date, cols: Optional[CohortColumns] = None
+    ) -> list[RiskOutput]:
+        if not profiles:
+            return []
+        result = score_cohort(cols if cols is not None else columns_from_profiles(profiles), today)
+        outputs = []
+        for i, profile in enumerate(profiles):
+            sid = profile.student_id
+            hits = materialize_hits(profile, result, i)
+            output = assemble_risk(sid, hits, today)
+            self._store(sid, profile, output, hits, today)
+            outputs.append(output)
+        return outputs
+
+    def _update(
+        self, sid: str, profile: StudentProfile, base: dict[str, RuleHit], rules: Iterable[RiskRule], today: date
+    ) -> RiskOutput:
+        hits = {**base, **evaluate_rules(profile, today, rules)}
+        output = assemble_risk(sid, hits, today)
+        self._store(sid, profile, output, hits, today)
+        return output
+
+    def _store(
+        self, sid: str, profile: StudentProfile, output: RiskOutput, hits: dict[str, RuleHit], today: date
+    ) -> None:
+        nxt = next_risk_change(profile, output, today)
+        next_change = nxt.toordinal() if nxt is not None else _NEVER
+        self._entries[sid] = _Entry(output, hits, today.toordinal(), next_change)
+        for listener in self._listeners:
+            listener(profile, output)
+        if next_change != _NEVER:
+            heapq.heappush(self._heap, (next_change, sid))
+        self.recomputes += 1
+        if len(self._heap) > 2 * len(self._entries) + 64:
+            self._heap = [(e.next_change, s) for s, e in self._entries.items() if e.next_change != _NEVER]
+            heapq.heapify(self._heap)
+
+
+_materializer = RiskMaterializer()
+_cohort_index = CohortIndex()
+_materializer.subscribe(lambda profile, output: _cohort_index.upsert(cohort_row(profile, output)))
+
+
+def get_risk_materializer() -> RiskMaterializer:
+    """Return the process-wide materialized risk results."""
+    return _materializer
+
+
+def get_cohort_index() -> CohortIndex:
+    """Return the sorted cohort index kept current by the materializer."""
+    return _cohort_index
@@ -1,12 +1,12 @@
 """Rule-based risk scoring engine for F-1/J-1 visa compliance."""
-import json
-from pathlib import Path
-from datetime import date
-from typing import Optional
+import time
+from datetime import date, timedelta
+from typing import Any, Callable, Iterable, NamedTuple, Optional
 
 from models.student import StudentProfile, EnrollmentStatus
 from models.risk import RiskFlag, RiskOutput
 from services.alert_service import generate_alerts
+from services.cluster_insights import CLUSTERS_PATH, ClusterInsightRegistry
 
 # Map risk flag categories to cluster labels for reddit_insight (from data/clusters.json)
 CLUSTER_LABELS: dict[str, str] = {
@@ -19,151 +19,328 @@ CLUSTER_LABELS: dict[str, str] = {
     "OPT Expiring Soon": "OPT timing confusion",
 }
 
+_insights = ClusterInsightRegistry(CLUSTERS_PATH, CLUSTER_LABELS)
 
-def _load_cluster_insight(category: str) -> Optional[str]:
-    """Return reddit_insight label for a flag category from clusters.json."""
-    path = Path(__file__).resolve().parent.parent / "data" / "clusters.json"
-    if not path.exists():
-        return CLUSTER_LABELS.get(category)
-    try:
-        with open(path, encoding="utf-8") as f:
-            clusters = json.load(f)
-        for cid, data in clusters.items():
-            if isinstance(data, dict) and data.get("label") == CLUSTER_LABELS.get(category):
-                return f"Community insight: {data['label']}"
-        return CLUSTER_LABELS.get(category)
-    except Exception:
-        return CLUSTER_LABELS.get(category)
 
+def get_insight_registry() -> ClusterInsightRegistry:
+    """Return the process-wide cluster insight index (for admin reload/stats)."""
+    return _insights
 
-def calculate_risk(profile: StudentProfile, today: Optional[date] = None) -> RiskOutput:
-    """Rule-based risk score and flags. today defaults to date.today()."""
-    if today is None:
-        today = date.today()
-    score = 0
-    flags: list[RiskFlag] = []
 
-    # Rule 1: OPT application timing
+# Rule thresholds (days / hours). Shared with the batch engine so both paths agree.
+OPT_FILING_LEAD_DAYS = 90
+OPT_WINDOW_HIGH_DAYS = 30
+OPT_WINDOW_MEDIUM_DAYS = 60
+PROGRAM_END_WARNING_DAYS = 60
+OPT_END_WARNING_DAYS = 30
+WORK_HOURS_LIMIT = 20
+WORK_HOURS_WARNING = 17
+
+# Rule scores
+SCORE_OPT_TIMING_HIGH = 35
+SCORE_OPT_TIMING_MEDIUM = 15
+SCORE_ENROLLMENT = 40
+SCORE_WORK_HOURS_OVER = 30
+SCORE_WORK_HOURS_NEAR = 10
+SCORE_TRAVEL = 15
+SCORE_PROGRAM_END = 20
+SCORE_OPT_EXPIRING = 25
+
+# Risk level cut-offs on the capped score
+HIGH_RISK_ABOVE = 65
+MEDIUM_RISK_ABOVE = 35
+
+# A rule of the form (deadline - today).days < window first fires window - 1 days before the
+# deadline. Lead times below are relative to program_end_date (or opt_end_date for OPT_END_FIRES).
+OPT_MEDIUM_FIRES = OPT_FILING_LEAD_DAYS + OPT_WINDOW_MEDIUM_DAYS - 1
+OPT_HIGH_FIRES = OPT_FILING_LEAD_DAYS + OPT_WINDOW_HIGH_DAYS - 1
+PROGRAM_END_FIRES = PROGRAM_END_WARNING_DAYS - 1
+OPT_END_FIRES = OPT_END_WARNING_DAYS - 1
+
+
+def risk_threshold_dates(profile: StudentProfile) -> list[date]:
+    """Dates on which a date-driven rule first fires for this profile (sorted, may be in the past)."""
+    out: list[date] = []
     if not profile.on_opt and not profile.on_cpt:
-        days_to_program_end = (profile.program_end_date - today).days
-        opt_application_deadline = days_to_program_end - 90
-        if opt_application_deadline < 30:
-            score += 35
-            reddit_insight = _load_cluster_insight("OPT Application Timing")
-            flags.append(RiskFlag(
-                category="OPT Application Timing",
-                severity="high",
-                explanation=(
-                    f"Your OPT application window opens in approximately "
-                    f"{opt_application_deadline} days. "
-                    f"Missing this window means losing your right to work post-graduation."
-                ),
-                days_until_critical=opt_application_deadline,
-                reddit_insight=reddit_insight,
-            ))
-        elif opt_application_deadline < 60:
-            score += 15
-            flags.append(RiskFlag(
-                category="OPT Application Timing",
-                severity="medium",
-                explanation=(
-                    "Your OPT application window is approaching. Begin gathering documents now."
-                ),
-                days_until_critical=opt_application_deadline,
-            ))
+        out.append(profile.program_end_date - timedelta(days=OPT_MEDIUM_FIRES))
+        out.append(profile.program_end_date - timedelta(days=OPT_HIGH_FIRES))
+    if not profile.on_opt:
+        out.append(profile.program_end_date - timedelta(days=PROGRAM_END_FIRES))
+    if profile.on_opt and profile.opt_end_date:
+        out.append(profile.opt_end_date - timedelta(days=OPT_END_FIRES))
+    out.sort()
+    return out
 
-    # Rule 2: Full-time enrollment requirement
-    if profile.enrollment_status == EnrollmentStatus.PART_TIME:
-        score += 40
-        reddit_insight = _load_cluster_insight("Enrollment Status Violation")
-        flags.append(RiskFlag(
-            category="Enrollment Status Violation",
-            severity="high",
-            explanation=(
-                "F-1 students must maintain full-time enrollment during the academic year "
-                "unless authorized by DSO. Part-time status without authorization is a "
-                "SEVIS violation."
-            ),
-            reddit_insight=reddit_insight,
-        ))
 
-    # Rule 3: On-campus work hours
-    if profile.weekly_work_hours > 20:
-        score += 30
-        reddit_insight = _load_cluster_insight("Work Hour Violation")
-        flags.append(RiskFlag(
-            category="Work Hour Violation",
-            severity="high",
-            explanation=(
-                f"You reported {profile.weekly_work_hours} hours/week. F-1 students may not "
-                f"work more than 20 hours per week on campus during the academic year. "
-                f"This is a deportable offense."
-            ),
-            reddit_insight=reddit_insight,
-        ))
-    elif profile.weekly_work_hours > 17:
-        score += 10
-        reddit_insight = _load_cluster_insight("Work Hours Approaching Limit")
-        flags.append(RiskFlag(
-            category="Work Hours Approaching Limit",
-            severity="medium",
-            explanation=(
-                f"You are at {profile.weekly_work_hours} hrs/week — close to the 20hr limit. "
-                f"Track carefully."
-            ),
-            reddit_insight=reddit_insight,
-        ))
+def next_risk_change(profile: StudentProfile, output: RiskOutput, today: date) -> Optional[date]:
+    """First date after today on which calculate_risk(profile) can differ from output.
 
-    # Rule 4: Travel without valid visa stamp
-    if profile.traveling_soon:
-        score += 15
-        flags.append(RiskFlag(
-            category="International Travel Risk",
-            severity="medium",
-            explanation=(
-                "Ensure your visa stamp, I-20, and travel signature are all valid before "
-                "departing. Expired visa stamps require renewal at a US consulate abroad "
-                "before reentry."
-            ),
-        ))
+    Flags with a day countdown change text every day; otherwise only a threshold crossing
+    changes the result. None means the result holds until the profile changes.
+    """
+    if any(f.days_until_critical is not None for f in output.flags):
+        return today + timedelta(days=1)
+    return next((d for d in risk_threshold_dates(profile) if d > today), None)
+
+
+def risk_level_for(score: int) -> str:
+    """Map a capped 0-100 score to "high", "medium" or "low"."""
+    return "high" if score > HIGH_RISK_ABOVE else "medium" if score > MEDIUM_RISK_ABOVE else "low"
 
+
+# uint8 codes for enrollment_status in the batch engine's columns (services/risk_batch.py)
+ENROLLMENT_CODES: dict[EnrollmentStatus, int] = {
+    EnrollmentStatus.FULL_TIME: 0,
+    EnrollmentStatus.PART_TIME: 1,
+    EnrollmentStatus.ON_BREAK: 2,
+}
+PART_TIME_CODE = ENROLLMENT_CODES[EnrollmentStatus.PART_TIME]
+
+
+# A rule returns (points, flag) when it fires, else None.
+RuleHit = Optional[tuple[int, RiskFlag]]
+
+
+class RuleSpec(NamedTuple):
+    """One scored outcome of a rule, as data.
+
+    Specs sharing a `rule` name are tiers of one rule: they are tried in table order and
+    the first whose predicate holds fires. Predicates and the explanation template see the
+    rule context built by rule_context(). `vector` is the same predicate over the array
+    context of risk_batch.vector_context() (one NumPy value per student, enrollment_status as
+    ENROLLMENT_CODES, days_to_opt_end valid only where has_opt_end); score_cohort compiles
+    its plan from it, so a new spec needs no change to the batch engine.
+    """
+    rule: str
+    fields: frozenset[str]  # StudentProfile fields read; "today" if it depends on the date
+    predicate: Callable[[dict], bool]
+    vector: Callable[[dict], Any]  # bool array over the batch context
+    score: int
+    severity: str
+    category: str
+    explanation: str  # str.format template over the rule context
+    cluster_label: Optional[str] = None  # attach the community insight for this label
+    countdown: Optional[str] = None  # context key reported as days_until_critical
+
+
+_DATES = frozenset({"program_end_date", "today"})
+
+# Table order is flag order in RiskOutput (and bit order in risk_batch).
+RULE_SPECS: tuple[RuleSpec, ...] = (
+    # Rule 1: OPT application timing
+    RuleSpec(
+        "opt_timing", _DATES | {"on_opt", "on_cpt"},
+        lambda c: not c["on_opt"] and not c["on_cpt"] and c["opt_deadline"] < OPT_WINDOW_HIGH_DAYS,
+        lambda c: ~c["on_opt"] & ~c["on_cpt"] & (c["opt_deadline"] < OPT_WINDOW_HIGH_DAYS),
+        SCORE_OPT_TIMING_HIGH, "high", "OPT Application Timing",
+        "Your OPT application window opens in approximately {opt_deadline} days. "
+        "Missing this window means losing your right to work post-graduation.",
+        cluster_label=CLUSTER_LABELS["OPT Application Timing"], countdown="opt_deadline",
+    ),
+    RuleSpec(
+        "opt_timing", _DATES | {"on_opt", "on_cpt"},
+        lambda c: not c["on_opt"] and not c["on_cpt"] and c["opt_deadline"] < OPT_WINDOW_MEDIUM_DAYS,
+        lambda c: ~c["on_opt"] & ~c["on_cpt"] & (c["opt_deadline"] < OPT_WINDOW_MEDIUM_DAYS),
+        SCORE_OPT_TIMING_MEDIUM, "medium", "OPT Application Timing",
+        "Your OPT application window is approaching. Begin gathering documents now.",
+        countdown="opt_deadline",
+    ),
+    # Rule 2: Full-time enrollment requirement
+    RuleSpec(
+        "enrollment", frozenset({"enrollment_status"}),
+        lambda c: c["enrollment_status"] == EnrollmentStatus.PART_TIME,
+        lambda c: c["enrollment_status"] == PART_TIME_CODE,
+        SCORE_ENROLLMENT, "high", "Enrollment Status Violation",
+        "F-1 students must maintain full-time enrollment during the academic year "
+        "unless authorized by DSO. Part-time status without authorization is a "
+        "SEVIS violation.",
+        cluster_label=CLUSTER_LABELS["Enrollment Status Violation"],
+    ),
+    # Rule 3: On-campus work hours
+    RuleSpec(
+        "work_hours", frozenset({"weekly_work_hours"}),
+        lambda c: c["weekly_work_hours"] > WORK_HOURS_LIMIT,
+        lambda c: c["weekly_work_hours"] > WORK_HOURS_LIMIT,
+        SCORE_WORK_HOURS_OVER, "high", "Work Hour Violation",
+        "You reported {weekly_work_hours} hours/week. F-1 students may not "
+        "work more than 20 hours per week on campus during the academic year. "
+        "This is a deportable offense.",
+        cluster_label=CLUSTER_LABELS["Work Hour Violation"],
+    ),
+    RuleSpec(
+        "work_hours", frozenset({"weekly_work_hours"}),
+        lambda c: c["weekly_work_hours"] > WORK_HOURS_WARNING,
+        lambda c: c["weekly_work_hours"] > WORK_HOURS_WARNING,
+        SCORE_WORK_HOURS_NEAR, "medium", "Work Hours Approaching Limit",
+        "You are at {weekly_work_hours} hrs/week — close to the 20hr limit. Track carefully.",
+        cluster_label=CLUSTER_LABELS["Work Hours Approaching Limit"],
+    ),
+    # Rule 4: Travel without valid visa stamp
+    RuleSpec(
+        "travel", frozenset({"traveling_soon"}),
+        lambda c: c["traveling_soon"],
+        lambda c: c["traveling_soon"],
+        SCORE_TRAVEL, "medium", "International Travel Risk",
+        "Ensure your visa stamp, I-20, and travel signature are all valid before "
+        "departing. Expired visa stamps require renewal at a US consulate abroad "
+        "before reentry.",
+    ),
     # Rule 5: Program end proximity without OPT/CPT
+    RuleSpec(
+        "program_end", _DATES | {"on_opt"},
+        lambda c: c["days_to_end"] < PROGRAM_END_WARNING_DAYS and not c["on_opt"],
+        lambda c: (c["days_to_end"] < PROGRAM_END_WARNING_DAYS) & ~c["on_opt"],
+        SCORE_PROGRAM_END, "high", "Program End Approaching",
+        "Your program ends in {days_to_end} days and you have no active OPT/CPT. "
+        "You must have authorization to remain in the US after your program end date.",
+        countdown="days_to_end",
+    ),
+    # Rule 6: OPT gap period
+    RuleSpec(
+        "opt_expiring", frozenset({"on_opt", "opt_end_date", "today"}),
+        lambda c: c["on_opt"] and c["days_to_opt_end"] is not None and c["days_to_opt_end"] < OPT_END_WARNING_DAYS,
+        lambda c: c["on_opt"] & c["has_opt_end"] & (c["days_to_opt_end"] < OPT_END_WARNING_DAYS),
+        SCORE_OPT_EXPIRING, "high", "OPT Expiring Soon",
+        "Your OPT expires in {days_to_opt_end} days. Ensure you have an H-1B "
+        "cap-gap extension or other status if remaining in US.",
+        countdown="days_to_opt_end",
+    ),
+)
+
+
+def rule_context(profile: StudentProfile, today: date) -> dict:
+    """Values the rule predicates and explanation templates read."""
     days_to_end = (profile.program_end_date - today).days
-    if days_to_end < 60 and not profile.on_opt:
-        score += 20
-        flags.append(RiskFlag(
-            category="Program End Approaching",
-            severity="high",
-            explanation=(
-                f"Your program ends in {days_to_end} days and you have no active OPT/CPT. "
-                f"You must have authorization to remain in the US after your program end date."
-            ),
-            days_until_critical=days_to_end,
-        ))
+    return {
+        "on_opt": profile.on_opt,
+        "on_cpt": profile.on_cpt,
+        "enrollment_status": profile.enrollment_status,
+        "weekly_work_hours": profile.weekly_work_hours,
+        "traveling_soon": profile.traveling_soon,
+        "days_to_end": days_to_end,
+        "opt_deadline": days_to_end - OPT_FILING_LEAD_DAYS,
+        "days_to_opt_end": (profile.opt_end_date - today).days if profile.opt_end_date else None,
+    }
 
-    # Rule 6: OPT gap period
-    if profile.on_opt and profile.opt_end_date:
-        days_to_opt_end = (profile.opt_end_date - today).days
-        if days_to_opt_end < 30:
-            score += 25
-            flags.append(RiskFlag(
-                category="OPT Expiring Soon",
-                severity="high",
-                explanation=(
-                    f"Your OPT expires in {days_to_opt_end} days. Ensure you have an H-1B "
-                    f"cap-gap extension or other status if remaining in US."
-                ),
-                days_until_critical=days_to_opt_end,
-            ))
 
-    score = min(score, 100)
-    risk_level = "high" if score > 65 else "medium" if score > 35 else "low"
+def build_flag(spec: RuleSpec, ctx: dict) -> RiskFlag:
+    """The RiskFlag a spec emits for a rule context."""
+    return RiskFlag(
+        category=spec.category,
+        severity=spec.severity,
+        explanation=spec.explanation.format(**ctx),
+        days_until_critical=ctx[spec.countdown] if spec.countdown else None,
+        reddit_insight=_insights.for_label(spec.cluster_label) if spec.cluster_label else None,
+    )
+
+
+class RuleStats:
+    """Evaluation count, hits and cumulative time of one compiled rule.
+
+    Fed by both paths: the scalar closure per student, and risk_batch.score_cohort per cohort
+    (evaluations += rows, time of the rule's masks).
+
+    Counters are updated without a lock, so under concurrency they are approximate.
+    """
+    __slots__ = ("name", "evaluations", "hits", "total_ns")
+
+    def __init__(self, name: str) -> None:
+        self.name = name
+        self.evaluations = 0
+        self.hits = 0
+        self.total_ns = 0
+
+    def as_dict(self) -> dict:
+        return {
+            "rule": self.name,
+            "evaluations": self.evaluations,
+            "hits": self.hits,
+            "hit_rate": round(self.hits / self.evaluations, 4) if self.evaluations else None,
+            "total_ms": round(self.total_ns / 1e6, 3),
+            "avg_us": round(self.total_ns / self.evaluations / 1e3, 3) if self.evaluations else None,
+        }
+
+
+class RiskRule(NamedTuple):
+    name: str
+    fields: frozenset[str]
+    evaluate: Callable[[dict], RuleHit]  # takes rule_context(profile, today)
+    stats: RuleStats
+
+
+def _compile_rule(name: str, tiers: tuple[RuleSpec, ...]) -> RiskRule:
+    stats = RuleStats(name)
+    clock = time.perf_counter_ns
+
+    def evaluate(ctx: dict) -> RuleHit:
+        t0 = clock()
+        hit = None
+        for spec in tiers:
+            if spec.predicate(ctx):
+                hit = spec.score, build_flag(spec, ctx)
+                break
+        stats.total_ns += clock() - t0
+        stats.evaluations += 1
+        if hit is not None:
+            stats.hits += 1
+        return hit
+
+    fields = frozenset().union(*(spec.fields for spec in tiers))
+    return RiskRule(name, fields, evaluate, stats)
+
+
+def compile_rules(specs: Iterable[RuleSpec]) -> tuple[RiskRule, ...]:
+    """Group specs by rule name (first appearance order) into one closure per rule."""
+    groups: dict[str, list[RuleSpec]] = {}
+    for spec in specs:
+        groups.setdefault(spec.rule, []).append(spec)
+    return tuple(_compile_rule(name, tuple(tiers)) for name, tiers in groups.items())
+
 
+RULES: tuple[RiskRule, ...] = compile_rules(RULE_SPECS)
+
+
+def rule_stats() -> list[dict]:
+    """Per-rule evaluation count, hit rate and cumulative time since startup."""
+    return [rule.stats.as_dict() for rule in RULES]
+
+
+def rules_reading(fields: Iterable[str]) -> tuple[RiskRule, ...]:
+    """Rules whose result can change when any of these fields (or "today") changes."""
+    dirty = set(fields)
+    return tuple(r for r in RULES if r.fields & dirty)
+
+
+def evaluate_rules(
+    profile: StudentProfile, today: date, rules: Iterable[RiskRule] = RULES
+) -> dict[str, RuleHit]:
+    """Run the given rules; returns rule name -> hit (None when the rule did not fire)."""
+    ctx = rule_context(profile, today)
+    return {r.name: r.evaluate(ctx) for r in rules}
+
+
+def assemble_risk(student_id: str, hits: dict[str, RuleHit], today: date) -> RiskOutput:
+    """Combine per-rule hits (for every rule in RULES) into a RiskOutput."""
+    score = 0
+    flags: list[RiskFlag] = []
+    for rule in RULES:
+        hit = hits.get(rule.name)
+        if hit is not None:
+            score += hit[0]
+            flags.append(hit[1])
+    score = min(score, 100)
     return RiskOutput(
-        student_id=profile.student_id,
+        student_id=student_id,
         risk_score=score,
-        risk_level=risk_level,
+        risk_level=risk_level_for(score),
         flags=flags,
         alerts=generate_alerts(flags),
         generated_at=str(today),
     )
+
+
+def calculate_risk(profile: StudentProfile, today: Optional[date] = None) -> RiskOutput:
+    """Rule-based risk score and flags. today defaults to date.today()."""
+    if today is None:
+        today = date.today()
+    return assemble_risk(profile.student_id, evaluate_rules(profile, today), today)
@@ -0,0 +1,83 @@
+"""Risk projection over a date range, returning only the dates where score, level or flags change.
+
+The score is piecewise constant in the date: it can only change on the days a date-driven rule
+first fires (risk_engine.*_FIRES). Each student is therefore scored once at the range start and
+once per threshold inside the range, all in a single score_cohort call.
+"""
+from datetime import date
+from typing import Optional, Sequence
+
+import numpy as np
+
+from models.student import StudentProfile
+from services import risk_engine as engine
+from services.risk_batch import (
+    CohortColumns,
+    columns_from_profiles,
+    flag_categories,
+    flag_severities,
+    score_cohort,
+)
+
+MAX_TIMELINE_DAYS = 3650
+
+
+def project_timelines(profiles: Sequence[StudentProfile], start: date, days: int) -> list[list[dict]]:
+    """Change points for each profile over [start, start + days] (see project_columns)."""
+    if not profiles:
+        return []
+    return project_columns(columns_from_profiles(profiles), start, days)
+
+
+def project_columns(cols: CohortColumns, start: date, days: int) -> list[list[dict]]:
+    """Change points for each row of cols over [start, start + days].
+
+    Each timeline starts with the state on `start`; later entries are days the score, level,
+    flag set or a flag's severity differs from the previous entry ("severities" is aligned
+    with "flags", so a tier change such as OPT timing medium -> high shows up even when the
+    score is already capped).
+    """
+    if not len(cols):
+        return []
+    s = start.toordinal()
+    end = s + days
+    never = np.iinfo(np.int64).max
+
+    pe = cols.program_end
+    candidates = np.stack([
+        np.full(len(cols), s, dtype=np.int64),
+        pe - engine.OPT_MEDIUM_FIRES,
+        pe - engine.OPT_HIGH_FIRES,
+        pe - engine.PROGRAM_END_FIRES,
+        np.where(cols.has_opt_end, cols.opt_end - engine.OPT_END_FIRES, never),
+    ], axis=1)
+    inside = (candidates > s) & (candidates <= end)
+    inside[:, 0] = True
+    candidates = np.sort(np.where(inside, candidates, never), axis=1)
+    rows, slots = np.nonzero(candidates != never)  # row-major: each student's dates ascending
+    at = candidates[rows, slots]
+
+    result = score_cohort(cols.take(rows), at)
+
+    timelines: list[list[dict]] = [[] for _ in range(len(cols))]
+    prev_row = -1
+    prev_state = None
+    for k in range(len(rows)):
+        row = int(rows[k])
+        state = (int(result.risk_score[k]), int(result.flags[k]))
+        if row == prev_row and state == prev_state:
+            continue
+        timelines[row].append({
+            "date": str(date.fromordinal(int(at[k]))),
+            "risk_score": state[0],
+            "risk_level": str(result.risk_level[k]),
+            "flags": flag_categories(state[1]),
+            "severities": flag_severities(state[1]),
+        })
+        prev_row, prev_state = row, state
+    return timelines
+
+
+def first_high_risk_date(timeline: list[dict]) -> Optional[str]:
+    """Date of the first change point at high risk level, if any."""
+    return next((p["date"] for p in timeline if p["risk_level"] == "high"), None)
@@ -0,0 +1,84 @@
+"""Keeps this worker's risk caches consistent with writes made by other workers (UNIVISA_STORE=sqlite).
+
+Before each request the worker reads new entries from the SQLite change log (in the threadpool,
+since the read can wait on SQLite) and invalidates the materialized risk result (and cohort index
+row) of every student another worker wrote. Old log entries are deleted by a background task
+every UNIVISA_CHANGE_LOG_TRIM_INTERVAL seconds rather than by a request.
+"""
+import asyncio
+import logging
+import os
+import sqlite3
+from typing import Optional
+
+from services.risk_cache import get_cohort_index, get_risk_materializer
+from services.store import STORE_BACKEND, ChangeFeed, get_pool
+
+logger = logging.getLogger(__name__)
+
+TRIM_INTERVAL_S = float(os.getenv("UNIVISA_CHANGE_LOG_TRIM_INTERVAL", "60"))
+
+_feed: Optional[ChangeFeed] = None
+_trim_task: Optional[asyncio.Task] = None
+
+
+def shared_state_enabled() -> bool:
+    return STORE_BACKEND == "sqlite"
+
+
+def get_change_feed() -> Optional[ChangeFeed]:
+    """The student change feed, or None when the store is not shared between processes."""
+    global _feed
+    if _feed is None and shared_state_enabled():
+        _feed = ChangeFeed(get_pool(), "students")
+    return _feed
+
+
+def apply_remote_changes() -> int:
+    """Invalidate cached results for students changed by other workers; returns how many changes applied."""
+    feed = get_change_feed()
+    if feed is None:
+        return 0
+    changes = feed.poll()
+    materializer = get_risk_materializer()
+    index = get_cohort_index()
+    if changes is None:
+        materializer.reset()
+        index.clear()
+        return 0
+    for op, student_id in changes:
+        if op == "delete":
+            materializer.forget(student_id)
+            index.remove(student_id)
+        else:
+            materializer.invalidate(student_id)
+    return len(changes)
+
+
+async def _trim_periodically(feed: ChangeFeed) -> None:
+    while True:
+        await asyncio.sleep(TRIM_INTERVAL_S)
+        try:
+            await asyncio.to_thread(feed.trim)
+        except sqlite3.Error as e:
+            logger.warning("Change log trim failed: %s", e)
+
+
+async def start_change_log_trimmer() -> None:
+    """Start trimming the change log in the background (app startup; no-op unless sqlite)."""
+    global _trim_task
+    feed = get_change_feed()
+    if feed is not None and _trim_task is None:
+        _trim_task = asyncio.get_running_loop().create_task(_trim_periodically(feed))
+
+
+async def stop_change_log_trimmer() -> None:
+    """Cancel the trim task (app shutdown)."""
+    global _trim_task
+    if _trim_task is not None:
+        task, _trim_task = _trim_task, None
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
@@ -0,0 +1,371 @@
+"""Storage backends for student profiles and CPT requests.
+
+UNIVISA_STORE=memory (default) keeps plain dicts, as in the hackathon build and for tests.
+UNIVISA_STORE=columnar keeps students in NumPy columns (services/student_table.py), for large
+cohorts in a single process; CPT requests stay in memory.
+UNIVISA_STORE=sqlite persists to UNIVISA_DB_PATH in WAL mode so data survives restarts and
+several uvicorn workers can share it. Every backend is a MutableMapping keyed by id, so
+routers use them exactly like the dicts they replace.
+
+In SQLite mode each student write also appends to a `changes` log in the same transaction;
+other workers read it through ChangeFeed to drop their cached risk results (services/shared_state.py).
+"""
+import os
+import queue
+import sqlite3
+import threading
+import uuid
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Callable, Generic, Iterable, Iterator, MutableMapping, Optional, TypeVar, Union
+
+from pydantic import BaseModel
+
+from models.cpt_request import CPTRequest
+from models.student import StudentProfile
+from services.cpt_index import IndexedCPTStore
+from services.student_table import ColumnarStudentTable
+
+STORE_BACKEND = os.getenv("UNIVISA_STORE", "memory").strip().lower()
+DB_PATH = Path(os.getenv("UNIVISA_DB_PATH", str(Path(__file__).resolve().parent.parent / "data" / "univisa.db")))
+# Sync FastAPI routes run on anyio's threadpool (40 threads by default); one connection per thread.
+POOL_SIZE = int(os.getenv("UNIVISA_DB_POOL_SIZE", "40"))
+# Rows kept in the change log; a worker further behind than this resets its caches instead.
+CHANGE_LOG_RETENTION = int(os.getenv("UNIVISA_CHANGE_LOG_RETENTION", "100000"))
+# Identifies this process's writes in the change log, so a worker skips its own changes.
+ORIGIN = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+
+M = TypeVar("M", bound=BaseModel)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS students (
+    student_id TEXT PRIMARY KEY,
+    university TEXT NOT NULL,
+    program_end_date TEXT NOT NULL,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS ix_students_university ON students (university);
+CREATE INDEX IF NOT EXISTS ix_students_program_end ON students (program_end_date);
+
+CREATE TABLE IF NOT EXISTS cpt_requests (
+    id TEXT PRIMARY KEY,
+    student_id TEXT NOT NULL,
+    status TEXT NOT NULL,
+    created_at TEXT NOT NULL,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS ix_cpt_student ON cpt_requests (student_id, created_at, id);
+CREATE INDEX IF NOT EXISTS ix_cpt_status ON cpt_requests (status, created_at, id);
+CREATE INDEX IF NOT EXISTS ix_cpt_created ON cpt_requests (created_at, id);
+
+CREATE TABLE IF NOT EXISTS changes (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    tbl TEXT NOT NULL,
+    op TEXT NOT NULL,
+    key TEXT NOT NULL,
+    origin TEXT NOT NULL
+);
+"""
+
+
+class ConnectionPool:
+    """Fixed-size pool of SQLite connections in WAL mode, shared across threads."""
+
+    def __init__(self, path: Path, size: int = POOL_SIZE):
+        self.path = path
+        self.size = size
+        self._idle: queue.LifoQueue[sqlite3.Connection] = queue.LifoQueue()
+        self._created = 0
+        self._lock = threading.Lock()
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with self.connection() as conn:
+            conn.executescript(_SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+        # isolation_level=None: autocommit, explicit BEGIN for batches. The statement cache
+        # keeps the handful of queries below prepared per connection.
+        conn = sqlite3.connect(
+            self.path, timeout=30, isolation_level=None, check_same_thread=False, cached_statements=256
+        )
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA busy_timeout=30000")
+        return conn
+
+    @contextmanager
+    def connection(self) -> Iterator[sqlite3.Connection]:
+        try:
+            conn = self._idle.get_nowait()
+        except queue.Empty:
+            with self._lock:
+                can_create = self._created < self.size
+                if can_create:
+                    self._created += 1
+            conn = self._connect() if can_create else self._idle.get()
+        try:
+            yield conn
+        finally:
+            self._idle.put(conn)
+
+    @contextmanager
+    def transaction(self) -> Iterator[sqlite3.Connection]:
+        with self.connection() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield conn
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            conn.execute("COMMIT")
+
+
+class SQLiteTable(MutableMapping[str, M], Generic[M]):
+    """A table of JSON-serialized models keyed by id, with some fields copied into indexed columns."""
+
+    def __init__(
+        self,
+        pool: ConnectionPool,
+        table: str,
+        model: type[M],
+        key: str,
+        columns: dict[str, Callable[[M], str]],
+        track_changes: bool = False,
+    ):
+        self._pool = pool
+        self._track_changes = track_changes
+        self._model = model
+        self._columns = columns
+        names = [key, *columns, "data"]
+        placeholders = ", ".join("?" for _ in names)
+        updates = ", ".join(f"{n} = excluded.{n}" for n in names[1:])
+        self._sql_upsert = (
+            f"INSERT INTO {table} ({', '.join(names)}) VALUES ({placeholders}) "
+            f"ON CONFLICT({key}) DO UPDATE SET {updates}"
+        )
+        self._sql_get = f"SELECT data FROM {table} WHERE {key} = ?"
+        self._sql_has = f"SELECT 1 FROM {table} WHERE {key} = ?"
+        self._sql_delete = f"DELETE FROM {table} WHERE {key} = ?"
+        self._sql_keys = f"SELECT {key} FROM {table} ORDER BY rowid"
+        self._sql_items = f"SELECT {key}, data FROM {table} ORDER BY rowid"
+        self._sql_count = f"SELECT COUNT(*) FROM {table}"
+        self._sql_change = f"INSERT INTO changes (tbl, op, key, origin) VALUES ('{table}', ?, ?, '{ORIGIN}')"
+        self.table = table
+        self.key = key
+
+    def _row(self, k: str, v: M) -> tuple:
+        return (k, *(f(v) for f in self._columns.values()), v.model_dump_json())
+
+    def __getitem__(self, k: str) -> M:
+        with self._pool.connection() as conn:
+            row = conn.execute(self._sql_get, (k,)).fetchone()
+        if row is None:
+            raise KeyError(k)
+        return self._model.model_validate_json(row[0])
+
+    def __setitem__(self, k: str, v: M) -> None:
+        if not self._track_changes:
+            with self._pool.connection() as conn:
+                conn.execute(self._sql_upsert, self._row(k, v))
+            return
+        with self._pool.transaction() as conn:
+            conn.execute(self._sql_upsert, self._row(k, v))
+            conn.execute(self._sql_change, ("upsert", k))
+
+    def __delitem__(self, k: str) -> None:
+        with self._pool.transaction() as conn:
+            if conn.execute(self._sql_delete, (k,)).rowcount == 0:
+                raise KeyError(k)
+            if self._track_changes:
+                conn.execute(self._sql_change, ("delete", k))
+
+    def __contains__(self, k: object) -> bool:
+        with self._pool.connection() as conn:
+            return conn.execute(self._sql_has, (k,)).fetchone() is not None
+
+    def __iter__(self) -> Iterator[str]:
+        with self._pool.connection() as conn:
+            keys = [r[0] for r in conn.execute(self._sql_keys)]
+        return iter(keys)
+
+    def __len__(self) -> int:
+        with self._pool.connection() as conn:
+            return conn.execute(self._sql_count).fetchone()[0]
+
+    def items(self):
+        with self._pool.connection() as conn:
+            rows = conn.execute(self._sql_items).fetchall()
+        return [(k, self._model.model_validate_json(data)) for k, data in rows]
+
+    def values(self):
+        return [v for _, v in self.items()]
+
+    def update(self, other=(), /, **kwargs) -> None:
+        """Batched upsert: all rows in one transaction with executemany."""
+        pairs: Iterable[tuple[str, M]] = other.items() if hasattr(other, "items") else other
+        rows = [self._row(k, v) for k, v in pairs]
+        rows += [self._row(k, v) for k, v in kwargs.items()]
+        with self._pool.transaction() as conn:
+            conn.executemany(self._sql_upsert, rows)
+            if self._track_changes:
+                conn.executemany(self._sql_change, [("upsert", row[0]) for row in rows])
+
+    def query(
+        self, where: str, params: tuple = (), order_by: Optional[str] = None, limit: Optional[int] = None
+    ) -> list[M]:
+        """Models matching a SQL WHERE clause over the indexed columns."""
+        sql = f"SELECT data FROM {self.table} WHERE {where}"
+        if order_by:
+            sql += f" ORDER BY {order_by}"
+        if limit is not None:
+            sql += f" LIMIT {int(limit)}"
+        with self._pool.connection() as conn:
+            rows = conn.execute(sql, params).fetchall()
+        return [self._model.model_validate_json(r[0]) for r in rows]
+
+
+class SQLiteCPTTable(SQLiteTable[CPTRequest]):
+    """CPT requests table with the same indexed listings as services.cpt_index.IndexedCPTStore."""
+
+    def __init__(self, pool: ConnectionPool):
+        super().__init__(
+            pool, "cpt_requests", CPTRequest, "id",
+            {"student_id": lambda r: r.student_id, "status": lambda r: r.status.value, "created_at": lambda r: r.created_at},
+        )
+
+    def for_student(self, student_id: str) -> list[CPTRequest]:
+        """A student's requests, newest first (served by ix_cpt_student)."""
+        return self.query("student_id = ?", (student_id,), order_by="created_at DESC, id DESC")
+
+    def page(
+        self, limit: Optional[int] = None, cursor: Optional[str] = None, status: Optional[str] = None
+    ) -> tuple[list[CPTRequest], Optional[str]]:
+        """Requests newest first, optionally one status only, after the request id in cursor."""
+        where, params = ["1"], []
+        if cursor:
+            with self._pool.connection() as conn:
+                row = conn.execute("SELECT created_at FROM cpt_requests WHERE id = ?", (cursor,)).fetchone()
+            if row is None:
+                raise ValueError(f"unknown request id {cursor!r}")
+            where.append("(created_at, id) < (?, ?)")
+            params += [row[0], cursor]
+        if status is not None:
+            where.append("status = ?")
+            params.append(status)
+        out = self.query(" AND ".join(where), tuple(params), order_by="created_at DESC, id DESC", limit=limit)
+        has_more = limit is not None and len(out) == limit
+        return out, out[-1].id if has_more and out else None
+
+
+class ChangeFeed:
+    """Reads the changes log written by other processes, from where this process last stopped."""
+
+    def __init__(self, pool: ConnectionPool, table: str):
+        self._pool = pool
+        self._table = table
+        self._lock = threading.Lock()
+        with pool.connection() as conn:
+            self.last_seq = conn.execute("SELECT COALESCE(MAX(seq), 0) FROM changes").fetchone()[0]
+        self._trimmed_to = 0
+        self.polls = 0
+        self.changes_seen = 0
+        self.resets = 0
+        self.trims = 0
+
+    def poll(self) -> Optional[list[tuple[str, str]]]:
+        """New (op, key) changes from other processes, oldest first.
+
+        Returns None if entries this process had not read yet were already trimmed; the caller
+        must then treat everything it caches as stale. Sequence numbers are contiguous (one
+        writer at a time), so a jump past last_seq + 1 means a trim.
+        """
+        with self._lock, self._pool.connection() as conn:
+            rows = conn.execute(
+                "SELECT seq, tbl, op, key, origin FROM changes WHERE seq > ? ORDER BY seq", (self.last_seq,)
+            ).fetchall()
+            self.polls += 1
+            if not rows:
+                return []
+            gap = rows[0][0] > self.last_seq + 1
+            self.last_seq = rows[-1][0]
+        if gap:
+            self.resets += 1
+            return None
+        out = [(op, key) for _, tbl, op, key, origin in rows if tbl == self._table and origin != ORIGIN]
+        self.changes_seen += len(out)
+        return out
+
+    def trim(self) -> int:
+        """Delete entries more than CHANGE_LOG_RETENTION behind what this process has read; returns rows deleted.
+
+        Not part of poll(): the DELETE waits for the database write lock, so it runs on a timer
+        (services.shared_state) instead of in front of a request.
+        """
+        upto = self.last_seq - CHANGE_LOG_RETENTION
+        if upto <= self._trimmed_to + 1000:
+            return 0
+        with self._pool.connection() as conn:
+            deleted = conn.execute("DELETE FROM changes WHERE seq <= ?", (upto,)).rowcount
+        self._trimmed_to = upto
+        self.trims += 1
+        return deleted
+
+    def stats(self) -> dict:
+        return {
+            "origin": ORIGIN,
+            "last_seq": self.last_seq,
+            "polls": self.polls,
+            "changes_seen": self.changes_seen,
+            "resets": self.resets,
+            "trimmed_to": self._trimmed_to,
+            "trims": self.trims,
+        }
+
+
+_pool: Optional[ConnectionPool] = None
+_pool_lock = threading.Lock()
+
+
+def get_pool(path: Path = DB_PATH) -> ConnectionPool:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ConnectionPool(path)
+        return _pool
+
+
+def student_table(pool: ConnectionPool) -> SQLiteTable[StudentProfile]:
+    return SQLiteTable(
+        pool, "students", StudentProfile, "student_id",
+        {"university": lambda p: p.university, "program_end_date": lambda p: p.program_end_date.isoformat()},
+        track_changes=True,
+    )
+
+
+def cpt_table(pool: ConnectionPool) -> SQLiteCPTTable:
+    return SQLiteCPTTable(pool)
+
+
+BACKENDS = ("memory", "columnar", "sqlite")
+
+
+def _check_backend(backend: str) -> None:
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown UNIVISA_STORE backend {backend!r} (expected one of {', '.join(BACKENDS)})")
+
+
+def open_student_store(backend: str = STORE_BACKEND) -> MutableMapping[str, StudentProfile]:
+    """Student profiles keyed by student_id for the configured backend."""
+    _check_backend(backend)
+    if backend == "sqlite":
+        return student_table(get_pool())
+    if backend == "columnar":
+        return ColumnarStudentTable()
+    return {}
+
+
+def open_cpt_store(backend: str = STORE_BACKEND) -> Union[IndexedCPTStore, SQLiteCPTTable]:
+    """CPT requests keyed by request id, with for_student() and page() listings."""
+    _check_backend(backend)
+    if backend == "sqlite":
+        return cpt_table(get_pool())
+    return IndexedCPTStore()
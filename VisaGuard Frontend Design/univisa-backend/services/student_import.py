@@ -0,0 +1,118 @@
+"""Bulk student import: parse a streamed CSV or JSONL upload and validate it in batches.
+
+The upload is consumed chunk by chunk and split into records; every IMPORT_BATCH_SIZE records
+are validated with one TypeAdapter call and handed to the caller, so memory holds one batch of
+rows (plus the per-row results) regardless of file size.
+"""
+import codecs
+import csv
+import json
+from typing import AsyncIterator, Optional
+
+from pydantic import TypeAdapter, ValidationError
+
+from models.student import EnrollmentStatus, StudentProfileCreate, _normalize_enrollment
+
+IMPORT_BATCH_SIZE = 1000
+# Per-row errors returned in the response; the total count is always reported.
+MAX_REPORTED_ERRORS = 200
+# Per-row entries for imported students returned in the response (first rows only), so its
+# size does not grow with the upload; imported and per-level counts cover every row.
+MAX_REPORTED_STUDENTS = 1000
+
+_rows_adapter = TypeAdapter(list[StudentProfileCreate])
+
+
+class RowError(Exception):
+    """A record that could not be parsed into a row dict."""
+
+
+async def iter_records(chunks: AsyncIterator[bytes], fmt: str) -> AsyncIterator[str]:
+    """Logical records from a byte stream: lines, except that a CSV quoted field may span lines.
+
+    A CSV record is complete once it holds an even number of '"' characters (RFC 4180 escapes
+    a quote as ""), so multi-line quoted fields are kept together. JSONL records are lines.
+    """
+    quoted = fmt == "csv"
+    decoder = codecs.getincrementaldecoder("utf-8-sig")()
+    pending = ""
+    record = ""
+    async for chunk in chunks:
+        pending += decoder.decode(chunk)
+        *lines, pending = pending.split("\n")
+        for line in lines:
+            record += line + "\n"
+            if not quoted or record.count('"') % 2 == 0:
+                yield record
+                record = ""
+    record += pending + decoder.decode(b"", final=True)
+    if record.strip():
+        yield record
+
+
+def _normalize_enrollment_column(rows: list[dict]) -> None:
+    """Map each distinct enrollment_status value once and write the enum back into the rows."""
+    mapped: dict[object, EnrollmentStatus] = {}
+    for row in rows:
+        v = row.get("enrollment_status")
+        if v is None or not isinstance(v, (str, EnrollmentStatus)):
+            continue
+        status = mapped.get(v)
+        if status is None:
+            status = mapped[v] = _normalize_enrollment(v)
+        row["enrollment_status"] = status
+
+
+def validate_batch(rows: list[Optional[dict]]) -> tuple[list[tuple[int, StudentProfileCreate]], dict[int, list]]:
+    """Validate a batch of row dicts (None = unparseable) in one TypeAdapter pass.
+
+    Returns ([(position, model)], {position: errors}); positions index into rows.
+    """
+    errors: dict[int, list] = {}
+    positions = [i for i, row in enumerate(rows) if row is not None]
+    candidates = [rows[i] for i in positions]
+    _normalize_enrollment_column(candidates)
+    try:
+        models = _rows_adapter.validate_python(candidates)
+    except ValidationError as e:
+        for err in e.errors(include_url=False, include_context=False, include_input=False):
+            idx, *loc = err["loc"]
+            errors.setdefault(positions[idx], []).append({"loc": loc, "msg": err["msg"], "type": err["type"]})
+        # Re-validate only the rows that passed; this cannot fail.
+        positions = [p for p in positions if p not in errors]
+        models = _rows_adapter.validate_python([rows[p] for p in positions])
+    return list(zip(positions, models)), errors
+
+
+class RecordParser:
+    """Turns records into row dicts for one upload format ("csv" with a header row, or "jsonl")."""
+
+    def __init__(self, fmt: str):
+        self.fmt = fmt
+        self._header: Optional[list[str]] = None
+
+    def parse(self, records: list[str]) -> list[object]:
+        """One entry per data record: a row dict, or a RowError. The CSV header is consumed."""
+        if self.fmt == "jsonl":
+            return [self._json_row(r) for r in records if r.strip()]
+        out: list[object] = []
+        for fields in csv.reader(records):
+            if not fields:
+                continue
+            if self._header is None:
+                self._header = [h.strip() for h in fields]
+                continue
+            if len(fields) != len(self._header):
+                out.append(RowError(f"expected {len(self._header)} columns, got {len(fields)}"))
+                continue
+            # Empty cells are treated as missing so optional dates default to None.
+            out.append({k: v for k, v in zip(self._header, fields) if v != ""})
+        return out
+
+    @staticmethod
+    def _json_row(record: str) -> object:
+        try:
+            row = json.loads(record)
+        except json.JSONDecodeError as e:
+            return RowError(f"invalid JSON: {e.msg}")
+        return row if isinstance(row, dict) else RowError("expected a JSON object")
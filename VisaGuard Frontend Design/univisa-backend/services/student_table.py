@@ -0,0 +1,206 @@
+"""Columnar in-memory student store (UNIVISA_STORE=columnar).
+
+Profiles are kept as one row across NumPy columns instead of one Pydantic object each:
+dates as int32 ordinals, weekly hours as float32, the five booleans as bits of a uint8,
+enums as uint8 codes, and university/country as codes into an interned string list.
+A StudentProfile is built only when a single student is read; cohort-wide readers take the
+rule inputs as arrays (columns()) and other fields one column at a time (field_values()).
+"""
+import threading
+from datetime import date
+from typing import Callable, Iterable, Iterator, MutableMapping, Optional
+
+import numpy as np
+
+from models.student import EnrollmentStatus, StudentProfile, VisaType
+from services.risk_batch import ENROLLMENT_CODES, CohortColumns
+
+DATE_FIELDS = (
+    "program_start_date", "program_end_date",
+    "opt_start_date", "opt_end_date", "cpt_start_date", "cpt_end_date",
+)
+BOOL_FIELDS = ("on_opt", "on_cpt", "traveling_soon", "changing_employer", "changing_courses")
+# Ordinal 0 is never a real date (date.min is 1), so it marks an unset optional date.
+NO_DATE = 0
+
+_VISA_TYPES = list(VisaType)
+_ENROLLMENT = list(EnrollmentStatus)
+# Table enrollment code -> risk_batch ENROLLMENT_CODES
+_RISK_ENROLLMENT = np.array([ENROLLMENT_CODES[s] for s in _ENROLLMENT], np.uint8)
+_PROGRAM_END = DATE_FIELDS.index("program_end_date")
+_OPT_END = DATE_FIELDS.index("opt_end_date")
+
+
+class _Interner:
+    """Distinct strings stored once; rows hold uint32 codes."""
+
+    def __init__(self) -> None:
+        self.values: list[str] = []
+        self._codes: dict[str, int] = {}
+
+    def code(self, value: str) -> int:
+        code = self._codes.get(value)
+        if code is None:
+            code = self._codes[value] = len(self.values)
+            self.values.append(value)
+        return code
+
+
+class ColumnarStudentTable(MutableMapping[str, StudentProfile]):
+    """MutableMapping of student_id -> StudentProfile backed by NumPy columns.
+
+    Iteration follows insertion order like a dict. Deleted rows are reused by later inserts.
+    Reads and writes of a row hold one lock, so a read never sees a partly updated row.
+    Hours that do not survive a float32 round trip (more than ~7 significant digits) are
+    kept exactly in a side dict, so reads always return what was written.
+    """
+
+    def __init__(self, capacity: int = 1024):
+        self._lock = threading.Lock()
+        self._rows: dict[str, int] = {}
+        self._free: list[int] = []
+        self._size = 0  # rows ever allocated (live + free)
+        self._names: list[Optional[str]] = []
+        self._universities = _Interner()
+        self._countries = _Interner()
+        self._university = np.zeros(capacity, np.uint32)
+        self._country = np.zeros(capacity, np.uint32)
+        self._visa = np.zeros(capacity, np.uint8)
+        self._enrollment = np.zeros(capacity, np.uint8)
+        self._dates = np.zeros((capacity, len(DATE_FIELDS)), np.int32)
+        self._hours = np.zeros(capacity, np.float32)
+        self._bits = np.zeros(capacity, np.uint8)
+        self._exact_hours: dict[int, float] = {}
+
+    def __getitem__(self, sid: str) -> StudentProfile:
+        # Cells are read under the writers' lock: an update rewrites a row in place and a
+        # delete frees it for reuse, so an unlocked read could mix old and new values.
+        with self._lock:
+            r = self._rows[sid]
+            bits = int(self._bits[r])
+            ordinals = self._dates[r].tolist()
+            values = {
+                "student_id": sid,
+                "full_name": self._names[r],
+                "university": self._universities.values[self._university[r]],
+                "country_of_origin": self._countries.values[self._country[r]],
+                "visa_type": _VISA_TYPES[self._visa[r]],
+                "enrollment_status": _ENROLLMENT[self._enrollment[r]],
+                "weekly_work_hours": self._exact_hours.get(r, float(str(self._hours[r]))),
+            }
+        for name, o in zip(DATE_FIELDS, ordinals):
+            values[name] = date.fromordinal(o) if o != NO_DATE else None
+        for i, name in enumerate(BOOL_FIELDS):
+            values[name] = bool(bits >> i & 1)
+        return StudentProfile.model_validate(values)
+
+    def __setitem__(self, sid: str, profile: StudentProfile) -> None:
+        with self._lock:
+            r = self._rows.get(sid)
+            if r is None:
+                r = self._free.pop() if self._free else self._append()
+            self._names[r] = profile.full_name
+            self._university[r] = self._universities.code(profile.university)
+            self._country[r] = self._countries.code(profile.country_of_origin)
+            self._visa[r] = _VISA_TYPES.index(profile.visa_type)
+            self._enrollment[r] = _ENROLLMENT.index(profile.enrollment_status)
+            self._dates[r] = [getattr(profile, f).toordinal() if getattr(profile, f) else NO_DATE for f in DATE_FIELDS]
+            hours = np.float32(profile.weekly_work_hours)
+            self._hours[r] = hours
+            if float(str(hours)) != profile.weekly_work_hours:
+                self._exact_hours[r] = profile.weekly_work_hours
+            else:
+                self._exact_hours.pop(r, None)
+            self._bits[r] = sum(1 << i for i, f in enumerate(BOOL_FIELDS) if getattr(profile, f))
+            self._rows[sid] = r
+
+    def __delitem__(self, sid: str) -> None:
+        with self._lock:
+            r = self._rows.pop(sid)
+            self._names[r] = None
+            self._exact_hours.pop(r, None)
+            self._free.append(r)
+
+    def columns(self, sids: Optional[Iterable[str]] = None) -> CohortColumns:
+        """Rule inputs for score_cohort, sliced straight from the arrays (no StudentProfile built).
+
+        sids defaults to every student in insertion order; ids not in the table are left out,
+        so student_ids of the result says which rows were returned.
+        """
+        with self._lock:
+            ids = list(self._rows) if sids is None else [sid for sid in sids if sid in self._rows]
+            idx = np.fromiter((self._rows[sid] for sid in ids), np.int64, len(ids))
+            dates = self._dates[idx].astype(np.int64)
+            bits = self._bits[idx]
+            # float32 -> float64 is not always the written value, but the rule thresholds are
+            # float32-exact, so every comparison comes out as on the profile; exact values win anyway.
+            hours = self._hours[idx].astype(np.float64)
+            if self._exact_hours:
+                exact = np.fromiter(self._exact_hours, np.int64, len(self._exact_hours))
+                for j in np.flatnonzero(np.isin(idx, exact)).tolist():
+                    hours[j] = self._exact_hours[int(idx[j])]
+            enrollment = _RISK_ENROLLMENT[self._enrollment[idx]]
+        opt_end = dates[:, _OPT_END]
+        return CohortColumns(
+            student_ids=ids,
+            program_end=dates[:, _PROGRAM_END],
+            opt_end=opt_end,
+            has_opt_end=opt_end != NO_DATE,
+            weekly_work_hours=hours,
+            enrollment=enrollment,
+            on_opt=(bits >> BOOL_FIELDS.index("on_opt") & 1).astype(bool),
+            on_cpt=(bits >> BOOL_FIELDS.index("on_cpt") & 1).astype(bool),
+            traveling_soon=(bits >> BOOL_FIELDS.index("traveling_soon") & 1).astype(bool),
+        )
+
+    def field_values(self, field: str, sids: Iterable[str]) -> list:
+        """One StudentProfile field for many students, without building profiles (None for unknown ids)."""
+        cell = self._cell(field)
+        with self._lock:
+            rows = self._rows
+            return [cell(rows[sid]) if sid in rows else None for sid in sids]
+
+    def _cell(self, field: str) -> Callable[[int], object]:
+        if field == "full_name":
+            return self._names.__getitem__
+        if field == "university":
+            return lambda r: self._universities.values[self._university[r]]
+        if field == "country_of_origin":
+            return lambda r: self._countries.values[self._country[r]]
+        if field == "visa_type":
+            return lambda r: _VISA_TYPES[self._visa[r]]
+        if field == "enrollment_status":
+            return lambda r: _ENROLLMENT[self._enrollment[r]]
+        if field == "weekly_work_hours":
+            return lambda r: self._exact_hours.get(r, float(str(self._hours[r])))
+        if field in DATE_FIELDS:
+            k = DATE_FIELDS.index(field)
+            return lambda r: date.fromordinal(int(self._dates[r, k])) if self._dates[r, k] != NO_DATE else None
+        if field in BOOL_FIELDS:
+            k = BOOL_FIELDS.index(field)
+            return lambda r: bool(int(self._bits[r]) >> k & 1)
+        raise KeyError(field)
+
+    def __contains__(self, sid: object) -> bool:
+        return sid in self._rows
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(list(self._rows))
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def _append(self) -> int:
+        r = self._size
+        if r == len(self._hours):
+            self._grow(max(1024, 2 * r))
+        self._size += 1
+        self._names.append(None)
+        return r
+
+    def _grow(self, capacity: int) -> None:
+        for attr in ("_university", "_country", "_visa", "_enrollment", "_dates", "_hours", "_bits"):
+            old = getattr(self, attr)
+            new = np.zeros((capacity, *old.shape[1:]), old.dtype)
+            new[:len(old)] = old
+            setattr(self, attr, new)
@@ -0,0 +1,178 @@
+"""In-process vector index for RAG retrieval (VECTOR_BACKEND=numpy).
+
+scripts/ingest_docs.py writes a versioned directory under data/vector_index/ and then points
+data/vector_index/CURRENT at it. Each version holds:
+
+- embeddings.npy: (n, 384) unit-length float32, memory-mapped on load (no copy)
+- texts.bin, offsets.npy, source_ids.npy, sources.json: chunk texts and sources (services/index_files.py)
+- hnsw.bin (optional): an hnswlib index, written when n >= VECTOR_HNSW_THRESHOLD
+- ids.json (optional): chunk ids from ingestion, so a re-ingest can reuse unchanged embeddings
+
+Top-k is one matrix-vector product plus argpartition, or an HNSW query when hnsw.bin
+exists and hnswlib is installed. Running processes pick up a new CURRENT within
+VECTOR_INDEX_CHECK_INTERVAL seconds.
+"""
+import json
+import logging
+import os
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Optional, Sequence
+
+import numpy as np
+
+from services.index_files import Payload, VersionedIndex, new_version_dir, publish, write_payload
+
+logger = logging.getLogger(__name__)
+
+INDEX_DIR = Path(os.getenv(
+    "VECTOR_INDEX_DIR", str(Path(__file__).resolve().parent.parent / "data" / "vector_index")
+))
+VECTOR_BACKENDS = ("chroma", "actian", "numpy")
+# Build an HNSW graph (needs hnswlib) for indexes with at least this many chunks
+HNSW_THRESHOLD = int(os.getenv("VECTOR_HNSW_THRESHOLD", "50000"))
+HNSW_EF_SEARCH = int(os.getenv("VECTOR_HNSW_EF", "128"))
+CHECK_INTERVAL_S = float(os.getenv("VECTOR_INDEX_CHECK_INTERVAL", "30"))
+
+
+def vector_backend() -> str:
+    """VECTOR_BACKEND if set; otherwise actian when ACTIAN_VECTORAI_URL is set, else chroma."""
+    backend = os.getenv("VECTOR_BACKEND", "").strip().lower()
+    if not backend:
+        return "actian" if os.getenv("ACTIAN_VECTORAI_URL", "").strip() else "chroma"
+    if backend not in VECTOR_BACKENDS:
+        raise ValueError(f"VECTOR_BACKEND must be one of {', '.join(VECTOR_BACKENDS)}, got {backend!r}")
+    return backend
+
+
+def _normalized(vectors: np.ndarray) -> np.ndarray:
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+def write_index(
+    embeddings: np.ndarray,
+    texts: Sequence[str],
+    sources: Sequence[str],
+    index_dir: Path = INDEX_DIR,
+    hnsw_threshold: int = HNSW_THRESHOLD,
+    ids: Optional[Sequence[str]] = None,
+) -> Path:
+    """Write a new index version and make it CURRENT. Returns the version directory."""
+    embeddings = _normalized(embeddings)
+    n = len(texts)
+    if embeddings.shape[0] != n or len(sources) != n or (ids is not None and len(ids) != n):
+        raise ValueError("embeddings, texts, sources and ids must have the same length")
+    path = new_version_dir(index_dir)
+    np.save(path / "embeddings.npy", embeddings)
+    write_payload(path, texts, sources)
+    if ids is not None:
+        (path / "ids.json").write_text(json.dumps(list(ids)), encoding="utf-8")
+
+    hnsw = False
+    if n >= hnsw_threshold:
+        try:
+            import hnswlib
+        except ImportError:
+            logger.warning("%d chunks but hnswlib is not installed; the index will use exact search", n)
+        else:
+            graph = hnswlib.Index(space="ip", dim=embeddings.shape[1])
+            graph.init_index(max_elements=n, ef_construction=200, M=16)
+            graph.add_items(embeddings, np.arange(n))
+            graph.save_index(str(path / "hnsw.bin"))
+            hnsw = True
+    meta = {"count": n, "dim": int(embeddings.shape[1]) if n else 0, "hnsw": hnsw,
+            "created_at": datetime.now(timezone.utc).isoformat()}
+    (path / "meta.json").write_text(json.dumps(meta), encoding="utf-8")
+    publish(index_dir, path)
+    return path
+
+
+def stored_vectors(index_dir: Path = INDEX_DIR) -> dict[str, np.ndarray]:
+    """Chunk id -> embedding in the CURRENT version; empty if there is none or it was written without ids."""
+    try:
+        path = index_dir / (index_dir / "CURRENT").read_text(encoding="utf-8").strip()
+        ids = json.loads((path / "ids.json").read_text(encoding="utf-8"))
+    except FileNotFoundError:
+        return {}
+    embeddings = np.load(path / "embeddings.npy")
+    return dict(zip(ids, embeddings))
+
+
+class _Snapshot:
+    """One loaded, immutable index version."""
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.meta = json.loads((path / "meta.json").read_text(encoding="utf-8"))
+        self.count = self.meta["count"]
+        self.embeddings = np.load(path / "embeddings.npy", mmap_mode="r")
+        self.payload = Payload(path)
+        self.hnsw = None
+        if self.meta.get("hnsw"):
+            try:
+                import hnswlib
+            except ImportError:
+                logger.warning("%s has an HNSW graph but hnswlib is not installed; using exact search", path)
+            else:
+                graph = hnswlib.Index(space="ip", dim=self.meta["dim"])
+                graph.load_index(str(path / "hnsw.bin"), max_elements=self.count)
+                graph.set_ef(HNSW_EF_SEARCH)
+                self.hnsw = graph
+
+    def search(self, query: np.ndarray, top_k: int) -> list[dict]:
+        k = min(top_k, self.count)
+        if k <= 0:
+            return []
+        query = _normalized(query).reshape(-1)
+        if self.hnsw is not None:
+            labels, distances = self.hnsw.knn_query(query, k=k)
+            ids, scores = labels[0], 1.0 - distances[0]
+        else:
+            all_scores = self.embeddings @ query
+            ids = np.argpartition(-all_scores, k - 1)[:k] if k < self.count else np.arange(self.count)
+            ids = ids[np.argsort(-all_scores[ids], kind="stable")]
+            scores = all_scores[ids]
+        return [
+            {"source": self.payload.source(i), "text": self.payload.text(i), "score": float(s), "vector": self.embeddings[i]}
+            for i, s in zip(ids.tolist(), scores)
+        ]
+
+
+class NumpyVectorIndex(VersionedIndex):
+    """The CURRENT vector index version, reloaded within check_interval seconds of a new ingest."""
+
+    def __init__(self, index_dir: Path = INDEX_DIR, check_interval: float = CHECK_INTERVAL_S):
+        super().__init__(index_dir, check_interval)
+        self.searches = 0
+
+    def _load(self, path: Path) -> _Snapshot:
+        return _Snapshot(path)
+
+    def search(self, query: np.ndarray, top_k: int = 5) -> list[dict]:
+        """Top-k chunks by cosine similarity: [{source, text, score, vector}], best first."""
+        snapshot = self.current()
+        self.searches += 1
+        return snapshot.search(query, top_k) if snapshot is not None else []
+
+    def __len__(self) -> int:
+        snapshot = self.current()
+        return snapshot.count if snapshot is not None else 0
+
+    def stats(self) -> dict:
+        snapshot = self._snapshot
+        return {
+            **super().stats(),
+            "count": snapshot.count if snapshot is not None else 0,
+            "hnsw": snapshot is not None and snapshot.hnsw is not None,
+            "searches": self.searches,
+        }
+
+
+_index = NumpyVectorIndex()
+
+
+def get_vector_index() -> NumpyVectorIndex:
+    """Return the process-wide NumPy vector index."""
+    return _index